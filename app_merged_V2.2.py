@@ -4,9 +4,42 @@ import numpy as np
 import pydeck as pdk
 import altair as alt
 import os
-from streamlit_push_notifications import send_push, send_alert
+import atexit
+from streamlit_push_notifications import send_push
 from datetime import datetime, timedelta
 
+from cockpit.aggregates import aggregates_for
+from cockpit.alerts import ActiveScenarios, AlertEngine
+from cockpit.cache import SharedDataCache
+from cockpit.data import (
+    ALL_CITIES,
+    CITIES,
+    CITY_DATA,
+    CITY_REGION,
+    PRIO_LABELS,
+    SCENARIOS,
+    ZONE_COUNT_OPTIONS,
+    ZONES,
+    city_of_zone,
+    partition_layout,
+)
+from cockpit.feedback import FeedbackStore
+from cockpit.history import HISTORY_RANGES, METRIC_LABELS, HistoryStore
+from cockpit.live import SnapshotStream
+from cockpit.notify import AUTOMATIC, COALESCED, LocalSink, NotificationDispatcher, PushSink
+from cockpit.partitions import PartitionSummaries
+from cockpit.pool import ScenarioPool
+from cockpit.profiles import MAP_TOOLTIP_COLUMNS, profile_for
+from cockpit.profiling import Profiler, admin_token_ok, admin_users
+from cockpit.refresher import SnapshotRefresher
+from cockpit.reports import ReportFeeds, ReportQuery
+from cockpit.roles import OEV_PLANUNG, POLIZEI, ROLE_LABEL, STADTVERWALTUNG
+from cockpit.sources import EventStreamSource, SyntheticSource
+from cockpit.spatial import ZoneGridIndex, fit_zoom, viewport_bounds
+from cockpit.tables import ipc_bytes
+from cockpit.tiles import MAX_SCATTER_ZONES, HeatTilePyramid, cells_as_zones
+from cockpit.whatif import RUN_OPTIONS, BiasOverride, WhatIfSpec, default_targets, simulate
+
 # =========================================================
 # GRUNDKONFIGURATION
 # =========================================================
@@ -16,16 +49,9 @@ st.set_page_config(
 )
 
 # =========================================================
-# ROLLEN & LOGOS (aus LB-Prototyp)
+# ROLLEN & LOGOS (aus LB-Prototyp, Rollen in cockpit/roles.py)
 # =========================================================
 
-ROLE_LABEL = {
-    "Leitstelle Stadtverkehr": "Leitstelle",
-    "Polizei / Sicherheit": "Polizei",
-    "Stadtverwaltung / Ordnungsamt": "Stadtverwaltung",
-    "ÖV-Planung": "ÖV-Planung",
-}
-
 ROLE_LOGO = {
     "Leitstelle Stadtverkehr": "Verkehrsbetriebe.png",
     "Polizei / Sicherheit": "Polizei.png",
@@ -45,12 +71,251 @@ if "role" not in st.session_state:
 if "data_timestamp" not in st.session_state:
     st.session_state.data_timestamp = None
 
-if "data_cache" not in st.session_state:
-    # dict: scenario für folgende Bodys (df_zones, df_trend, df_map, df_reports, df_fleet, df_battery)
-    st.session_state.data_cache = {}
-    
-if "show_feedback" not in st.session_state:
-    st.session_state.show_feedback = False
+if "username" not in st.session_state:
+    st.session_state.username = None
+
+# =========================================================
+# GETEILTER DATEN-CACHE (prozessweit, für alle Sessions)
+# =========================================================
+def stream_zone_count():
+    # Zonen-Raster des Event-Streams (COCKPIT_STREAM_ZONES, Standard 10); None ohne Stream
+    if not os.environ.get("COCKPIT_EVENT_STREAM"):
+        return None
+    return int(os.environ.get("COCKPIT_STREAM_ZONES", len(CITY_DATA)))
+
+
+@st.cache_resource
+def get_data_cache():
+    # Liefert pro Szenario: (df_zones, df_trend, df_map, df_reports, df_fleet, df_battery)
+    # Mit COCKPIT_EVENT_STREAM=<pfad.ndjson> werden echte Events statt Zufallsdaten gelesen;
+    # Zufallsdaten sind pro (Szenario, Epoch) über COCKPIT_SEED reproduzierbar
+    event_stream = os.environ.get("COCKPIT_EVENT_STREAM")
+    if event_stream:
+        return SharedDataCache(loader=EventStreamSource(event_stream, n_zones=stream_zone_count()))
+
+    # Zufallsdaten in COCKPIT_WORKERS Prozessen generieren (Standard: ein Prozess pro
+    # Szenario, höchstens einer pro Kern; 0 = im Server-Prozess, Standard bei nur einem Kern)
+    source = SyntheticSource(base_seed=int(os.environ.get("COCKPIT_SEED", "0")))
+    cores = os.cpu_count() or 1
+    workers = int(os.environ.get("COCKPIT_WORKERS", min(len(SCENARIOS), cores) if cores > 1 else 0))
+    pool = None
+    if workers > 0:
+        pool = ScenarioPool(source, max_workers=workers)
+        atexit.register(pool.shutdown)
+    return SharedDataCache(loader=source, pool=pool)
+
+
+@st.cache_resource
+def get_refresher():
+    # Aktualisiert alle Szenarien im Hintergrund (Takt über COCKPIT_REFRESH_SECONDS, Standard 30 s)
+    interval = float(os.environ.get("COCKPIT_REFRESH_SECONDS", "30"))
+    n_zones = stream_zone_count() or len(CITY_DATA)
+    return SnapshotRefresher(get_data_cache(), interval_seconds=interval, default_n_zones=n_zones).start()
+
+
+@st.cache_resource
+def get_snapshot_stream():
+    # Live-Modus: Deltas werden einmal pro veröffentlichtem Snapshot berechnet, nicht pro Session
+    return SnapshotStream(get_data_cache())
+
+
+@st.cache_resource
+def get_partition_summaries():
+    # Kennzahlen pro Stadt aus jedem Snapshot; die Städte-Übersicht lädt keine Partition
+    summaries = PartitionSummaries()
+    get_data_cache().subscribe(summaries.on_snapshot)
+    return summaries
+
+
+@st.cache_resource
+def get_report_feeds():
+    # Meldungs-Feed pro Szenario mit Index; Seiten kosten unabhängig von der Feed-Grösse gleich viel
+    feeds = ReportFeeds()
+    get_data_cache().subscribe(feeds.on_snapshot)
+    return feeds
+
+
+@st.cache_resource
+def get_feedback_store():
+    # Übernimmt beim ersten Start die Einträge aus feedback.xlsx
+    return FeedbackStore("feedback.db", legacy_xlsx="feedback.xlsx")
+
+
+@st.cache_resource
+def get_dispatcher():
+    # Versand läuft im Hintergrund und endet als Browser-Push in den Sessions der Empfänger.
+    # COCKPIT_NOTIFY_OFFLINE=1 (Tests, ohne Browser) schreibt nur nach notifications.jsonl
+    if os.environ.get("COCKPIT_NOTIFY_OFFLINE") == "1":
+        return NotificationDispatcher(LocalSink("notifications.jsonl"))
+    return NotificationDispatcher(PushSink())
+
+
+@st.cache_resource
+def get_active_scenarios():
+    # Szenarien, die Sessions in den letzten 5 Minuten angezeigt haben
+    return ActiveScenarios(ttl_seconds=300)
+
+
+@st.cache_resource
+def get_alert_engine():
+    # Wertet jeden neuen Snapshot aus und versendet die schwersten neuen Alarme
+    engine = AlertEngine()
+    dispatcher = get_dispatcher()
+    active = get_active_scenarios()
+    # Beim Event-Stream zeigen alle Szenario-Schlüssel dieselben echten Daten: einer genügt
+    stream_scenario = SCENARIOS[0] if os.environ.get("COCKPIT_EVENT_STREAM") else None
+
+    def forward(alerts, per_rule=3):
+        # Nur echte Lage versenden: den Stream bzw. die gerade angezeigten Szenarien,
+        # nicht jedes hypothetische Szenario, das der Refresher mitrechnet
+        alerts = [
+            a for a in alerts
+            if (a.scenario == stream_scenario if stream_scenario else a.scenario in active)
+        ]
+        for rule in engine.rules:
+            fired = sorted((a for a in alerts if a.rule == rule.name), key=lambda a: -a.value)
+            for alert in fired[:per_rule]:
+                for alert_role in alert.roles:
+                    dispatcher.submit(
+                        f"{ROLE_LABEL[alert_role]}: {alert.title}", zone=alert.zone,
+                        lane=AUTOMATIC, organisation=ROLE_LABEL[alert_role],
+                    )
+
+    engine.add_listener(forward)
+    get_data_cache().subscribe(engine.on_snapshot)
+    return engine
+
+
+@st.cache_resource
+def get_aggregate_warmer():
+    # Chart-Daten direkt nach dem Veröffentlichen berechnen, nicht im Rerun
+    get_data_cache().subscribe(aggregates_for)
+    return aggregates_for
+
+
+@st.cache_resource
+def get_history_store():
+    # Jeder veröffentlichte Snapshot landet in der Parquet-Historie (history/)
+    store = HistoryStore("history")
+    get_data_cache().subscribe(store.append)
+    atexit.register(store.flush, True)
+    return store
+
+
+@st.cache_resource
+def get_profiler():
+    # COCKPIT_PROFILING=1 misst jeden Rerun; ausgeschaltet sind alle Aufrufe No-ops
+    profiler = Profiler.from_env()
+    cache = get_data_cache()
+    profiler.register_gauge("data_cache_hits", lambda: cache.stats().hits)
+    profiler.register_gauge("data_cache_misses", lambda: cache.stats().misses)
+    profiler.register_gauge("data_cache_bytes", lambda: cache.stats().bytes)
+    return profiler
+
+
+profiler = get_profiler()
+profiler.begin_rerun(session=st.session_state.username or "")
+
+data_cache = get_data_cache()
+alert_engine = get_alert_engine()
+get_aggregate_warmer()
+history_store = get_history_store()
+snapshot_stream = get_snapshot_stream()
+partition_summaries = get_partition_summaries()
+report_feeds = get_report_feeds()
+refresher = get_refresher()
+
+# Abfrage-Intervalle des Live-Modus in Sekunden
+LIVE_INTERVAL_OPTIONS = [5, 10, 15, 30, 60]
+
+
+def load_snapshot(scenario, n_zones, city, profile):
+    # Zuletzt veröffentlichten Snapshot nehmen; generiert wird nur beim allerersten Zugriff.
+    # Mit gewählter Stadt wird nur deren Partition geladen und gecacht, und nur die
+    # Frames, die das Datenprofil der Rolle braucht
+    get_active_scenarios().touch(scenario)
+    with profiler.span("daten_laden"):
+        snapshot = data_cache.peek(scenario, n_zones, city, profile.frames)
+        profiler.count("snapshot_cache_hit" if snapshot is not None else "snapshot_cache_miss")
+        if snapshot is None:
+            # Neues Raster: die übrigen Szenarien parallel mitgenerieren, damit der
+            # nächste Szenario-Wechsel nicht erneut wartet
+            data_cache.prefetch([s for s in SCENARIOS if s != scenario], n_zones, city, profile.frames)
+            snapshot = data_cache.get(scenario, n_zones, city, profile.frames)
+    st.session_state.data_timestamp = snapshot.created_at
+    return snapshot
+
+
+def load_view_data(scenario, n_zones, city, profile, live_interval):
+    # Im Live-Modus läuft die Ansicht als Fragment neu und holt sich selbst den neuesten Snapshot
+    snapshot = load_snapshot(scenario, n_zones, city, profile)
+    # Kennzahlen & Chart-Daten: einmal pro Snapshot vorberechnet, hier nur Lookup
+    with profiler.span("kennzahlen"):
+        aggregates = aggregates_for(snapshot)
+    delta = snapshot_stream.delta(snapshot) if live_interval else None
+
+    st.caption(
+        f"Datenstand: {snapshot.created_at:%H:%M:%S} "
+        f"(vor {int(snapshot.age_seconds)} s, Aktualisierung alle "
+        f"{int(refresher.interval_seconds)} s)"
+        + (f" · 🔴 Live, Abfrage alle {live_interval} s" if live_interval else "")
+    )
+    if delta is not None:
+        st.caption(f"Seit dem letzten Stand: {delta.summary()}")
+    return snapshot, aggregates, delta
+
+
+def show_pydeck(deck, **kwargs):
+    profiler.payload("pydeck", lambda: len(deck.to_json().encode("utf-8")))
+    st.pydeck_chart(deck, **kwargs)
+
+
+def show_altair(chart, **kwargs):
+    profiler.payload("altair", lambda: len(chart.to_json().encode("utf-8")))
+    st.altair_chart(chart, **kwargs)
+
+
+def show_table(table, **kwargs):
+    # Arrow-Tabellen gehen ohne pandas-Konvertierung an st.dataframe
+    profiler.payload("dataframe", lambda: ipc_bytes(table).size)
+    st.dataframe(table, **kwargs)
+
+
+def render_profiling_panel():
+    # Nur bei eingeschaltetem Profiling und für Admins (COCKPIT_ADMINS). Der Login ist
+    # ein Mock, der Name also frei wählbar: freigeschaltet wird erst mit COCKPIT_ADMIN_TOKEN
+    if not profiler.enabled or st.session_state.username not in admin_users():
+        return
+    with st.expander("⏱️ Profiling (letzte Reruns)"):
+        if not st.session_state.get("profiling_unlocked"):
+            token = st.text_input("Admin-Token", type="password", key="admin_token")
+            if not admin_token_ok(token):
+                if token:
+                    st.error("Admin-Token ungültig.")
+                return
+            st.session_state.profiling_unlocked = True
+        profiles = profiler.recent()
+        if not profiles:
+            st.info("Noch kein abgeschlossener Rerun.")
+            return
+        rows = []
+        for profile in profiles:
+            row = {
+                "Zeit": profile.started_at.strftime("%H:%M:%S"),
+                "Session": profile.session,
+                "Gesamt (ms)": round(profile.total * 1000, 1),
+            }
+            row.update({f"{name} (ms)": round(sec * 1000, 1) for name, sec in profile.spans.items()})
+            row.update({f"{kind} (KB)": round(n / 1024, 1) for kind, n in profile.payload_bytes.items()})
+            row.update(profile.counters)
+            rows.append(row)
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        st.download_button(
+            "Prometheus-Metriken herunterladen",
+            profiler.prometheus_text(),
+            file_name="cockpit_metrics.prom",
+            mime="text/plain",
+        )
 
 # =========================================================
 # LOGIN-SCREEN (Layout angelehnt an LB)
@@ -72,6 +337,7 @@ def render_login():
             if username and password:
                 st.session_state.logged_in = True
                 st.session_state.role = rolle
+                st.session_state.username = username
             else:
                 st.error("Bitte Benutzername und Passwort eingeben.")
 
@@ -89,285 +355,79 @@ def render_login():
 
 
 # =========================================================
-# ENTWEDER LOGIN ODER HAUPT-APP
+# FEEDBACK-DIALOG
 # =========================================================
-if not st.session_state.logged_in:
-    render_login()
-else:
-    # =========================================================
-    # NACH LOGIN: HEADER MIT ROLLE & LOGO (LB-Style)
-    # =========================================================
-    role = st.session_state.role
-    role_label = ROLE_LABEL.get(role, "")
-    logo_path = ROLE_LOGO.get(role, None)
-
-    header_col_left, header_col_right = st.columns([4, 1])
-    with header_col_left:
-        st.markdown(
-            f"## Safety Heatmap Cockpit – {role_label if role_label else 'Übersicht'}"
-        )
-        st.caption(
-            "Prototyp für ein Lagecockpit zur Sicherheit und Steuerung von Mikromobilität."
-        )
-    with header_col_right:
-        if logo_path:
-            # Logo vergrößert
-            st.image(logo_path, width=190)
-
-    st.markdown("---")
-
-    # =========================================================
-    # BASISDATEN & FARBEN (in Anlehnung an AL-Prototyp)
-    # =========================================================
-
-    CITY_DATA = [
-        {"zone": "Zürich Innenstadt", "lat": 47.3769, "lon": 8.5417},
-        {"zone": "Zürich West", "lat": 47.3890, "lon": 8.5000},
-        {"zone": "Bern Zentrum", "lat": 46.9480, "lon": 7.4474},
-        {"zone": "Bern Wankdorf", "lat": 46.9650, "lon": 7.4640},
-        {"zone": "Luzern Altstadt", "lat": 47.0502, "lon": 8.3093},
-        {"zone": "Basel Bahnhof", "lat": 47.5475, "lon": 7.5890},
-        {"zone": "Winterthur Bahnhof", "lat": 47.5000, "lon": 8.7240},
-        {"zone": "St. Gallen Zentrum", "lat": 47.4245, "lon": 9.3767},
-        {"zone": "Lausanne Gare", "lat": 46.5160, "lon": 6.6291},
-        {"zone": "Genf Cornavin", "lat": 46.2100, "lon": 6.1423},
-    ]
-
-    ZONES = [c["zone"] for c in CITY_DATA]
-
-    RISK_COLOR_MAP = {
-        "niedrig": [46, 204, 113, 160],   # grünlich
-        "mittel": [241, 196, 15, 180],    # gelb
-        "hoch": [230, 126, 34, 200],      # orange
-        "kritisch": [231, 76, 60, 220],   # rot
-    }
+@st.dialog("We'd love your feedback!")
+def feedback_dialog():
+    st.write("Bitte bewerten Sie Ihre Erfahrungen mit diesem Dashboard.")
+
+    # Use a form so everything submits together
+    with st.form("feedback_form"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            happiness = st.slider(
+                "Wie zufrieden waren Sie mit der Nutzung dieses Dashboards?",
+                min_value=1,
+                max_value=5,
+                value=4,
+                help="1 = Überhaupt nicht zufrieden, 5 = Sehr zufrieden",
+            )
 
-    # =========================================================
-    # FUNKTION FÜR LIVE-DATEN (angelehnt an AL)
-    # =========================================================
-    def generate_live_data(scenario: str):
-        """
-        Generiert Fake-Live-Daten für mehrere Städte:
-        - Zonenrisiko & Blockierungszeit
-        - Trenddaten (Rides, Reports, Tech-Issues)
-        - Flottenstatus
-        - Batterielevel
-        - Meldungstabelle
-        """
-        rng = np.random.default_rng()
-
-        base_bias = np.array([2.0] * len(ZONES))
-
-        if "Pendler" in scenario:
-            base_bias += np.array([1.5, 1.0, 0.8, 0.4, 0.4, 0.8, 0.5, 0.7, 0.2, 0.3])
-        elif "Nightlife" in scenario:
-            base_bias += np.array([1.2, 0.6, 0.8, 1.0, 1.0, 0.7, 0.4, 0.8, 0.3, 0.4])
-        elif "Schulweg" in scenario:
-            base_bias += np.array([0.4, 0.8, 0.3, 0.2, 0.2, 0.7, 0.4, 0.3, 0.2, 0.5])
-        elif "Baustellen" in scenario:
-            base_bias += rng.uniform(0.3, 1.5, size=len(ZONES))
-
-        # Risiko-Scores 1–4
-        risk_scores = np.clip(
-            np.round(base_bias + rng.normal(0, 0.6, size=len(ZONES))),
-            1,
-            4,
-        )
+            usability = st.slider(
+                "Wie würden Sie die Benutzerfreundlichkeit des Dashboards bewerten?",
+                min_value=1,
+                max_value=5,
+                value=4,
+                help="1 = Sehr schwer zu bedienen, 5 = Sehr einfach zu bedienen",
+            )
 
-        # Incidents & Blockierungen
-        incidents_5 = rng.integers(0, 10, size=len(ZONES))
-        incidents_30 = incidents_5 + rng.integers(0, 20, size=len(ZONES))
-        incidents_24 = incidents_30 + rng.integers(0, 60, size=len(ZONES))
-        blocked_min = np.clip(risk_scores * 10 + rng.normal(0, 6, size=len(ZONES)), 0, None)
-
-        # Trenddaten (letzte 2 Stunden, 5-Minuten-Takt)
-        now = datetime.now()
-        times = [now - timedelta(minutes=5 * i) for i in range(24)][::-1]
-
-        if "Nightlife" in scenario:
-            base_flow = np.linspace(40, 120, len(times))
-        elif "Pendler" in scenario:
-            base_flow = np.linspace(30, 150, len(times))
-        elif "Schulweg" in scenario:
-            base_flow = np.linspace(20, 80, len(times))
-        else:
-            base_flow = np.linspace(25, 100, len(times))
+        with col2:
+            methods = st.slider(
+                "Wie zufrieden waren Sie mit den vorgeschlagenen Methoden des Dashboards?",
+                min_value=1,
+                max_value=5,
+                value=4,
+                help="1 Überhaupt nicht zufrieden, 5 = Sehr zufrieden",
+            )
 
-        crowd_flow = np.clip(base_flow + rng.normal(0, 15, len(times)), 5, None)
-        citizen_reports = np.clip(crowd_flow / 12 + rng.normal(0, 1.5, len(times)), 0, None)
-        tech_issues = np.clip(
-            rng.normal(loc=crowd_flow / 60, scale=0.5, size=len(times)), 0, None
+        comments = st.text_area(
+            "Möchten Sie uns noch etwas mitteilen?",
+            placeholder="Geben Sie hier Ihr Feedback ein...",
         )
 
-        df_trend = pd.DataFrame(
-            {
-                "timestamp": times,
-                "rides": crowd_flow,
-                "reports": citizen_reports,
-                "tech_issues": tech_issues,
-            }
-        )
+        submitted = st.form_submit_button("Feedback absenden")
 
-        # Zonen-DataFrame
-        risk_level_map = {1: "niedrig", 2: "mittel", 3: "hoch", 4: "kritisch"}
-
-        df_zones = pd.DataFrame(CITY_DATA)
-        df_zones["risk_score"] = risk_scores
-        df_zones["risk_label"] = df_zones["risk_score"].map(risk_level_map)
-        df_zones["incidents_5min"] = incidents_5
-        df_zones["incidents_30min"] = incidents_30
-        df_zones["incidents_24h"] = incidents_24
-        df_zones["blocked_min"] = blocked_min
-
-        # Map-DataFrame
-        df_map = df_zones.copy()
-        df_map["color"] = df_map["risk_label"].map(RISK_COLOR_MAP)
-
-        # Flottenstatus
-        fleet_rows = []
-        status_keys = ["free", "reserved", "in_use", "blocked"]
-        status_labels = {
-            "free": "Frei verfügbar",
-            "reserved": "Online reserviert",
-            "in_use": "In Fahrt",
-            "blocked": "Gesperrt / offline",
+    if submitted:
+        # Prepare feedback entry
+        feedback_entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "happiness_usage": happiness,
+            "usability": usability,
+            "happiness_methods": methods,
+            "comments": comments,
         }
 
-        for _, row in df_zones.iterrows():
-            total = rng.integers(80, 200)
-            # Verteilung abhängig vom Risiko
-            if row["risk_label"] in ["hoch", "kritisch"]:
-                weights = np.array([0.45, 0.15, 0.30, 0.10])
-            else:
-                weights = np.array([0.60, 0.10, 0.25, 0.05])
-
-            counts = (total * weights).round().astype(int)
-            for key, count in zip(status_keys, counts):
-                fleet_rows.append(
-                    {
-                        "zone": row["zone"],
-                        "status_key": key,
-                        "status": status_labels[key],
-                        "count": int(count),
-                    }
-                )
-
-        df_fleet = pd.DataFrame(fleet_rows)
-
-        # Batterie-Levels
-        battery_levels = np.clip(
-            rng.normal(loc=65, scale=18, size=2000), 0, 100
-        )
-        df_battery = pd.DataFrame({"battery_level": battery_levels})
-
-        # Meldungs-Feed
-        templates = [
-            "Nutzer-Meldung: Gefährliche Querung in {zone}",
-            "E-Scooter blockiert Fussweg in {zone}",
-            "Mehrere Scooter umgestossen in {zone}",
-            "Hohe Geschwindigkeiten von Scootern in {zone}",
-            "Polizeimeldung: Unfall mit Scooter in {zone}",
-            "ÖV-Meldung: Haltestelle beeinträchtigt in {zone}",
-            "Kontrolle: Scooter falsch parkiert in {zone}",
-            "Baustelle: Umleitung betrifft Scooter-Route in {zone}",
-            "Anwohnerbeschwerde zu Lärm in {zone}",
-            "Technik: Connectivity-Probleme in {zone}",
-        ]
-        zones_for_msgs = rng.choice(ZONES, size=10)
-        times_str = [
-            (now - timedelta(minutes=int(m))).strftime("%H:%M")
-            for m in rng.integers(1, 45, size=10)
-        ]
-        meldungen = [
-            templates[i].format(zone=zones_for_msgs[i]) for i in range(10)
-        ]
-        df_reports = pd.DataFrame(
-            {
-                "zeit": times_str,
-                "zone": zones_for_msgs,
-                "meldung": meldungen,
-                "prio": rng.choice(
-                    ["hoch", "mittel", "niedrig"], size=10, p=[0.4, 0.4, 0.2]
-                ),
-            }
-        )
-
-        return df_zones, df_trend, df_map, df_reports, df_fleet, df_battery
+        # --- Eintrag anhängen (SQLite, kein Neuschreiben der Excel-Datei) ---
+        get_feedback_store().append(feedback_entry)
 
+        # Dialog schliessen; die Bestätigung zeigt die Sidebar als Toast
+        st.session_state.feedback_saved = True
+        st.rerun()
 
-    # =========================================================
-    # SIDEBAR: PERSONA, SZENARIO, ANSICHT (AL-Style)
-    # =========================================================
-    st.sidebar.header("Steuerung")
 
-    persona = st.sidebar.selectbox(
-        "Persona",
-        [
-            "Leitstelle Stadtverkehr",
-            "Polizei / Sicherheit",
-            "Stadtverwaltung / Ordnungsamt",
-            "ÖV-Planung",
-        ],
-        index=[
-            "Leitstelle Stadtverkehr",
-            "Polizei / Sicherheit",
-            "Stadtverwaltung / Ordnungsamt",
-            "ÖV-Planung",
-        ].index(role)
-        if role in ROLE_LABEL
-        else 0,
-    )
-
-    scenario = st.sidebar.selectbox(
-        "Szenario",
-        [
-            "Pendler:innen Spitzenzeit",
-            "Wochenend-Nacht / Nightlife",
-            "Schulweg-Sicherheit",
-            "Baustellen & Umleitungen",
-        ],
-    )
-
-    view_mode = st.sidebar.radio(
-        "Ansicht",
-        ["1 – Echtzeit-Heatmap", "2 – Trend / Analyse", "3 – Reporting"],
-    )
-
-    # =========================================================
-    # LIVE-DATEN LADEN
-    # =========================================================
-    if scenario not in st.session_state.data_cache:
-        st.session_state.data_cache[scenario] = generate_live_data(scenario)
-
-    df_zones, df_trend, df_map, df_reports, df_fleet, df_battery = st.session_state.data_cache[
-        scenario
-]
-
-
-    global_safety_index = int(
-        np.clip(
-            100 - df_zones["risk_score"].mean() * 18 - df_zones["blocked_min"].mean() / 4,
-            0,
-            100,
-        )
-    )
-    num_critical = int((df_zones["risk_label"] == "kritisch").sum())
-    num_high = int((df_zones["risk_label"] == "hoch").sum())
-    avg_blocked = int(df_zones["blocked_min"].mean())
-    total_scooters = int(df_fleet["count"].sum())
-    share_low_battery = int(
-        (df_battery["battery_level"] < 20).mean() * 100
-    )
-
-    # =========================================================
-    # PUSH-NACHRICHT + VORGEFERTIGTE NACHRICHTEN + RELOAD-BUTTON IN SIDEBAR
-    # =========================================================
-    with st.sidebar:
-        high_prio = df_reports[df_reports["prio"] == "hoch"].head(1)
+# =========================================================
+# SIDEBAR-FRAGMENT: PUSH-NACHRICHT, VORGEFERTIGTE NACHRICHTEN, RELOAD
+# =========================================================
+# Widgets hier lösen nur einen Rerun dieses Fragments aus, nicht der Ansicht
+@st.fragment
+def render_sidebar_actions(report_store, scenario, city, persona):
+    with profiler.fragment("sidebar", st.session_state.username or ""):
+        # Nur die neueste dringende Meldung für die Rolle aus dem Index lesen
+        high_prio = report_store.page(ReportQuery(prios=("hoch",), role=persona, city=city), limit=1)
         if not high_prio.empty:
-            row = high_prio.iloc[0]
-            zone_txt = row["zone"]
-            msg_txt = row["meldung"].split(": ", 1)[-1]
+            zone_txt = high_prio.table["zone"][0].as_py()
+            msg_txt = high_prio.table["meldung"][0].as_py().split(": ", 1)[-1]
         else:
             zone_txt = "Altstadt"
             msg_txt = "Demonstration gemeldet"
@@ -394,6 +454,16 @@ else:
             unsafe_allow_html=True,
         )
 
+        # Automatische Alarme für die gewählte Persona
+        role_alerts = alert_engine.recent(role=persona, scenario=scenario, limit=None)
+        if city != ALL_CITIES:
+            role_alerts = [a for a in role_alerts if city_of_zone(a.zone) == city]
+        role_alerts = role_alerts[:3]
+        if role_alerts:
+            st.markdown("**🚨 Automatische Alarme**")
+            for alert in role_alerts:
+                st.caption(f"{alert.raised_at:%H:%M} · {alert.title}: {alert.zone}")
+
         # Card-Rahmen für vorgefertigte Nachrichten
         st.markdown(
             """
@@ -417,12 +487,15 @@ else:
         )
 
         # Auswahl der Nachricht (Mock)
-        message_options = [
-            "Stadtverwaltung: Bericht zu Hotspot aktualisieren",
-            "Polizei: Zusätzliche Patrouille im Bereich anfragen",
-            "ÖV-Betriebe: Haltestelle durch Scooter beeinträchtigt",
-        ]
-    
+        # Vorlage -> Empfänger-Rolle; deren ROLE_LABEL ist die Organisation für
+        # Rate-Limit und Push-Inbox (das Präfix der Vorlage ist nur Anzeigetext)
+        message_recipients = {
+            "Stadtverwaltung: Bericht zu Hotspot aktualisieren": STADTVERWALTUNG,
+            "Polizei: Zusätzliche Patrouille im Bereich anfragen": POLIZEI,
+            "ÖV-Betriebe: Haltestelle durch Scooter beeinträchtigt": OEV_PLANUNG,
+        }
+        message_options = list(message_recipients)
+
         selected_template = st.radio(
             "",
             message_options,
@@ -430,154 +503,188 @@ else:
             label_visibility="collapsed",
             key="template_choice",
         )
-        body=selected_template
-        
-        #Sendet Notification an den Brwoser(braucht push file)
+        body = selected_template
 
+        # Nachricht in die Versand-Queue stellen; der Button wartet nicht auf die Zustellung.
+        # Den Push bekommen die Empfänger-Organisation und diese Session (render_push_inbox)
         if st.button("📤 Nachricht absenden"):
-            send_alert(body)
-        
+            receipt = get_dispatcher().submit(
+                body, zone=zone_txt, organisation=ROLE_LABEL[message_recipients[body]]
+            )
+            st.session_state.setdefault("sent_notifications", set()).add(receipt.id)
+            if receipt.status == COALESCED:
+                st.toast(f"Bereits unterwegs – mit Meldung #{receipt.id} zusammengefasst.")
+            else:
+                st.toast(f"Meldung #{receipt.id} an {receipt.organisation} {receipt.status}.")
 
         st.markdown("</div>", unsafe_allow_html=True)
 
         if st.button("🔄 Live-Daten neu laden"):
-            # Remove cached data for the currently selected scenario
-            st.session_state.data_cache.pop(scenario, None)
-            st.rerun()
+            # Szenario für alle Sessions neu generieren lassen (ganze App neu, nicht nur das Fragment)
+            data_cache.invalidate(scenario)
+            profiler.end_rerun()
+            st.rerun(scope="app")
 
-#Test Feedback ab hier
-        
+        cache_stats = data_cache.stats()
+        st.caption(
+            f"Daten-Cache: {cache_stats.hits} Treffer / {cache_stats.misses} Fehlzugriffe, "
+            f"{cache_stats.entries} Einträge ({cache_stats.bytes / 1024 ** 2:.1f} MB)"
+        )
 
+        if st.button("💬 Feedback Formular"):
+            feedback_dialog()
 
-        def open_feedback():
-            st.session_state.show_feedback = True
+        if st.session_state.pop("feedback_saved", False):
+            st.toast("✅ Vielen Dank! Ihr Feedback wurde gespeichert.")
 
+        if st.button("📥 Feedback als Excel exportieren"):
+            feedback_store = get_feedback_store()
+            export_path = feedback_store.export_excel("feedback.xlsx")
+            st.success(f"{feedback_store.count()} Einträge nach {export_path} exportiert.")
 
-        def close_feedback():
-            st.session_state.show_feedback = False
 
-        st.button("💬 Feedback Formular", on_click=open_feedback)
-        
-        if st.session_state.show_feedback:
-            if hasattr(st, "modal"):
-                modal_ctx = st.dialog("We'd love your feedback!")
-            else:
-                st.warning("Streamlit Pop up ist in diesem Brwoser nicht supported..")
-                modal_ctx = st.container()
-
-            with modal_ctx:
-                st.write("Bitte bewerten Sie Ihre Erfahrungen mit diesem Dashboard.")
-
-                # Use a form so everything submits together
-                with st.form("feedback_form"):
-                    col1, col2 = st.columns(2)
-
-                    with col1:
-                        happiness = st.slider(
-                            "Wie zufrieden waren Sie mit der Nutzung dieses Dashboards?",
-                            min_value=1,
-                            max_value=5,
-                            value=4,
-                            help="1 = Überhaupt nicht zufrieden, 5 = Sehr zufrieden",
-                        )
-
-                        usability = st.slider(
-                            "Wie würden Sie die Benutzerfreundlichkeit des Dashboards bewerten?",
-                            min_value=1,
-                            max_value=5,
-                            value=4,
-                            help="1 = Sehr schwer zu bedienen, 5 = Sehr einfach zu bedienen",
-                        )
-
-                    with col2:
-                        methods = st.slider(
-                            "Wie zufrieden waren Sie mit den vorgeschlagenen Methoden des Dashboards?",
-                            min_value=1,
-                            max_value=5,
-                            value=4,
-                            help="1 Überhaupt nicht zufrieden, 5 = Sehr zufrieden",
-                        )
-
-                    comments = st.text_area(
-                        "Möchten Sie uns noch etwas mitteilen?",
-                        placeholder="Geben Sie hier Ihr Feedback ein...",
-                )
+# Takt in Sekunden, in dem jede Session zugestellte Pushes abholt
+PUSH_POLL_SECONDS = 5
 
-                    submitted = st.form_submit_button("Feedback absenden")
-
-            if submitted:
-                # Prepare feedback entry
-                feedback_entry = {
-                    "timestamp": datetime.now().isoformat(timespec="seconds"),
-                    "happiness_usage": happiness,
-                    "usability": usability,
-                    "happiness_methods": methods,
-                    "comments": comments,
-                }
-
-                # --- Save to local Excel file ---
-                file_path = "feedback.xlsx"
-
-                if os.path.exists(file_path):
-                    # Append to existing file
-                    existing_df = pd.read_excel(file_path)
-                    new_df = pd.concat(
-                        [existing_df, pd.DataFrame([feedback_entry])],
-                        ignore_index=True,
-                    )
-                else:
-                    # Create new file
-                    new_df = pd.DataFrame([feedback_entry])
 
-                new_df.to_excel(file_path, index=False)
+@st.fragment(run_every=f"{PUSH_POLL_SECONDS}s")
+def render_push_inbox(persona):
+    # Der Dispatcher stellt in den Postausgang des PushSink zu; gerendert wird der
+    # Push hier, für Nachrichten an die eigene Organisation und selbst abgesetzte
+    sink = get_dispatcher().sink
+    if not isinstance(sink, PushSink):
+        return
+    if "push_cursor" not in st.session_state:
+        st.session_state.push_cursor = sink.cursor()
+    st.session_state.push_cursor, pending = sink.drain(
+        st.session_state.push_cursor,
+        organisation=ROLE_LABEL.get(persona),
+        ids=st.session_state.get("sent_notifications", ()),
+    )
+    for notification in pending:
+        title = f"{notification.organisation} – Safety Cockpit"
+        if notification.count > 1:
+            title += f" ({notification.count}×)"
+        send_push(title=title, body=notification.body, tag=f"cockpit-{notification.id}")
 
-                st.success("✅ Vielen Dank! Ihr Feedback wurde gespeichert.")
-                close_feedback()
 
-    # =========================================================
-    # ANSICHT 1 – HEATMAP & HOTSPOTS
-    # =========================================================
-    if view_mode.startswith("1"):
-        st.subheader("1️⃣ Echtzeit-Heatmap & Hotspots")
+# =========================================================
+# ANSICHT 1 – HEATMAP & HOTSPOTS
+# =========================================================
+# Spalten der Scatter-Ebene (Position, Radius, Farbe); dazu die Tooltip-Spalten des Profils
+SCATTER_COLUMNS = ["zone", "lat", "lon", "risk_score", "risk_label", "r", "g", "b", "a"]
 
-        center_lat = df_map["lat"].mean()
-        center_lon = df_map["lon"].mean()
+# Zoomstufe beim Fokus auf eine Zone (Quartier statt ganzer Stadt)
+FOCUS_ZOOM = 13.0
+
+
+def render_heatmap_view(scenario, n_zones, city, profile, live_interval):
+    with profiler.fragment("ansicht_1", st.session_state.username or ""):
+        st.subheader("1️⃣ Echtzeit-Heatmap & Hotspots")
+        snapshot, aggregates, delta = load_view_data(scenario, n_zones, city, profile, live_interval)
+        df_map = snapshot.frames[2]
+
+        # Start-Ausschnitt: das ganze geladene Netz bzw. die ganze Stadt oder eine
+        # gewählte Fokus-Zone. pydeck meldet Verschieben/Zoomen nicht zurück; der
+        # Server legt den Ausschnitt fest, und Zonen sowie Heatmap-Zellen werden
+        # für genau diesen Ausschnitt ausgewählt
+        focus_options = [z for z in ZONES if city == ALL_CITIES or city_of_zone(z) == city]
+        whole_label = "Ganzes Netz" if city == ALL_CITIES else f"Ganz {city}"
+        focus = st.selectbox(
+            "Kartenausschnitt",
+            [None, *focus_options],
+            format_func=lambda z: whole_label if z is None else z,
+            help="Fokus auf eine Zone: es werden nur die Zonen im Ausschnitt übertragen.",
+        )
+        if focus is None:
+            center_lat = float(df_map["lat"].min() + df_map["lat"].max()) / 2
+            center_lon = float(df_map["lon"].min() + df_map["lon"].max()) / 2
+            zoom = fit_zoom(df_map["lat"], df_map["lon"])
+            radius = 9000 if city == ALL_CITIES else 600
+        else:
+            base = CITY_DATA[ZONES.index(focus)]
+            center_lat, center_lon, zoom, radius = base["lat"], base["lon"], FOCUS_ZOOM, 150
 
         view_state = pdk.ViewState(
             latitude=center_lat,
             longitude=center_lon,
-            zoom=7.2,
+            zoom=zoom,
             pitch=45,
         )
 
+        def map_view_data():
+            # Ohne Fokus liegen alle Zonen im Ausschnitt, mit Fokus nur die nahen. Über
+            # MAX_SCATTER_ZONES gehen statt Einzelpunkten die Zellen der Heatmap-Pyramide
+            bounds = viewport_bounds(view_state.latitude, view_state.longitude, view_state.zoom)
+            if focus is None:
+                visible = np.arange(len(df_map))
+            else:
+                spatial_index = snapshot.derived("spatial_index", lambda: ZoneGridIndex.from_frame(df_map))
+                visible = spatial_index.within(*bounds)
+
+            # Heatmap: serverseitig auf die Zoomstufe aggregierte Zellen statt Rohpunkte
+            heat_pyramid = snapshot.derived(
+                "heat_pyramid",
+                lambda: HeatTilePyramid.from_frame(
+                    df_map, weight="risk_score", extra=list(MAP_TOOLTIP_COLUMNS)
+                ),
+            )
+            df_heat = heat_pyramid.cells(view_state.zoom, bounds)
+
+            if len(visible) > MAX_SCATTER_ZONES:
+                df_map_view = cells_as_zones(df_heat)
+            else:
+                df_map_view = df_map if len(visible) == len(df_map) else df_map.iloc[visible]
+            # Nur Spalten, die Layer und Tooltip der Rolle brauchen, serialisieren
+            df_map_view = df_map_view[SCATTER_COLUMNS + list(profile.map_columns)]
+            return df_heat[["lat", "lon", "weight"]], df_map_view
+
+        # Der Ausschnitt hängt nur vom Snapshot, dem Profil und dem Fokus ab: einmal pro Snapshot berechnen
+        df_heat, df_map_view = snapshot.derived(f"map_view:{profile.role}:{focus}", map_view_data)
+
         layer_scatter = pdk.Layer(
             "ScatterplotLayer",
-            data=df_map,
+            data=df_map_view,
             get_position="[lon, lat]",
-            get_radius="risk_score * 9000",
-            get_fill_color="color",
+            get_radius=f"risk_score * {radius}",
+            get_fill_color="[r, g, b, a]",
             pickable=True,
             opacity=0.8,
         )
 
         layer_heat = pdk.Layer(
             "HeatmapLayer",
-            data=df_map,
+            data=df_heat,
             get_position="[lon, lat]",
-            get_weight="risk_score",
+            get_weight="weight",
             radius_pixels=70,
         )
 
-        st.pydeck_chart(
+        layers = [layer_heat, layer_scatter]
+        if delta is not None and not delta.changed_zones.empty:
+            # Live: nur die am stärksten veränderten Zonen zusätzlich als Ring markieren
+            layers.append(
+                pdk.Layer(
+                    "ScatterplotLayer",
+                    data=delta.top_changes()[["lat", "lon", "risk_score"]],
+                    get_position="[lon, lat]",
+                    get_radius=f"risk_score * {radius}",
+                    filled=False,
+                    stroked=True,
+                    get_line_color=[20, 20, 20, 220],
+                    line_width_min_pixels=2,
+                )
+            )
+
+        show_pydeck(
             pdk.Deck(
                 map_style="https://basemaps.cartocdn.com/gl/positron-gl-style/style.json",
                 initial_view_state=view_state,
-                layers=[layer_heat, layer_scatter],
+                layers=layers,
                 tooltip={
-                    "html": (
-                        "<b>Zone:</b> {zone}<br/>"
-                        "<b>Risiko:</b> {risk_label}<br/>"
-                        "<b>Incidents 30min:</b> {incidents_30min}"
+                    "html": "<br/>".join(
+                        ["<b>Zone:</b> {zone}", "<b>Risiko:</b> {risk_label}"]
+                        + [f"<b>{MAP_TOOLTIP_COLUMNS[c]}:</b> {{{c}}}" for c in profile.map_columns]
                     ),
                     "style": {"font-size": "12px"},
                 },
@@ -587,72 +694,171 @@ else:
 
         st.markdown("### Top-Hotspots (letzte 30 Minuten)")
 
-        df_hot = df_zones.sort_values(
-            ["risk_score", "incidents_30min", "blocked_min"],
-            ascending=[False, False, False],
-        ).head(6)
-
-        df_hot_view = df_hot[
-            [
-                "zone",
-                "risk_label",
-                "incidents_30min",
-                "blocked_min",
-                "incidents_24h",
-            ]
-        ].rename(
-            columns={
-                "zone": "Zone",
-                "risk_label": "Risiko",
-                "incidents_30min": "Incidents 30min",
-                "blocked_min": "Blockiert (min)",
-                "incidents_24h": "Incidents 24h",
-            }
+        if delta is None:
+            show_table(aggregates.hotspots, use_container_width=True, hide_index=True)
+        else:
+            show_table(delta.mark_hotspots(aggregates.hotspots), use_container_width=True, hide_index=True)
+
+
+# =========================================================
+# ANSICHT 2 – TREND / ANALYSE
+# =========================================================
+# Spalten der What-if-Karte (Position, Farbe, Tooltip)
+WHATIF_MAP_COLUMNS = ["zone", "lat", "lon", "risk_label", "p_critical", "blocked_p50", "blocked_p90",
+                      "r", "g", "b", "a"]
+
+
+def render_whatif(snapshot, scenario, city):
+    # Eingriffe erst beim Absenden übernehmen, nicht bei jeder Regler-Bewegung
+    with st.form("whatif"):
+        targets = st.multiselect(
+            "Eingriff in Stadt / Zone",
+            default_targets(),
+            help="Z. B. Bern Wankdorf wegen einer Baustelle sperren (gilt auch für die Mikro-Zonen).",
         )
-        st.dataframe(df_hot_view, use_container_width=True, hide_index=True)
+        c1, c2, c3 = st.columns(3)
+        risk_delta = c1.slider("Risiko-Bias", -2.0, 2.0, 1.0, 0.5)
+        blocked_delta = c2.slider("Zusätzliche Sperrminuten", 0, 60, 20, 5)
+        runs = c3.select_slider("Läufe", RUN_OPTIONS, value=RUN_OPTIONS[-1])
+        if st.form_submit_button("Simulation starten"):
+            st.session_state.whatif_spec = WhatIfSpec(
+                overrides=tuple(BiasOverride(t, risk_delta, blocked_delta) for t in targets),
+                runs=runs,
+            )
 
-    # =========================================================
-    # ANSICHT 2 – TREND / ANALYSE
-    # =========================================================
-    elif view_mode.startswith("2"):
-        st.subheader("2️⃣ Trend & Analyse – Auslastung und Meldungen")
+    spec = st.session_state.get("whatif_spec")
+    if spec is None:
+        st.caption("Eingriff wählen und die Simulation starten (Projektion über die nächste Stunde).")
+        return
 
-        c1, c2 = st.columns([2, 1.2])
+    # Einmal pro Snapshot und Eingriff rechnen; alle Sessions teilen das Ergebnis
+    with profiler.span("whatif"):
+        result = snapshot.derived(
+            f"whatif:{spec!r}", lambda: simulate(snapshot.frames[0], scenario, spec)
+        )
 
-        with c1:
-            st.markdown("#### Fahrten & Meldungen (letzte 2 Stunden)")
-            df_long = df_trend.melt(
-                id_vars="timestamp",
-                value_vars=["rides", "reports", "tech_issues"],
-                var_name="Kennzahl",
-                value_name="Wert",
-            )
-            kennzahl_labels = {
-                "rides": "Fahrten",
-                "reports": "Meldungen (Nutzer:innen)",
-                "tech_issues": "Technische Issues",
-            }
-            df_long["Kennzahl"] = df_long["Kennzahl"].map(kennzahl_labels)
+    horizon = result.timeline.iloc[-1]
+    st.caption(
+        f"{spec.runs:,} Läufe · Anteil kritischer Zonen in {int(horizon['Minuten'])} min: "
+        f"{horizon['p50']:.1f} % (p10–p90: {horizon['p10']:.1f}–{horizon['p90']:.1f} %)"
+    )
 
-            chart = (
-                alt.Chart(df_long)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("timestamp:T", title="Zeit"),
-                    y=alt.Y("Wert:Q"),
-                    color=alt.Color("Kennzahl:N"),
-                    tooltip=["timestamp:T", "Kennzahl:N", "Wert:Q"],
+    map_col, bar_col = st.columns([1.4, 1])
+    with map_col:
+        df_whatif_map = result.top_zones(MAX_SCATTER_ZONES)[WHATIF_MAP_COLUMNS]
+        show_pydeck(
+            pdk.Deck(
+                map_style="https://basemaps.cartocdn.com/gl/positron-gl-style/style.json",
+                initial_view_state=pdk.ViewState(
+                    latitude=float(result.zones["lat"].mean()),
+                    longitude=float(result.zones["lon"].mean()),
+                    zoom=7.2 if city == ALL_CITIES else 11.0,
+                ),
+                layers=[
+                    pdk.Layer(
+                        "ScatterplotLayer",
+                        data=df_whatif_map,
+                        get_position="[lon, lat]",
+                        get_radius=f"(p_critical + 0.2) * {30000 if city == ALL_CITIES else 2000}",
+                        get_fill_color="[r, g, b, a]",
+                        pickable=True,
+                        opacity=0.8,
+                    )
+                ],
+                tooltip={
+                    "html": (
+                        "<b>Zone:</b> {zone}<br/>"
+                        "<b>Risiko (p90):</b> {risk_label}<br/>"
+                        "<b>P(kritisch):</b> {p_critical}<br/>"
+                        "<b>Blockiert p50 / p90:</b> {blocked_p50} / {blocked_p90} min"
+                    ),
+                    "style": {"font-size": "12px"},
+                },
+            ),
+            use_container_width=True,
+        )
+    with bar_col:
+        top = result.top_zones().assign(
+            zone=lambda df: df["zone"].astype(str),
+            p_critical=lambda df: (df["p_critical"] * 100).round(1),
+        )
+        base = alt.Chart(top).encode(y=alt.Y("zone:N", sort="-x", title="Zone"))
+        bars = base.mark_bar().encode(
+            x=alt.X("blocked_p50:Q", title="Blockiert (min), p50 mit p10–p90"),
+            color=alt.Color("risk_label:N", title="Risiko (p90)"),
+            tooltip=["zone:N", "p_critical:Q", "blocked_p10:Q", "blocked_p50:Q", "blocked_p90:Q"],
+        )
+        whiskers = base.mark_rule(color="black").encode(x="blocked_p10:Q", x2="blocked_p90:Q")
+        show_altair((bars + whiskers).properties(height=320), use_container_width=True)
+
+
+# Meldungen pro Seite im Feed
+REPORT_PAGE_SIZE = 20
+
+
+def render_report_feed(snapshot, city, persona, delta):
+    report_store = report_feeds.for_snapshot(snapshot)
+    search_col, prio_col, zone_col, role_col = st.columns([1.6, 1.2, 1.2, 0.9])
+    text = search_col.text_input("Suche in Meldungen", placeholder="z. B. Unfall Bern")
+    prios = prio_col.multiselect("Priorität", PRIO_LABELS)
+    zone_options = ZONES if city == ALL_CITIES else [z for z in ZONES if city_of_zone(z) == city]
+    zone = zone_col.selectbox(
+        "Zone", [None, *zone_options], format_func=lambda z: "Alle Zonen" if z is None else z
+    )
+    own_role = role_col.toggle("Nur meine Rolle", value=True)
+
+    query = ReportQuery(
+        prios=tuple(prios), role=persona if own_role else None, city=city, zone=zone, text=text
+    )
+    total = report_store.count(query)
+    n_pages = max(1, -(-total // REPORT_PAGE_SIZE))
+    page_no = st.number_input("Seite", min_value=1, max_value=n_pages, value=1) if n_pages > 1 else 1
+
+    # Nur die angezeigte Seite aus dem Index holen
+    with profiler.span("meldungen"):
+        page = report_store.page(query, offset=(page_no - 1) * REPORT_PAGE_SIZE, limit=REPORT_PAGE_SIZE)
+    if page.empty:
+        st.info("Keine Meldungen für diese Filter.")
+        return
+    st.caption(
+        f"Meldungen {page.offset + 1}–{page.offset + page.table.num_rows} von {page.total:,} "
+        f"(dringendste und neueste zuerst)"
+    )
+    table = page.table if delta is None else delta.mark_reports(page.table)
+    show_table(table, use_container_width=True, hide_index=True)
+
+
+def render_trend_view(scenario, n_zones, city, persona, profile, live_interval):
+    with profiler.fragment("ansicht_2", st.session_state.username or ""):
+        st.subheader("2️⃣ Trend & Analyse – Auslastung und Meldungen")
+        snapshot, aggregates, delta = load_view_data(scenario, n_zones, city, profile, live_interval)
+
+        # Ohne Kurzzeit-Trend im Profil bekommt das Risikoprofil die ganze Breite
+        if profile.shows("trend"):
+            c1, c2 = st.columns([2, 1.2])
+        else:
+            c1, c2 = None, st.container()
+
+        if c1 is not None:
+            with c1:
+                st.markdown("#### Fahrten & Meldungen (letzte 2 Stunden)")
+                chart = (
+                    alt.Chart(aggregates.trend_long)
+                    .mark_line(point=True)
+                    .encode(
+                        x=alt.X("timestamp:T", title="Zeit"),
+                        y=alt.Y("Wert:Q"),
+                        color=alt.Color("Kennzahl:N"),
+                        tooltip=["timestamp:T", "Kennzahl:N", "Wert:Q"],
+                    )
+                    .properties(height=300)
                 )
-                .properties(height=300)
-            )
-            st.altair_chart(chart, use_container_width=True)
+                show_altair(chart, use_container_width=True)
 
         with c2:
             st.markdown("#### Risikoprofil nach Stadt")
-            df_risk_bar = df_zones[["zone", "risk_score"]].copy()
-            df_risk_bar["Risiko-Score"] = df_risk_bar["risk_score"]
             bar_chart = (
-                alt.Chart(df_risk_bar)
+                alt.Chart(aggregates.risk_bar)
                 .mark_bar()
                 .encode(
                     x=alt.X("Risiko-Score:Q"),
@@ -661,62 +867,243 @@ else:
                 )
                 .properties(height=300)
             )
-            st.altair_chart(bar_chart, use_container_width=True)
+            show_altair(bar_chart, use_container_width=True)
+
+        with st.expander("📅 Langzeit-Trend (Historie)", expanded=profile.history_expanded):
+            range_col, metric_col = st.columns([1.2, 1])
+            with range_col:
+                history_range = st.radio(
+                    "Zeitraum",
+                    list(HISTORY_RANGES),
+                    index=list(HISTORY_RANGES).index(profile.history_range),
+                    horizontal=True,
+                )
+            with metric_col:
+                history_metric = st.selectbox(
+                    "Kennzahl",
+                    list(METRIC_LABELS),
+                    format_func=METRIC_LABELS.get,
+                )
+            history_days = HISTORY_RANGES[history_range]
+            history_end = datetime.now()
+            df_history = history_store.trend(
+                history_end - timedelta(days=history_days),
+                history_end,
+                scenario,
+                history_metric,
+                n_zones=n_zones,
+                # Historie führt das ganze Netz; für eine Stadt nur deren Zonen lesen
+                zones=None if city == ALL_CITIES else partition_layout(n_zones, city)[0],
+            )
+            if df_history.empty:
+                st.info("Für dieses Szenario liegt noch keine Historie vor.")
+            else:
+                history_chart = (
+                    alt.Chart(df_history)
+                    .mark_line(point=len(df_history) <= 100)
+                    .encode(
+                        x=alt.X("ts:T", title="Zeit"),
+                        y=alt.Y("Wert:Q", title=METRIC_LABELS[history_metric]),
+                        tooltip=["ts:T", "Wert:Q"],
+                    )
+                    .properties(height=260)
+                )
+                show_altair(history_chart, use_container_width=True)
 
-        st.markdown("### Meldungen-Feed (Auswahl)")
-        st.dataframe(
-            df_reports.sort_values("prio", ascending=True),
-            use_container_width=True,
-            hide_index=True,
-        )
+        with st.expander("🔮 What-if-Simulation (Monte Carlo)"):
+            render_whatif(snapshot, scenario, city)
 
-    # =========================================================
-    # ANSICHT 3 – REPORTING & FLOTTE
-    # =========================================================
-    else:
+        if profile.shows("reports"):
+            st.markdown("### Meldungen-Feed")
+            render_report_feed(snapshot, city, persona, delta)
+
+
+# =========================================================
+# ANSICHT 3 – REPORTING & FLOTTE
+# =========================================================
+def render_reporting_view(scenario, n_zones, city, role_label, profile, live_interval):
+    with profiler.fragment("ansicht_3", st.session_state.username or ""):
         st.subheader("3️⃣ Reporting & Flottenstatus")
+        snapshot, aggregates, delta = load_view_data(scenario, n_zones, city, profile, live_interval)
+        kpis = aggregates.kpis
 
-        c1, c2 = st.columns([1.5, 1.5])
+        # Batterie-Telemetrie nur für Profile, die sie laden
+        if profile.shows("battery"):
+            c1, c2 = st.columns([1.5, 1.5])
+        else:
+            c1, c2 = st.container(), None
 
         with c1:
             st.markdown("#### Flottenstatus nach Stadt")
-            df_fleet_pivot = (
-                df_fleet.pivot_table(
-                    index="zone",
-                    columns="status",
-                    values="count",
-                    aggfunc="sum",
+            show_table(aggregates.fleet_pivot, use_container_width=True, hide_index=True)
+
+        if c2 is not None:
+            with c2:
+                st.markdown("#### Batterie-Level der Flotte")
+                # Vorgebinnt: der Browser bekommt 20 Klassen statt aller Rohwerte
+                hist_chart = (
+                    alt.Chart(aggregates.battery_hist)
+                    .mark_bar()
+                    .encode(
+                        x=alt.X("bin_start:Q", bin="binned", title="Batterielevel (%)"),
+                        x2="bin_end:Q",
+                        y=alt.Y("count:Q", title="Anzahl Scooter"),
+                        tooltip=["count:Q"],
+                    )
+                    .properties(height=280)
                 )
-                .fillna(0)
-                .reset_index()
-            )
-            st.dataframe(df_fleet_pivot, use_container_width=True, hide_index=True)
+                show_altair(hist_chart, use_container_width=True)
 
-        with c2:
-            st.markdown("#### Batterie-Level der Flotte")
-            hist_chart = (
-                alt.Chart(df_battery)
-                .mark_bar()
-                .encode(
-                    x=alt.X("battery_level:Q", bin=alt.Bin(maxbins=20), title="Batterielevel (%)"),
-                    y=alt.Y("count():Q", title="Anzahl Scooter"),
-                    tooltip=["count():Q"],
+                st.metric(
+                    "Scooter mit < 20% Batterie",
+                    f"{kpis['share_low_battery']}%",
+                    help=f"Median {kpis['battery_median']:.0f}%, 10%-Quantil {kpis['battery_p10']:.0f}%",
                 )
-                .properties(height=280)
-            )
-            st.altair_chart(hist_chart, use_container_width=True)
-
-            st.metric("Scooter mit < 20% Batterie", f"{share_low_battery}%")
+                if aggregates.rebalancing.num_rows:
+                    st.markdown("##### Rebalancing: meiste Scooter mit < 20% Batterie")
+                    show_table(aggregates.rebalancing, use_container_width=True, hide_index=True)
+
+        st.markdown("#### Städte & Regionen")
+        # Aus den vorab aggregierten Partition-Summaries, ohne weitere Städte zu laden.
+        # Sie kommen aus Snapshots des ganzen Netzes (Refresher: Standard-Raster)
+        df_rollup = partition_summaries.frame(scenario, n_zones, city)
+        if df_rollup.empty:
+            st.info("Noch keine Städte-Übersicht für dieses Szenario und Zonen-Raster.")
+        else:
+            st.dataframe(df_rollup, use_container_width=True, hide_index=True)
 
         st.markdown("### Zusammenfassung für Entscheidungsträger:innen")
         st.markdown(
             f"""
-            - **Globaler Safety-Index:** {global_safety_index}/100  
-            - **Kritische Städte:** {num_critical} (rote Stufe)  
-            - **Hohe Risiken:** {num_high} (orange Stufe)  
-            - **Ø Blockierung:** {avg_blocked} Minuten pro Zone     
+            - **Globaler Safety-Index:** {kpis['global_safety_index']}/100  
+            - **Kritische Städte:** {kpis['num_critical']} (rote Stufe)  
+            - **Hohe Risiken:** {kpis['num_high']} (orange Stufe)  
+            - **Ø Blockierung:** {kpis['avg_blocked']} Minuten pro Zone     
 
             Nutze diese Sicht für tägliche Lagebesprechungen, Priorisierung von Einsätzen
             und Abstimmung zwischen **{role_label}** und weiteren Akteuren.
             """
         )
+
+
+# =========================================================
+# ENTWEDER LOGIN ODER HAUPT-APP
+# =========================================================
+if not st.session_state.logged_in:
+    render_login()
+else:
+    # =========================================================
+    # NACH LOGIN: HEADER MIT ROLLE & LOGO (LB-Style)
+    # =========================================================
+    role = st.session_state.role
+    role_label = ROLE_LABEL.get(role, "")
+    logo_path = ROLE_LOGO.get(role, None)
+
+    header_col_left, header_col_right = st.columns([4, 1])
+    with header_col_left:
+        st.markdown(
+            f"## Safety Heatmap Cockpit – {role_label if role_label else 'Übersicht'}"
+        )
+        st.caption(
+            "Prototyp für ein Lagecockpit zur Sicherheit und Steuerung von Mikromobilität."
+        )
+    with header_col_right:
+        if logo_path:
+            # Logo vergrößert
+            st.image(logo_path, width=190)
+
+    st.markdown("---")
+
+    # =========================================================
+    # SIDEBAR: PERSONA, SZENARIO, ANSICHT (AL-Style)
+    # =========================================================
+    st.sidebar.header("Steuerung")
+
+    persona = st.sidebar.selectbox(
+        "Persona",
+        [
+            "Leitstelle Stadtverkehr",
+            "Polizei / Sicherheit",
+            "Stadtverwaltung / Ordnungsamt",
+            "ÖV-Planung",
+        ],
+        index=[
+            "Leitstelle Stadtverkehr",
+            "Polizei / Sicherheit",
+            "Stadtverwaltung / Ordnungsamt",
+            "ÖV-Planung",
+        ].index(role)
+        if role in ROLE_LABEL
+        else 0,
+    )
+
+    # Datenprofil der Persona: welche Frames geladen werden und was die Ansichten zeigen
+    profile = profile_for(persona)
+
+    scenario = st.sidebar.selectbox(
+        "Szenario",
+        SCENARIOS,
+    )
+
+    city = st.sidebar.selectbox(
+        "Stadt / Region",
+        [ALL_CITIES] + CITIES,
+        format_func=lambda c: c if c == ALL_CITIES else f"{c} ({CITY_REGION[c]})",
+        help="Lädt nur die Zonen der gewählten Stadt.",
+    )
+
+    # Beim Event-Stream ist das Zonen-Raster fest vorgegeben
+    stream_zones = stream_zone_count()
+    n_zones = st.sidebar.select_slider(
+        "Anzahl Zonen",
+        options=ZONE_COUNT_OPTIONS if stream_zones is None else [stream_zones],
+        value=len(CITY_DATA) if stream_zones is None else stream_zones,
+        disabled=stream_zones is not None,
+        help="Mehr als 10 Zonen ergänzt das Raster um synthetische Mikro-Zonen."
+        if stream_zones is None else "Vom Event-Stream vorgegeben (COCKPIT_STREAM_ZONES).",
+    )
+
+    view_mode = st.sidebar.radio(
+        "Ansicht",
+        ["1 – Echtzeit-Heatmap", "2 – Trend / Analyse", "3 – Reporting"],
+    )
+
+    # Live-Modus: die aktive Ansicht läuft im gewählten Takt als Fragment neu
+    live_mode = st.sidebar.toggle(
+        "🔴 Live-Modus",
+        help="Aktualisiert die Ansicht automatisch mit dem neuesten geteilten Datenstand.",
+    )
+    live_interval = None
+    if live_mode:
+        live_interval = st.sidebar.select_slider(
+            "Live-Intervall (s)",
+            options=LIVE_INTERVAL_OPTIONS,
+            value=10,
+        )
+
+    # =========================================================
+    # LIVE-DATEN LADEN
+    # =========================================================
+    report_store = report_feeds.for_snapshot(load_snapshot(scenario, n_zones, city, profile))
+
+    with st.sidebar:
+        render_sidebar_actions(report_store, scenario, city, persona)
+        render_push_inbox(persona)
+
+    # Nur die aktive Ansicht rendern; ihre eigenen Widgets (und im Live-Modus der Takt)
+    # lösen nur einen Rerun dieses Fragments aus
+    run_every = f"{live_interval}s" if live_interval else None
+    if view_mode.startswith("1"):
+        st.fragment(render_heatmap_view, run_every=run_every)(scenario, n_zones, city, profile, live_interval)
+    elif view_mode.startswith("2"):
+        st.fragment(render_trend_view, run_every=run_every)(
+            scenario, n_zones, city, persona, profile, live_interval
+        )
+    else:
+        st.fragment(render_reporting_view, run_every=run_every)(
+            scenario, n_zones, city, role_label, profile, live_interval
+        )
+
+    render_profiling_panel()
+
+profiler.end_rerun()
@@ -0,0 +1,61 @@
+"""
+Benchmark: Zeitraum-Abfragen auf der Parquet-Historie.
+
+Füllt einen temporären HistoryStore mit `--days` Tagen im 5-Minuten-Takt
+(ein Snapshot pro Bucket) und misst danach die Trend-Abfrage für 1, 7, 30
+und 90 Tage. Ziel: 90 Tage in unter einer Sekunde (über die Tages-Rollups).
+
+    python bench/bench_history.py [--zones 100] [--days 92]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cockpit.data import generate_live_data  # noqa: E402
+from cockpit.history import HistoryStore  # noqa: E402
+
+TARGET_SECONDS_90D = 1.0
+SCENARIO = "Pendler:innen Spitzenzeit"
+
+
+def fill(store: HistoryStore, n_zones: int, days: int, start: datetime) -> float:
+    df_zones = generate_live_data(SCENARIO, n_zones)[0]
+    begin = time.perf_counter()
+    for i in range(days * 24 * 12):
+        store.append_frame(df_zones, SCENARIO, start + timedelta(minutes=5 * i, seconds=30))
+    return time.perf_counter() - begin
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=100)
+    parser.add_argument("--days", type=int, default=92)
+    args = parser.parse_args(argv)
+
+    start = datetime(2026, 1, 1)
+    end = start + timedelta(days=args.days)
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryStore(root)
+        elapsed = fill(store, args.zones, args.days, start)
+        print(f"{args.days} Tage × {args.zones} Zonen geschrieben in {elapsed:.1f}s "
+              f"({store.rows_written:,} Zeilen inkl. Rollups)")
+
+        timings = {}
+        for days in (1, 7, 30, 90):
+            begin = time.perf_counter()
+            trend = store.trend(end - timedelta(days=days), end, SCENARIO, "risk_score")
+            timings[days] = time.perf_counter() - begin
+            print(f"  {days:>3} Tage: {len(trend):>4} Punkte in {timings[days] * 1000:8.1f} ms")
+
+    ok = timings[90] < TARGET_SECONDS_90D
+    print(f"90-Tage-Abfrage {'ok' if ok else 'ZU LANGSAM'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Benchmark: Speicherbedarf von df_zones, df_map und df_fleet pro Zone.
+
+Vergleicht das kompakte Datenmodell (Categorical, int16/float32, df_map
+als geteilte Sicht plus uint8-RGBA) mit der bisherigen Darstellung
+(Objekt-Strings, int64/float64, df_map als Kopie mit Python-Listen als
+Farbe). Gezählt wird wie im Daten-Cache: geteilte Puffer nur einmal.
+
+    python bench/bench_memory.py [--zones 10 1000 10000]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cockpit.cache import frames_nbytes  # noqa: E402
+from cockpit.data import COLOR_COLUMNS, generate_live_data  # noqa: E402
+
+SCENARIO = "Pendler:innen Spitzenzeit"
+
+
+def legacy_frames(df_zones, df_map, df_fleet):
+    """Dieselben Daten in der bisherigen Darstellung."""
+    wide = {
+        "zone": object,
+        "lat": np.float64,
+        "lon": np.float64,
+        "risk_score": np.float64,
+        "incidents_5min": np.int64,
+        "incidents_30min": np.int64,
+        "incidents_24h": np.int64,
+        "blocked_min": np.float64,
+        "low_battery": np.int64,
+    }
+    old_zones = df_zones.astype(wide)
+    old_map = old_zones.copy()
+    old_map["color"] = df_map[COLOR_COLUMNS].to_numpy().astype(np.int64).tolist()
+    old_fleet = df_fleet.astype({"zone": object, "count": np.int64})
+    return old_zones, old_map, old_fleet
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, nargs="+", default=[10, 1000, 10000])
+    args = parser.parse_args(argv)
+
+    print(f"{'Zonen':>7} {'vorher B/Zone':>14} {'nachher B/Zone':>15} {'Faktor':>7}")
+    for n_zones in args.zones:
+        df_zones, _, df_map, _, df_fleet, _ = generate_live_data(SCENARIO, n_zones)
+        before = frames_nbytes(legacy_frames(df_zones, df_map, df_fleet))
+        after = frames_nbytes((df_zones, df_map, df_fleet))
+        print(f"{n_zones:>7} {before / n_zones:>14,.0f} {after / n_zones:>15,.0f} "
+              f"{before / after:>6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Benchmark: Ingest-Rate des TimeWheel für die Incident-Fenster.
+
+Simuliert einen Event-Strom über 26 Stunden (die 24-h-Fenster laufen also
+voll und verfallen laufend) und misst Events pro Sekunde auf einem Kern,
+einmal Event für Event (`add`) und einmal blockweise (`add_many`).
+
+    python bench/bench_windows.py [--zones 10000] [--events 2000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from cockpit.sources import INCIDENT_BUCKET_SECONDS, INCIDENT_WINDOWS  # noqa: E402
+from cockpit.windows import TimeWheel  # noqa: E402
+
+TARGET_EVENTS_PER_SECOND = 100_000
+
+
+def make_events(n_zones: int, n_events: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    span = 26 * 60 * 60
+    ts = np.sort(rng.uniform(0, span, n_events))
+    zones = rng.integers(0, n_zones, n_events)
+    return zones, ts
+
+
+def new_wheel(n_zones: int) -> TimeWheel:
+    return TimeWheel(n_zones, INCIDENT_BUCKET_SECONDS, INCIDENT_WINDOWS[-1], INCIDENT_WINDOWS)
+
+
+def bench_single(n_zones, zones, ts) -> float:
+    wheel = new_wheel(n_zones)
+    add = wheel.add
+    zones_list, ts_list = zones.tolist(), ts.tolist()
+    start = time.perf_counter()
+    for z, t in zip(zones_list, ts_list):
+        add(z, t)
+    return len(ts_list) / (time.perf_counter() - start)
+
+
+def bench_batch(n_zones, zones, ts, batch_size=10_000) -> float:
+    wheel = new_wheel(n_zones)
+    start = time.perf_counter()
+    for i in range(0, len(ts), batch_size):
+        wheel.add_many(zones[i:i + batch_size], ts[i:i + batch_size])
+    return len(ts) / (time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=2_000_000)
+    args = parser.parse_args(argv)
+
+    zones, ts = make_events(args.zones, args.events)
+    results = {
+        "add (einzeln)": bench_single(args.zones, zones, ts),
+        "add_many (Blöcke à 10k)": bench_batch(args.zones, zones, ts),
+    }
+
+    print(f"{args.events:,} Events, {args.zones:,} Zonen, Fenster {INCIDENT_WINDOWS} min")
+    for name, rate in results.items():
+        status = "ok" if rate >= TARGET_EVENTS_PER_SECOND else "ZU LANGSAM"
+        print(f"  {name:<26} {rate:>14,.0f} Events/s  [{status}]")
+    return 0 if min(results.values()) >= TARGET_EVENTS_PER_SECOND else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Last-Test: N gleichzeitige Cockpit-Sessions, headless über Streamlits AppTest.
+
+Jede Session meldet sich an und wechselt pro Rerun (geseedet, also
+reproduzierbar) Ansicht und Szenario. Gemessen werden die Latenz pro Rerun
+(p50/p95/p99, gesamt und pro Ansicht) und der Speicher pro Session
+(RSS-Zuwachs nach dem Aufwärmen geteilt durch die Anzahl Sessions).
+Mit --events-per-second läuft das Cockpit auf einem synthetischen
+Event-Strom (EventStreamSource) statt auf Zufallsdaten.
+
+    python bench/loadtest.py [--sessions 8] [--reruns 20] [--zones 1000]
+                             [--events-per-second 0] [--seed 0]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from cockpit.data import CITY_DATA, SCENARIOS  # noqa: E402
+from cockpit.roles import ROLE_LABEL  # noqa: E402
+from cockpit.scenarios import ScenarioSpec, scenario_seed, write_events  # noqa: E402
+
+APP = os.path.join(ROOT, "app_merged_V2.2.py")
+VIEWS = ["1 – Echtzeit-Heatmap", "2 – Trend / Analyse", "3 – Reporting"]
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Ausserhalb von Linux: Höchststand statt aktuellem Wert
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def set_widget(elements, label, value) -> None:
+    # Gesperrte Widgets (z. B. "Anzahl Zonen" beim Event-Stream) behalten ihren Wert
+    for element in elements:
+        if element.label == label and not element.disabled:
+            element.set_value(value)
+
+
+class Session:
+    """Eine simulierte Cockpit-Session (eigener Session State, geteilte Caches)."""
+
+    def __init__(self, index: int, n_zones: int, seed: int):
+        from streamlit.testing.v1 import AppTest
+
+        self.rng = np.random.default_rng(scenario_seed(f"session-{index}", 0, seed))
+        self.n_zones = n_zones
+        self.app = AppTest.from_file(APP, default_timeout=300)
+        self.app.session_state["logged_in"] = True
+        self.app.session_state["role"] = list(ROLE_LABEL)[index % len(ROLE_LABEL)]
+        self.latencies = []
+
+    def rerun(self, view: str = None, scenario: str = None) -> float:
+        view = view or VIEWS[self.rng.integers(len(VIEWS))]
+        scenario = scenario or SCENARIOS[self.rng.integers(len(SCENARIOS))]
+        if self.app.sidebar.radio:
+            set_widget(self.app.sidebar.radio, "Ansicht", view)
+            set_widget(self.app.sidebar.selectbox, "Szenario", scenario)
+            set_widget(self.app.sidebar.select_slider, "Anzahl Zonen", self.n_zones)
+        start = time.perf_counter()
+        self.app.run()
+        elapsed = time.perf_counter() - start
+        if self.app.exception:
+            raise RuntimeError(self.app.exception[0].message)
+        self.latencies.append((view, elapsed))
+        return elapsed
+
+
+def stream_events(path: str, events_per_second: float, seed: int, stop: threading.Event) -> None:
+    """Schreibt jede Sekunde die Events der letzten Sekunde in die NDJSON-Datei."""
+    spec = ScenarioSpec(SCENARIOS[0], len(CITY_DATA), events_per_second, base_seed=seed)
+    with open(path, "a", encoding="utf-8") as handle:
+        tick = 0
+        while not stop.is_set():
+            write_events(handle, spec.events(time.time() - 1.0, 1.0, epoch=tick))
+            tick += 1
+            stop.wait(1.0)
+
+
+def percentiles(values) -> str:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    return f"p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   p99 {p99:7.1f} ms"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--zones", type=int, default=1000)
+    parser.add_argument("--events-per-second", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Die App lädt Logos relativ zum Arbeitsverzeichnis
+    os.chdir(ROOT)
+    stop = threading.Event()
+    if args.events_per_second > 0:
+        stream_path = os.path.join(tempfile.mkdtemp(), "events.ndjson")
+        open(stream_path, "w").close()
+        os.environ["COCKPIT_EVENT_STREAM"] = stream_path
+        threading.Thread(
+            target=stream_events,
+            args=(stream_path, args.events_per_second, args.seed, stop),
+            daemon=True,
+        ).start()
+
+    # Aufwärmen: prozessweite Caches (Daten, Aggregate, Indizes) einmal füllen
+    warmup = Session(-1, args.zones, args.seed)
+    warmup.app.run()
+    for view in VIEWS:
+        warmup.rerun(view, SCENARIOS[0])
+    rss_before = rss_bytes()
+
+    sessions = [Session(i, args.zones, args.seed) for i in range(args.sessions)]
+    errors = []
+
+    def drive(session: Session) -> None:
+        try:
+            session.app.run()
+            for _ in range(args.reruns):
+                session.rerun()
+        except Exception as exc:  # noqa: BLE001 – im Report ausgeben
+            errors.append(exc)
+
+    threads = [threading.Thread(target=drive, args=(s,)) for s in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    stop.set()
+    rss_after = rss_bytes()
+
+    latencies = [lat for s in sessions for _, lat in s.latencies]
+    # Beim Event-Stream gibt dessen Raster die Zonen vor, nicht --zones
+    n_zones = len(CITY_DATA) if args.events_per_second > 0 else args.zones
+    print(f"{args.sessions} Sessions × {args.reruns} Reruns, {n_zones:,} Zonen, "
+          f"{args.events_per_second:,.0f} Events/s, Seed {args.seed}")
+    if latencies:
+        print(f"  {'gesamt':<22} {percentiles(latencies)}   ({len(latencies) / wall:.1f} Reruns/s)")
+        for view in VIEWS:
+            per_view = [lat for s in sessions for v, lat in s.latencies if v == view]
+            if per_view:
+                print(f"  {view:<22} {percentiles(per_view)}")
+    print(f"  Speicher pro Session: {(rss_after - rss_before) / args.sessions / 1024 ** 2:.1f} MiB "
+          f"(RSS {rss_after / 1024 ** 2:.0f} MiB)")
+    for exc in errors:
+        print(f"  FEHLER: {exc}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Benchmark-Suite für die heissen Pfade der Datenaufbereitung.
+
+Misst ohne Streamlit (das Paket `cockpit` ist streamlit-frei): Datengenerierung
+bei 10 / 1k / 10k Zonen, für eine Stadt-Partition und für das Datenprofil
+einer Rolle, KPIs, Hotspot-Top-k, Trend-Melt, Flotten-Pivot,
+Batterie-Binning, pydeck-Serialisierung, das Aufwärmen aller Szenarien
+(seriell und im Prozess-Pool), die What-if-Simulation, eine Seite des
+Meldungs-Feeds und den Feedback-Schreibpfad.
+
+Jeder Fall wird auf eine Mindestdauer pro Messung kalibriert und `--repeat`
+mal gemessen; gespeichert werden Minimum und Median pro Aufruf als JSON
+unter bench/results/. Mit --compare wird gegen einen früheren Lauf
+verglichen; Fälle, die um mehr als --threshold langsamer sind, gelten als
+Regression (Exit-Code 1).
+
+    python bench/run_benchmarks.py [--filter pivot] [--label v2.3]
+                                   [--compare bench/results/v2.2.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pydeck as pdk
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from cockpit.aggregates import (  # noqa: E402
+    aggregates_for,
+    compute_fleet_pivot,
+    compute_hotspots,
+    compute_kpis,
+    compute_trend_long,
+)
+from cockpit.battery import BatteryTelemetry, histogram_frame  # noqa: E402
+from cockpit.cache import SharedDataCache  # noqa: E402
+from cockpit.data import SCENARIOS, generate_live_data  # noqa: E402
+from cockpit.feedback import FeedbackStore  # noqa: E402
+from cockpit.pool import ScenarioPool  # noqa: E402
+from cockpit.profiles import PROFILES  # noqa: E402
+from cockpit.reports import ReportQuery, ReportStore  # noqa: E402
+from cockpit.roles import POLIZEI  # noqa: E402
+from cockpit.sources import SyntheticSource  # noqa: E402
+from cockpit.tiles import HeatTilePyramid  # noqa: E402
+from cockpit.whatif import BiasOverride, WhatIfSpec, simulate  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+SCENARIO = "Pendler:innen Spitzenzeit"
+NOW = datetime(2026, 1, 1, 8, 0)
+
+CASES = {}
+
+
+def case(name: str):
+    """Registriert `setup() -> fn`; gemessen wird nur `fn()`."""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def frames(n_zones: int) -> tuple:
+    return generate_live_data(SCENARIO, n_zones, seed=0, now=NOW)
+
+
+for _n in (10, 1_000, 10_000):
+    case(f"generate_live_data[{_n}]")(
+        lambda n=_n: lambda: generate_live_data(SCENARIO, n, seed=0, now=NOW)
+    )
+
+
+@case("generate_live_data[10000, Luzern]")
+def _partition():
+    # Nur die Zufallsströme und Frames der Partition einer Stadt (gleiche Werte wie im
+    # Netz); der Aufwand hängt nur von deren Grösse ab, vgl. generate_live_data[10000]
+    return lambda: generate_live_data(SCENARIO, 10_000, seed=0, now=NOW, city="Luzern")
+
+
+@case("generate_live_data[10000, Polizei]")
+def _profile():
+    # Nur die Frames des Polizei-Profils, ohne Batterie-Histogramme (vgl. generate_live_data[10000])
+    frames = PROFILES[POLIZEI].frames
+    return lambda: generate_live_data(SCENARIO, 10_000, seed=0, now=NOW, frames=frames)
+
+
+@case("kpis[10000]")
+def _kpis():
+    df_zones, _, _, _, df_fleet, df_battery = frames(10_000)
+    return lambda: compute_kpis(df_zones, df_fleet, df_battery)
+
+
+@case("hotspots_top_k[10000]")
+def _hotspots():
+    df_zones = frames(10_000)[0]
+    return lambda: compute_hotspots(df_zones)
+
+
+@case("trend_melt")
+def _trend():
+    df_trend = frames(10)[1]
+    return lambda: compute_trend_long(df_trend)
+
+
+@case("fleet_pivot[10000]")
+def _pivot():
+    df_fleet = frames(10_000)[4]
+    return lambda: compute_fleet_pivot(df_fleet)
+
+
+@case("battery_binning[100k pings]")
+def _battery():
+    rng = np.random.default_rng(0)
+    zones = rng.integers(0, 10_000, 100_000)
+    levels = rng.uniform(0, 100, 100_000)
+
+    def run():
+        telemetry = BatteryTelemetry(10_000)
+        telemetry.add_levels(zones, levels)
+        return histogram_frame(telemetry.histogram(), 5), telemetry.low_counts()
+    return run
+
+
+@case("pydeck_serialize[1000]")
+def _pydeck():
+    df_map = frames(1_000)[2]
+    df_heat = HeatTilePyramid.from_frame(df_map, weight="risk_score").cells(7.2)
+
+    def run():
+        deck = pdk.Deck(
+            initial_view_state=pdk.ViewState(latitude=47.0, longitude=8.2, zoom=7.2),
+            layers=[
+                pdk.Layer("HeatmapLayer", data=df_heat, get_position="[lon, lat]",
+                          get_weight="weight"),
+                pdk.Layer("ScatterplotLayer", data=df_map, get_position="[lon, lat]",
+                          get_fill_color="[r, g, b, a]"),
+            ],
+        )
+        return deck.to_json()
+    return run
+
+
+@case("warm_scenarios[4x10000, seriell]")
+def _warm_serial():
+    # Aggregate wie in der App direkt nach dem Veröffentlichen (der Pool liefert sie mit)
+    cache = SharedDataCache(loader=SyntheticSource())
+    cache.subscribe(aggregates_for)
+    return lambda: cache.refresh_many(SCENARIOS, [10_000])
+
+
+@case("warm_scenarios[4x10000, Pool]")
+def _warm_pool():
+    # Ein Worker pro Szenario (höchstens einer pro Kern); Start der Worker zählt nicht mit
+    pool = ScenarioPool(SyntheticSource(), min(len(SCENARIOS), os.cpu_count() or 1))
+    cache = SharedDataCache(loader=SyntheticSource(), pool=pool)
+    cache.refresh_many(SCENARIOS, [10])
+    return lambda: cache.refresh_many(SCENARIOS, [10_000])
+
+
+@case("whatif[1000 Zonen x 10000 Läufe]")
+def _whatif():
+    # Ziel < 1 s; gemessen ca. 0.41–0.45 s (1 Kern, vorher mit np.percentile
+    # und vollem Schritte-Array 1.08 s)
+    df_zones = frames(1_000)[0]
+    spec = WhatIfSpec(overrides=(BiasOverride("Bern Wankdorf", 1.0, 20.0),), runs=10_000)
+    return lambda: simulate(df_zones, SCENARIO, spec)
+
+
+@case("report_page[100k Meldungen]")
+def _report_page():
+    store = ReportStore()
+    for k in range(20):
+        store.add_frame(generate_live_data(SCENARIO, 1_000, n_reports=5_000, seed=k, now=NOW)[3])
+    query = ReportQuery(role=POLIZEI, city="Bern", text="Scooter")
+    return lambda: store.page(query, offset=40, limit=20)
+
+
+@case("feedback_append[100]")
+def _feedback():
+    directory = tempfile.mkdtemp()
+    store = FeedbackStore(os.path.join(directory, "feedback.db"), legacy_xlsx=None)
+    entry = {
+        "timestamp": "2026-01-01 08:00:00",
+        "happiness_usage": 4,
+        "usability": 5,
+        "happiness_methods": 3,
+        "comments": "Benchmark",
+    }
+
+    def run():
+        for _ in range(100):
+            store.append(entry)
+    return run
+
+
+def measure(fn, repeat: int, min_time: float) -> dict:
+    """Kalibriert die Aufrufe pro Messung auf `min_time` und misst `repeat` Mal."""
+    fn()  # Aufwärmen (Caches, Imports)
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return {"min": min(timings), "median": statistics.median(timings), "number": number,
+            "repeat": repeat}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unbekannt"
+
+
+def format_time(seconds: float) -> str:
+    for unit, factor in (("s", 1), ("ms", 1e3), ("µs", 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:8.2f} {unit}"
+    return f"{seconds * 1e9:8.0f} ns"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filter", default="", help="nur Fälle, deren Name dies enthält")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Sekunden pro Messung")
+    parser.add_argument("--label", help="Dateiname unter bench/results/ (Standard: Git-Revision)")
+    parser.add_argument("--compare", help="früheres Ergebnis (JSON) als Referenz")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="ab diesem Faktor langsamer gilt ein Fall als Regression")
+    args = parser.parse_args(argv)
+
+    revision = git_revision()
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    regressions = []
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(setup(), args.repeat, args.min_time)
+        line = f"{name:<30} {format_time(result['min'])}  (Median {format_time(result['median']).strip()})"
+        if name in baseline:
+            ratio = result["min"] / baseline[name]["min"]
+            flag = "REGRESSION" if ratio > args.threshold else ""
+            line += f"  {ratio:5.2f}x {flag}"
+            if flag:
+                regressions.append(name)
+        print(line)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.label or revision}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "revision": revision,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "numpy": np.__version__,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Ergebnisse gespeichert: {os.path.relpath(path)}")
+    if regressions:
+        print(f"{len(regressions)} Regression(en): {', '.join(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+Datenschicht des Safety Heatmap Cockpits.
+
+Die Module in diesem Paket importieren bewusst kein Streamlit, damit sie
+auch headless (Benchmarks, Hintergrund-Threads, Worker-Prozesse) laufen.
+"""
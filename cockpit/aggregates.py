@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cockpit.battery import LOW_BATTERY_PCT, histogram_quantile, histogram_frame
+from cockpit.spatial import top_k
+from cockpit.tables import project, to_arrow
+
+KENNZAHL_LABELS = {
+    "rides": "Fahrten",
+    "reports": "Meldungen (Nutzer:innen)",
+    "tech_issues": "Technische Issues",
+}
+
+HOTSPOT_COLUMNS = {
+    "zone": "Zone",
+    "risk_label": "Risiko",
+    "incidents_30min": "Incidents 30min",
+    "blocked_min": "Blockiert (min)",
+    "incidents_24h": "Incidents 24h",
+}
+
+# Batterie-Histogramm: 20 Klassen à 5 % (wie bisher alt.Bin(maxbins=20))
+BATTERY_CHART_BIN_PCT = 5
+
+N_HOTSPOTS = 6
+N_RISK_BARS = 15
+N_REBALANCING = 10
+
+# Name der Aggregate in `Snapshot.derived` (ScenarioPool liefert sie vorberechnet mit)
+AGGREGATES_KEY = "aggregates"
+
+
+@dataclass(frozen=True)
+class ChartAggregates:
+    """
+    Darstellungsfertige Daten eines Snapshots. Wird einmal pro Snapshot
+    berechnet und von allen Sessions geteilt; die Views lesen nur noch.
+
+    Die Tabellen sind Arrow-Tabellen: st.dataframe und Altair übernehmen
+    sie ohne Umweg über pandas, umbenannte oder ausgewählte Spalten sind
+    Sichten auf dieselben Buffer. Fehlt dem Snapshot ein Frame (Datenprofil
+    der Rolle), sind die daraus abgeleiteten Tabellen None.
+    """
+
+    kpis: dict
+    hotspots: pa.Table
+    trend_long: pa.Table
+    risk_bar: pa.Table
+    fleet_pivot: pa.Table
+    battery_hist: pa.Table
+    rebalancing: pa.Table
+
+
+def _used_zones(df: pd.DataFrame, column: str) -> pd.DataFrame:
+    # Kleine Auszüge nicht mit allen Zonen-Kategorien des Rasters an den Browser schicken
+    return df.assign(**{column: df[column].cat.remove_unused_categories()})
+
+
+def compute_kpis(df_zones, df_fleet, df_battery=None) -> dict:
+    # df_battery ist ein Histogramm in 1-%-Klassen, keine Rohwerte. Ohne
+    # df_battery kommt der Anteil aus df_zones, die Quantile fehlen dann
+    if df_battery is not None:
+        counts = df_battery["count"].to_numpy()
+        total = counts.sum()
+        n_low = counts[df_battery["bin_start"].to_numpy() < LOW_BATTERY_PCT].sum()
+    else:
+        counts = None
+        total = df_fleet["count"].sum()
+        n_low = df_zones["low_battery"].sum()
+    return {
+        "global_safety_index": int(
+            np.clip(
+                100 - df_zones["risk_score"].mean() * 18 - df_zones["blocked_min"].mean() / 4,
+                0,
+                100,
+            )
+        ),
+        "num_critical": int((df_zones["risk_label"] == "kritisch").sum()),
+        "num_high": int((df_zones["risk_label"] == "hoch").sum()),
+        "avg_blocked": int(df_zones["blocked_min"].mean()),
+        "total_scooters": int(df_fleet["count"].sum()),
+        "share_low_battery": int(n_low / total * 100) if total else 0,
+        "battery_p10": None if counts is None else histogram_quantile(counts, 0.10),
+        "battery_median": None if counts is None else histogram_quantile(counts, 0.50),
+    }
+
+
+def compute_hotspots(df_zones, k: int = N_HOTSPOTS) -> pa.Table:
+    hot_idx = top_k(
+        [df_zones["risk_score"], df_zones["incidents_30min"], df_zones["blocked_min"]], k
+    )
+    df_hot = _used_zones(df_zones.iloc[hot_idx], "zone")
+    return project(to_arrow(df_hot), HOTSPOT_COLUMNS)
+
+
+def compute_trend_long(df_trend) -> pa.Table:
+    # Long-Format als ein Chunk pro Kennzahl; die Chunks zeigen auf die Spalten der breiten Tabelle
+    wide = to_arrow(df_trend)
+    labels = pa.array(list(KENNZAHL_LABELS.values()))
+    chunks = []
+    for k, column in enumerate(KENNZAHL_LABELS):
+        kennzahl = pa.DictionaryArray.from_arrays(pa.array(np.full(len(df_trend), k, dtype=np.int8)), labels)
+        chunks.append(
+            pa.table(
+                {
+                    "timestamp": wide["timestamp"],
+                    "Kennzahl": kennzahl,
+                    "Wert": wide[column].cast(pa.float64()),
+                }
+            )
+        )
+    return pa.concat_tables(chunks)
+
+
+def compute_risk_bar(df_zones, n: int = N_RISK_BARS) -> pa.Table:
+    # Bei grossen Rastern nur die riskantesten Zonen als Balken zeigen
+    table = to_arrow(_used_zones(df_zones.nlargest(n, "risk_score")[["zone", "risk_score"]], "zone"))
+    # Achsentitel als zweiter Name derselben Spalte
+    return table.append_column("Risiko-Score", table["risk_score"])
+
+
+def compute_fleet_pivot(df_fleet) -> pa.Table:
+    """
+    Scooter pro Zone (Zeilen) und Status (Spalten) wie `pivot_table(...,
+    observed=True)`, aber als ein `np.bincount` über die Kategorien-Codes.
+    """
+    zone, status = df_fleet["zone"].cat, df_fleet["status"].cat
+    n_zones, n_status = len(zone.categories), len(status.categories)
+    codes = zone.codes.to_numpy().astype(np.int64) * n_status + status.codes.to_numpy()
+    counts = np.bincount(codes, weights=df_fleet["count"], minlength=n_zones * n_status)
+    counts = counts.reshape(n_zones, n_status).astype(np.int64)
+    present = np.bincount(codes, minlength=n_zones * n_status).reshape(n_zones, n_status)
+
+    rows = np.flatnonzero(present.any(axis=1))
+    columns = {"zone": pa.array(np.asarray(zone.categories, dtype=object)[rows], pa.string())}
+    for k in np.flatnonzero(present.any(axis=0)):
+        columns[str(status.categories[k])] = counts[rows, k]
+    return pa.table(columns)
+
+
+def compute_rebalancing(df_zones, k: int = N_REBALANCING) -> pa.Table:
+    """Zonen mit den meisten Scootern unter 20 % Batterie."""
+    idx = top_k([df_zones["low_battery"]], k)
+    df = _used_zones(df_zones.iloc[idx][["zone", "low_battery"]], "zone")
+    return project(
+        to_arrow(df[df["low_battery"] > 0]),
+        {"zone": "Zone", "low_battery": f"Scooter < {LOW_BATTERY_PCT}%"},
+    )
+
+
+def compute_aggregates(frames) -> ChartAggregates:
+    df_zones, df_trend, df_map, df_reports, df_fleet, df_battery = frames
+    return ChartAggregates(
+        kpis=compute_kpis(df_zones, df_fleet, df_battery),
+        hotspots=compute_hotspots(df_zones),
+        trend_long=None if df_trend is None else compute_trend_long(df_trend),
+        risk_bar=compute_risk_bar(df_zones),
+        fleet_pivot=compute_fleet_pivot(df_fleet),
+        battery_hist=None if df_battery is None
+        else to_arrow(histogram_frame(df_battery["count"], BATTERY_CHART_BIN_PCT)),
+        rebalancing=compute_rebalancing(df_zones),
+    )
+
+
+def aggregates_for(snapshot) -> ChartAggregates:
+    """Aggregate eines Snapshots (einmal berechnet, danach nur Lookup)."""
+    return snapshot.derived(AGGREGATES_KEY, lambda: compute_aggregates(snapshot.frames))
+
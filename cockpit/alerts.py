@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cockpit.data import ALL_CITIES
+from cockpit.roles import LEITSTELLE, OEV_PLANUNG, POLIZEI, STADTVERWALTUNG
+
+
+def _incident_spike(df_zones: pd.DataFrame) -> np.ndarray:
+    """Verhältnis der 5-Minuten-Rate zur mittleren Rate der letzten 30 Minuten."""
+    rate_5 = df_zones["incidents_5min"].to_numpy(dtype=float)
+    rate_30 = df_zones["incidents_30min"].to_numpy(dtype=float) / 6.0
+    return rate_5 / np.maximum(rate_30, 1.0)
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """
+    Schwellwert-Regel mit Hysterese: löst aus, sobald der Wert `on`
+    erreicht, und wird erst wieder scharf, wenn er unter `off` fällt.
+    `value` ist ein Spaltenname von df_zones oder eine Funktion df -> Array.
+    """
+
+    name: str
+    title: str
+    value: object
+    on: float
+    off: float
+    roles: tuple
+
+    def values(self, df_zones: pd.DataFrame) -> np.ndarray:
+        if callable(self.value):
+            return np.asarray(self.value(df_zones), dtype=float)
+        return df_zones[self.value].to_numpy(dtype=float)
+
+
+DEFAULT_RULES = (
+    AlertRule("kritisch", "Zone kritisch", "risk_score", on=4, off=3,
+              roles=(LEITSTELLE, POLIZEI)),
+    AlertRule("blockiert", "Lange Blockierung", "blocked_min", on=45, off=35,
+              roles=(LEITSTELLE, STADTVERWALTUNG, OEV_PLANUNG)),
+    AlertRule("spike", "Incident-Spitze", _incident_spike, on=3.0, off=1.5,
+              roles=(LEITSTELLE, POLIZEI)),
+)
+
+
+@dataclass(frozen=True)
+class Alert:
+    rule: str
+    title: str
+    zone: str
+    value: float
+    roles: tuple
+    scenario: str
+    raised_at: datetime
+
+
+class _ZoneState:
+    """Aktiv-Flags aller Regeln für ein (scenario, n_zones)."""
+
+    def __init__(self, zones: pd.Index, n_rules: int):
+        self.zones = zones
+        self.active = np.zeros((n_rules, len(zones)), dtype=bool)
+
+    def align(self, zones: pd.Index) -> None:
+        # Zonen haben sich geändert (z. B. andere Quelle): Flags per Name übernehmen
+        if self.zones.equals(zones):
+            return
+        positions = self.zones.get_indexer(zones)
+        active = np.zeros((self.active.shape[0], len(zones)), dtype=bool)
+        known = positions >= 0
+        active[:, known] = self.active[:, positions[known]]
+        self.zones, self.active = zones, active
+
+
+class AlertEngine:
+    """
+    Flankengesteuerte Alarmierung auf Basis der Zonen-Frames.
+
+    Pro Datenaktualisierung wird jede Regel einmal vektorisiert über alle
+    Zonen ausgewertet und nur mit dem vorherigen Zustand verglichen – es
+    wird keine Historie gelesen. Alarme entstehen nur beim Übergang von
+    "inaktiv" zu "aktiv"; erst nach Unterschreiten der `off`-Schwelle kann
+    dieselbe Zone wieder alarmieren.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, history: int = 500):
+        self.rules = tuple(rules)
+        self._states: dict = {}
+        self._recent = deque(maxlen=history)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback) -> None:
+        """`callback(alerts)` wird nach jeder Auswertung mit neuen Alarmen aufgerufen."""
+        self._listeners.append(callback)
+
+    def evaluate(self, df_zones: pd.DataFrame, scenario: str = "", raised_at: datetime = None) -> list:
+        raised_at = raised_at or datetime.now()
+        zones = pd.Index(df_zones["zone"])
+        alerts = []
+        with self._lock:
+            key = (scenario, len(zones))
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = _ZoneState(zones, len(self.rules))
+            else:
+                state.align(zones)
+
+            for k, rule in enumerate(self.rules):
+                values = rule.values(df_zones)
+                active = state.active[k]
+                fired = ~active & (values >= rule.on)
+                cleared = active & (values < rule.off)
+                state.active[k] = (active | fired) & ~cleared
+
+                for i in np.flatnonzero(fired):
+                    alerts.append(Alert(rule.name, rule.title, zones[i], float(values[i]),
+                                        rule.roles, scenario, raised_at))
+            self._recent.extend(alerts)
+
+        if alerts:
+            for callback in self._listeners:
+                callback(alerts)
+        return alerts
+
+    def on_snapshot(self, snapshot) -> list:
+        """Einstieg für `SharedDataCache.subscribe`."""
+        # Stadt-Partitionen sind Teilmengen des ganzen Netzes: nicht doppelt alarmieren
+        if snapshot.city != ALL_CITIES:
+            return []
+        return self.evaluate(snapshot.frames[0], snapshot.scenario, snapshot.created_at)
+
+    def recent(self, role: str = None, scenario: str = None, limit: int = 5) -> list:
+        """Neueste Alarme (jüngste zuerst), optional gefiltert nach Rolle und Szenario."""
+        with self._lock:
+            result = []
+            for alert in reversed(self._recent):
+                if role is not None and role not in alert.roles:
+                    continue
+                if scenario is not None and alert.scenario != scenario:
+                    continue
+                result.append(alert)
+                if len(result) == limit:
+                    break
+            return result
+
+
+class ActiveScenarios:
+    """
+    Szenarien, die Sessions innerhalb von `ttl_seconds` angezeigt haben.
+
+    Der Refresher rechnet alle Szenarien durch, auch hypothetische, die
+    gerade niemand betrachtet; Alarme werden nur für aktive versendet.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0):
+        self._ttl = ttl_seconds
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, scenario: str) -> None:
+        with self._lock:
+            self._seen[scenario] = time.monotonic()
+
+    def __contains__(self, scenario: str) -> bool:
+        with self._lock:
+            seen = self._seen.get(scenario)
+        return seen is not None and time.monotonic() - seen <= self._ttl
@@ -0,0 +1,162 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Batterielevel liegen in [0, 100] – feste 1-%-Klassen genügen als Sketch:
+# Quantile sind auf ±0.5 Prozentpunkte genau, und zwei Histogramme lassen
+# sich durch einfache Addition zusammenführen.
+BATTERY_BIN_PCT = 1
+N_BATTERY_BINS = 100 // BATTERY_BIN_PCT
+BATTERY_EDGES = np.linspace(0, 100, N_BATTERY_BINS + 1)
+
+LOW_BATTERY_PCT = 20
+
+
+def level_bin(level):
+    """Klassenindex eines oder mehrerer Batterielevel (100 % zählt zur obersten Klasse)."""
+    return np.clip(np.asarray(level) // BATTERY_BIN_PCT, 0, N_BATTERY_BINS - 1).astype(np.int64)
+
+
+def histogram_quantile(counts, q: float) -> float:
+    """Quantil aus einem Klassen-Histogramm, linear innerhalb der Klasse interpoliert."""
+    counts = np.asarray(counts)
+    total = counts.sum()
+    if total == 0:
+        return float("nan")
+    cumulative = np.cumsum(counts)
+    target = q * total
+    k = int(np.searchsorted(cumulative, target, side="left"))
+    k = min(k, len(counts) - 1)
+    before = cumulative[k - 1] if k > 0 else 0
+    fraction = (target - before) / counts[k] if counts[k] else 0.0
+    return float(BATTERY_EDGES[k] + fraction * BATTERY_BIN_PCT)
+
+
+def histogram_frame(counts, bin_pct: int = BATTERY_BIN_PCT) -> pd.DataFrame:
+    """Histogramm als (bin_start, bin_end, count); `bin_pct` vergröbert die Klassen."""
+    counts = np.asarray(counts)
+    group = bin_pct // BATTERY_BIN_PCT
+    coarse = counts.reshape(-1, group).sum(axis=1)
+    edges = BATTERY_EDGES[::group]
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": coarse})
+
+
+def synthetic_levels_pvals(loc: float = 65.0, scale: float = 18.0) -> np.ndarray:
+    """Klassenwahrscheinlichkeiten einer auf [0, 100] abgeschnittenen Normalverteilung."""
+    z = (BATTERY_EDGES - loc) / (scale * math.sqrt(2))
+    cdf = 0.5 * (1 + np.array([math.erf(v) for v in z]))
+    # Abgeschnittene Masse landet wie bei np.clip in der Rand-Klasse
+    cdf[0], cdf[-1] = 0.0, 1.0
+    return np.diff(cdf)
+
+
+def synthetic_low_counts(rng, totals, pvals, low_pct: int = LOW_BATTERY_PCT) -> np.ndarray:
+    """Scooter unter `low_pct` pro Zone, ohne das ganze Histogramm zu ziehen (eine Binomial-Ziehung)."""
+    return rng.binomial(totals, pvals[: low_pct // BATTERY_BIN_PCT].sum())
+
+
+def synthetic_histograms(rng, totals, low_counts, pvals, low_pct: int = LOW_BATTERY_PCT) -> np.ndarray:
+    """
+    Histogramme pro Zone (Zonen × Klassen) passend zu `synthetic_low_counts`:
+    die Klassen unter und über `low_pct` werden getrennt gezogen, bedingt
+    auf die schon gezogene Anzahl. Zusammen ist das dieselbe Verteilung wie
+    eine Multinomial-Ziehung über alle Klassen.
+    """
+    k = low_pct // BATTERY_BIN_PCT
+    p_low = pvals[:k].sum()
+    low = rng.multinomial(low_counts, pvals[:k] / p_low)
+    high = rng.multinomial(np.asarray(totals) - low_counts, pvals[k:] / (1 - p_low))
+    return np.concatenate([low, high], axis=1)
+
+
+class BatteryTelemetry:
+    """
+    Batterie-Telemetrie der Flotte mit beschränktem Speicher.
+
+    Pro Zone wird ein Histogramm mit 1-%-Klassen geführt (Zonen × 100
+    Zähler), dazu die Klasse jedes Scooters, damit ein neuer Ping den alten
+    Stand ersetzt statt ihn doppelt zu zählen. Rohwerte werden nicht
+    gespeichert; der Speicher wächst nur mit Zonen und Flottengrösse, nicht
+    mit der Anzahl Pings. Histogramme sind über `merge` kombinierbar
+    (z. B. mehrere Ingest-Prozesse oder Teilflotten).
+    """
+
+    def __init__(self, n_zones: int, low_pct: int = LOW_BATTERY_PCT):
+        self.n_zones = n_zones
+        self.low_pct = low_pct
+        self.counts = np.zeros((n_zones, N_BATTERY_BINS), dtype=np.int32)
+        self._scooters: dict = {}      # Scooter-ID -> (zone_idx, bin)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_counts(cls, counts, low_pct: int = LOW_BATTERY_PCT) -> "BatteryTelemetry":
+        counts = np.asarray(counts)
+        telemetry = cls(counts.shape[0], low_pct)
+        telemetry.counts[:] = counts
+        return telemetry
+
+    # ---------------------------------------------------------
+    # Einspeisen
+    # ---------------------------------------------------------
+    def update(self, scooter, zone_idx: int, level: float) -> None:
+        """Neuer Ping eines Scooters in O(1); ersetzt dessen letzten Stand."""
+        k = int(level_bin(level))
+        with self._lock:
+            previous = self._scooters.get(scooter)
+            if previous is not None:
+                self.counts[previous] -= 1
+            self.counts[zone_idx, k] += 1
+            self._scooters[scooter] = (zone_idx, k)
+
+    def replace(self, previous, zone_idx: int, level: float) -> tuple:
+        """
+        Wie `update` für Aufrufer, die den Stand ihrer Scooter selbst führen:
+        nimmt die Zelle `previous` (zone_idx, Klasse; None für neue Scooter)
+        heraus und liefert die neue Zelle zum Merken.
+        """
+        cell = (zone_idx, int(level_bin(level)))
+        with self._lock:
+            if previous is not None:
+                self.counts[previous] -= 1
+            self.counts[cell] += 1
+        return cell
+
+    def remove(self, scooter) -> None:
+        with self._lock:
+            previous = self._scooters.pop(scooter, None)
+            if previous is not None:
+                self.counts[previous] -= 1
+
+    def add_levels(self, zone_idx, levels) -> None:
+        """Anonyme Messwerte gesammelt einzählen (ohne Scooter-Zuordnung)."""
+        with self._lock:
+            np.add.at(self.counts, (np.asarray(zone_idx), level_bin(levels)), 1)
+
+    def merge(self, other: "BatteryTelemetry") -> None:
+        with self._lock:
+            self.counts += other.counts
+
+    # ---------------------------------------------------------
+    # Abfragen
+    # ---------------------------------------------------------
+    def histogram(self, zone_idx=None) -> np.ndarray:
+        """Flottenweites Histogramm oder das einer bzw. mehrerer Zonen."""
+        counts = self.counts if zone_idx is None else self.counts[np.atleast_1d(zone_idx)]
+        return counts.sum(axis=0)
+
+    def quantile(self, q: float, zone_idx=None) -> float:
+        return histogram_quantile(self.histogram(zone_idx), q)
+
+    def low_counts(self) -> np.ndarray:
+        """Scooter unter `low_pct` pro Zone (für das Rebalancing)."""
+        return self.counts[:, : self.low_pct // BATTERY_BIN_PCT].sum(axis=1)
+
+    def share_low(self) -> float:
+        total = self.counts.sum()
+        return float(self.low_counts().sum() / total) if total else 0.0
+
+    def frame(self) -> pd.DataFrame:
+        """Flottenweites Histogramm in 1-%-Klassen (ersetzt die Rohwerte in df_battery)."""
+        return histogram_frame(self.histogram())
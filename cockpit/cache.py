@@ -0,0 +1,549 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cockpit.data import ALL_CITIES, ALL_FRAMES, CORE_FRAMES, FRAME_NAMES
+from cockpit.sources import SyntheticSource
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Unveränderlicher Datenstand eines Szenarios (ganzes Netz oder die
+    Partition einer Stadt, siehe `city`).
+
+    Lässt sich wie das bisherige Tupel entpacken:
+    df_zones, df_trend, df_map, df_reports, df_fleet, df_battery = snapshot
+
+    Nicht generierte Frames (siehe `frame_names`) sind None. `nbytes` zählt
+    die Frames, `derived_nbytes` die über `derived` gemerkten Objekte.
+    """
+
+    scenario: str
+    n_zones: int
+    epoch: int
+    frames: tuple
+    created_at: datetime = field(default_factory=datetime.now)
+    nbytes: int = 0
+    city: str = ALL_CITIES
+    _derived: dict = field(default_factory=dict, compare=False, repr=False)
+    # Ein Lock pro Name: verschiedene Objekte entstehen parallel, gleiche nur einmal
+    _derived_locks: dict = field(default_factory=dict, compare=False, repr=False)
+    _derived_lock: threading.Lock = field(default_factory=threading.Lock, compare=False, repr=False)
+    # Grösse pro abgeleitetem Objekt und Rückrufe `(snapshot, nbytes)` bei neuen Objekten
+    _derived_sizes: dict = field(default_factory=dict, compare=False, repr=False)
+    _size_listeners: list = field(default_factory=list, compare=False, repr=False)
+    _size_lock: threading.Lock = field(default_factory=threading.Lock, compare=False, repr=False)
+
+    def __post_init__(self):
+        for name, value in self._derived.items():
+            self._derived_sizes[name] = object_nbytes(value)
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    @property
+    def key(self) -> tuple:
+        return (self.scenario, self.n_zones, self.city)
+
+    @property
+    def frame_names(self) -> frozenset:
+        return frozenset(name for name, df in zip(FRAME_NAMES, self.frames) if df is not None)
+
+    def covers(self, frames) -> bool:
+        return frozenset(frames) <= self.frame_names
+
+    def derived(self, name: str, factory):
+        """
+        Einmal pro Snapshot berechnetes Zusatzobjekt (z. B. ein Index), das
+        sich alle Sessions teilen. `factory` wird höchstens einmal aufgerufen
+        und darf selbst weitere abgeleitete Objekte anfordern. Gesperrt wird
+        nur der Name: eine langsame Berechnung hält andere nicht auf, wer
+        denselben Namen anfordert, wartet auf ihr Ergebnis.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                name_lock = self._derived_locks.setdefault(name, threading.RLock())
+            with name_lock:
+                value = self._derived.get(name)
+                if value is None:
+                    value = self._derived[name] = factory()
+                    self._add_size(name, object_nbytes(value))
+        return value
+
+    @property
+    def derived_nbytes(self) -> int:
+        with self._size_lock:
+            return sum(self._derived_sizes.values())
+
+    def watch_size(self, callback) -> int:
+        """Meldet künftig neue abgeleitete Objekte an `callback`; liefert die bisherige Gesamtgrösse."""
+        with self._size_lock:
+            self._size_listeners.append(callback)
+            return self.nbytes + sum(self._derived_sizes.values())
+
+    def _add_size(self, name: str, nbytes: int) -> None:
+        with self._size_lock:
+            self._derived_sizes[name] = nbytes
+            listeners = list(self._size_listeners)
+        for callback in listeners:
+            callback(self, nbytes)
+
+    @property
+    def age_seconds(self) -> float:
+        return (datetime.now() - self.created_at).total_seconds()
+
+
+def _column_buffers(column: pd.Series):
+    """(Schlüssel, Bytes) der Puffer einer Spalte; gleiche Schlüssel = geteilter Speicher."""
+    values = column.array
+    if isinstance(values, pd.Categorical):
+        codes = values.codes
+        yield ("codes", codes.__array_interface__["data"][0], codes.nbytes), codes.nbytes
+        categories = values.categories
+        yield ("categories", id(categories)), int(categories.memory_usage(deep=True))
+    elif isinstance(column.dtype, np.dtype) and column.dtype != object:
+        array = column.to_numpy()
+        yield ("array", array.__array_interface__["data"][0], array.nbytes), array.nbytes
+    else:
+        yield ("column", id(values)), int(column.memory_usage(deep=True, index=False))
+
+
+def object_nbytes(value, _seen=None) -> int:
+    """
+    Ungefährer Speicherbedarf eines abgeleiteten Objekts: Arrow- und
+    NumPy-Puffer, DataFrames sowie Container und Attribute, die sie halten.
+    Mehrfach referenzierte Objekte zählen einmal.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen or isinstance(value, Snapshot):
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pa.Table, pa.RecordBatch, pa.Array, pa.ChunkedArray)):
+        return int(value.nbytes)
+    if isinstance(value, pa.Buffer):
+        return value.size
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return frames_nbytes([value])
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(object_nbytes(v, seen) for v in value.values())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(object_nbytes(v, seen) for v in value)
+    attributes = getattr(value, "__dict__", None)
+    return sum(object_nbytes(v, seen) for v in attributes.values()) if attributes else 0
+
+
+def frames_nbytes(frames) -> int:
+    """
+    Speicherbedarf eines Frame-Tupels (deep, inkl. Strings). Puffer, die sich
+    mehrere Frames teilen (df_map mit df_zones, Zonen-Kategorien), zählen
+    nur einmal.
+    """
+    seen = set()
+    total = 0
+    for df in frames:
+        if df is None:
+            continue
+        total += int(df.index.memory_usage(deep=True))
+        for name in df.columns:
+            for key, nbytes in _column_buffers(df[name]):
+                if key not in seen:
+                    seen.add(key)
+                    total += nbytes
+    return total
+
+
+class SharedDataCache:
+    """
+    Prozessweiter Cache für die sechs Live-Daten-Frames.
+
+    Pro (scenario, n_zones, city) wird der jeweils neueste Snapshot
+    gehalten; `city` wählt die Partition einer Stadt, Standard ist das ganze
+    Netz. Der Epoch-Zähler pro Szenario wird bei jedem Neuladen erhöht; ein
+    Snapshot ist damit eindeutig über (scenario, n_zones, city, epoch)
+    bestimmt.
+    Einträge verfallen für `get` nach `ttl_seconds` und werden nur erneuert,
+    solange sie angefordert werden (siehe `refresh`); überschreitet der Cache
+    `max_bytes`, werden die am längsten nicht genutzten Einträge verworfen
+    (LRU). Gezählt werden die Frames und alle über `Snapshot.derived`
+    gemerkten Objekte (Aggregate, Indizes, Kacheln, Simulationen), diese ab
+    dem Zeitpunkt, an dem sie entstehen.
+
+    Neue Snapshots ersetzen den alten Eintrag per Referenz-Tausch, Leser
+    sehen also immer einen vollständigen Datenstand. Die DataFrames werden
+    von allen Sessions geteilt und dürfen nicht verändert werden.
+
+    `loader(scenario, n_zones, epoch=…, city=…, frames=…)` liefert das
+    Frame-Tupel (Standard: `SyntheticSource`, reproduzierbar pro Szenario
+    und Epoch).
+
+    Generiert werden nur die Frames, die Sessions anfordern (`frames` bei
+    `get`/`peek`, z. B. aus dem Datenprofil einer Rolle), plus CORE_FRAMES.
+    Fehlt einem gecachten Snapshot ein angeforderter Frame, wird er
+    nachgeneriert und der Snapshot mit gleichem Datenstand ersetzt (ohne
+    erneute Meldung an die Abonnenten). Beim Refresh entstehen pro Schlüssel
+    nur die Frames, die innerhalb von `ttl_seconds` angefordert wurden.
+    Mit einem `pool` (`ScenarioPool` über derselben Quelle) wird in
+    Worker-Prozessen generiert, inklusive der Aggregate; `refresh_many` und
+    `prefetch` nutzen dann alle Kerne.
+    """
+
+    def __init__(self, loader=None, ttl_seconds: float = 300.0,
+                 max_bytes: int = 512 * 1024 ** 2, pool=None):
+        self._loader = loader if loader is not None else SyntheticSource()
+        self._pool = pool
+        self._ttl = ttl_seconds
+        self._max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Snapshot]" = OrderedDict()
+        self._key_locks: dict = {}
+        self._epochs: dict = {}
+        # Pro Eintrag gezählte Bytes (Frames und abgeleitete Objekte)
+        self._entry_bytes: dict = {}
+        # Schlüssel -> {Frame: Zeitpunkt der letzten Anforderung (monotonic)}
+        self._demand: dict = {}
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self._subscribers = []
+
+    # ---------------------------------------------------------
+    # Öffentliche API
+    # ---------------------------------------------------------
+    def subscribe(self, callback) -> None:
+        """`callback(snapshot)` wird nach jedem veröffentlichten Snapshot aufgerufen."""
+        self._subscribers.append(callback)
+
+    def epoch(self, scenario: str) -> int:
+        with self._lock:
+            return self._epochs.get(scenario, 0)
+
+    def keys(self) -> list:
+        """Aktuell gecachte (scenario, n_zones, city)-Schlüssel."""
+        with self._lock:
+            return list(self._entries)
+
+    def peek(self, scenario: str, n_zones: int, city: str = ALL_CITIES, frames=ALL_FRAMES):
+        """
+        Neuester Snapshot ohne zu generieren (auch wenn abgelaufen), sonst
+        None; ebenso, wenn ihm einer der `frames` fehlt.
+        """
+        key = (scenario, n_zones, city)
+        with self._lock:
+            self._request(key, frames)
+            snapshot = self._entries.get(key)
+            if snapshot is None or not snapshot.covers(frames):
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def get(self, scenario: str, n_zones: int, city: str = ALL_CITIES, frames=ALL_FRAMES) -> Snapshot:
+        """Liefert den Snapshot mit mindestens `frames`; generiert höchstens einmal pro Schlüssel."""
+        key = (scenario, n_zones, city)
+        with self._lock:
+            self._request(key, frames)
+            snapshot = self._lookup(key)
+            if snapshot is not None and snapshot.covers(frames):
+                self._hits += 1
+                return snapshot
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Nur ein Thread generiert pro Schlüssel, die anderen warten darauf
+        with key_lock:
+            with self._lock:
+                snapshot = self._lookup(key)
+                if snapshot is not None and snapshot.covers(frames):
+                    self._hits += 1
+                    return snapshot
+                self._misses += 1
+                epoch = self._epochs.get(scenario, 0)
+                wanted = self._wanted(key)
+
+            # Den Key-Lock auch bei Fehlern freigeben, sonst hält `prefetch` den
+            # Schlüssel für belegt und wärmt ihn nie mehr vor
+            try:
+                if snapshot is not None and snapshot.epoch == epoch:
+                    # Gleicher Datenstand, nur fehlende Frames ergänzen
+                    snapshot = self._widen(snapshot, wanted)
+                    with self._lock:
+                        self._publish(snapshot)
+                    return snapshot
+
+                snapshot = self._build(scenario, n_zones, epoch, city, wanted)
+                with self._lock:
+                    published = self._publish(snapshot)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+            if published:
+                self._notify(snapshot)
+            return snapshot
+
+    def refresh(self, scenario: str, n_zones_list=None, partitions=None) -> list:
+        """
+        Generiert neue Snapshots für ein Szenario (alle innerhalb der TTL
+        per `get`/`peek` angeforderten Schlüssel, das ganze Netz für
+        `n_zones_list` und die (n_zones, city)-Paare in `partitions`) und
+        tauscht sie einzeln atomar ein. Abgelaufene Einträge, die niemand
+        mehr anfordert, werden dabei verworfen statt erneuert.
+        """
+        return self.refresh_many([scenario], n_zones_list, partitions)
+
+    def refresh_many(self, scenarios, n_zones_list=None, partitions=None) -> list:
+        """
+        Wie `refresh` für mehrere Szenarien; mit Pool laufen alle Schlüssel
+        parallel und jeder Snapshot wird veröffentlicht, sobald er fertig
+        ist. Schlägt ein Schlüssel fehl, werden die übrigen trotzdem
+        veröffentlicht und danach der erste Fehler weitergereicht.
+        """
+        jobs = []
+        with self._lock:
+            for scenario in scenarios:
+                epoch = self._epochs.get(scenario, 0) + 1
+                self._epochs[scenario] = epoch
+                # Nur zuletzt angeforderte Schlüssel; die übrigen laufen über die TTL ab
+                parts = {(n, city) for s, n, city in self._demanded() if s == scenario}
+                parts.update((n, ALL_CITIES) for n in n_zones_list or [])
+                parts.update(partitions or [])
+                jobs += [(scenario, n, epoch, city, self._wanted((scenario, n, city)))
+                         for n, city in sorted(parts)]
+                for key in [k for k in self._entries if k[0] == scenario and k[1:] not in parts]:
+                    if self._entries[key].age_seconds > self._ttl:
+                        self._drop(key)
+
+        snapshots = []
+        error = None
+        for job, snapshot in self._build_all(jobs):
+            if isinstance(snapshot, Exception):
+                _LOGGER.error("Generierung von %r fehlgeschlagen", job, exc_info=snapshot)
+                error = error or snapshot
+                continue
+            snapshots.append(snapshot)
+            with self._lock:
+                published = self._publish(snapshot)
+            if published:
+                self._notify(snapshot)
+        if error is not None:
+            raise error
+        return snapshots
+
+    def prefetch(self, scenarios, n_zones: int, city: str = ALL_CITIES, frames=ALL_FRAMES) -> None:
+        """
+        Generiert fehlende Snapshots im Hintergrund (nur mit Pool), z. B. die
+        übrigen Szenarien, sobald eine Session ein neues Raster anfordert.
+        """
+        if self._pool is None:
+            return
+        with self._lock:
+            missing = [s for s in scenarios
+                       if (s, n_zones, city) not in self._entries
+                       and (s, n_zones, city) not in self._key_locks]
+        for scenario in missing:
+            # `get` sorgt dafür, dass jeder Schlüssel nur einmal generiert wird
+            threading.Thread(
+                target=self.get, args=(scenario, n_zones, city, frames), name="snapshot-prefetch",
+                daemon=True,
+            ).start()
+
+    def invalidate(self, scenario: str) -> None:
+        """Verwirft alle Einträge eines Szenarios für alle Sessions."""
+        with self._lock:
+            self._epochs[scenario] = self._epochs.get(scenario, 0) + 1
+            for key in [k for k in self._entries if k[0] == scenario]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._entry_bytes.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    # ---------------------------------------------------------
+    # Interne Helfer
+    # ---------------------------------------------------------
+    def _build(self, scenario: str, n_zones: int, epoch: int, city: str = ALL_CITIES,
+               frames=ALL_FRAMES) -> Snapshot:
+        if self._pool is not None:
+            return self._snapshot(scenario, n_zones, epoch, city,
+                                  *self._pool.build(scenario, n_zones, epoch, city, frames))
+        frames = tuple(self._loader(scenario, n_zones, epoch=epoch, city=city, frames=frames))
+        return self._snapshot(scenario, n_zones, epoch, city, frames)
+
+    def _widen(self, snapshot: Snapshot, frames) -> Snapshot:
+        """
+        Snapshot mit den fehlenden `frames` ergänzt; vorhandene Frames bleiben
+        dieselben Objekte, Epoch und Zeitstempel bleiben gleich. Die
+        Aggregate entstehen neu, weil sich ihre Eingaben geändert haben.
+        """
+        extra = self._build(snapshot.scenario, snapshot.n_zones, snapshot.epoch, snapshot.city,
+                            frozenset(frames) | snapshot.frame_names)
+        merged = tuple(old if old is not None else new for old, new in zip(snapshot.frames, extra.frames))
+        return Snapshot(
+            scenario=snapshot.scenario,
+            n_zones=snapshot.n_zones,
+            epoch=snapshot.epoch,
+            frames=merged,
+            created_at=snapshot.created_at,
+            nbytes=frames_nbytes(merged),
+            city=snapshot.city,
+        )
+
+    def _build_all(self, jobs):
+        """(job, Snapshot oder Exception) für alle Jobs, mit Pool in Fertigstellungs-Reihenfolge."""
+        if self._pool is None:
+            for job in jobs:
+                try:
+                    yield job, self._build(*job)
+                except Exception as exc:
+                    yield job, exc
+            return
+        futures = {self._pool.submit(*job): job for job in jobs}
+        pending = set(futures)
+        try:
+            for future in as_completed(futures):
+                pending.discard(future)
+                scenario, n_zones, epoch, city, _ = job = futures[future]
+                try:
+                    yield job, self._snapshot(scenario, n_zones, epoch, city,
+                                              *self._pool.collect(future, n_zones, city))
+                except Exception as exc:
+                    yield job, exc
+        finally:
+            # Abgebrochen (z. B. Generator geschlossen): übrige Ergebnisse freigeben
+            for future in pending:
+                self._pool.discard(future)
+
+    @staticmethod
+    def _snapshot(scenario, n_zones, epoch, city, frames, derived=None) -> Snapshot:
+        # `derived`: im Worker vorberechnete Zusatzobjekte (z. B. die Aggregate)
+        return Snapshot(
+            scenario=scenario,
+            n_zones=n_zones,
+            epoch=epoch,
+            frames=frames,
+            nbytes=frames_nbytes(frames),
+            city=city,
+            _derived=dict(derived or {}),
+        )
+
+    def _notify(self, snapshot: Snapshot) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(snapshot)
+            except Exception:
+                # Ein fehlerhafter Abonnent darf die Veröffentlichung nicht stoppen
+                _LOGGER.exception("Snapshot-Abonnent %r fehlgeschlagen", callback)
+
+    # Ab hier nur unter self._lock aufrufen
+    def _request(self, key, frames) -> None:
+        now = time.monotonic()
+        demand = self._demand.setdefault(key, {})
+        for name in frames:
+            demand[name] = now
+
+    def _demanded(self) -> list:
+        """Schlüssel, die innerhalb der TTL angefordert wurden; ältere Anforderungen fallen weg."""
+        since = time.monotonic() - self._ttl
+        for key in [k for k, demand in self._demand.items() if max(demand.values()) < since]:
+            del self._demand[key]
+        return list(self._demand)
+
+    def _wanted(self, key) -> frozenset:
+        """CORE_FRAMES plus alle Frames, die für `key` innerhalb der TTL angefordert wurden."""
+        since = time.monotonic() - self._ttl
+        demand = self._demand.get(key, {})
+        return CORE_FRAMES | {name for name, at in demand.items() if at >= since}
+
+    def _lookup(self, key):
+        snapshot = self._entries.get(key)
+        if snapshot is None:
+            return None
+        if snapshot.age_seconds > self._ttl:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def _publish(self, snapshot: Snapshot) -> bool:
+        key = snapshot.key
+        # Veraltete Ergebnisse (Szenario inzwischen invalidiert) verwerfen
+        if snapshot.epoch < self._epochs.get(snapshot.scenario, 0):
+            return False
+        current = self._entries.get(key)
+        if current is not None:
+            if current.epoch > snapshot.epoch:
+                return False
+            self._drop(key)
+        self._entries[key] = snapshot
+        # Frames plus abgeleitete Objekte; später gemerkte kommen über `_grow` dazu
+        self._entry_bytes[key] = snapshot.watch_size(self._grow)
+        self._bytes += self._entry_bytes[key]
+        self._evict(keep=key)
+        return True
+
+    def _evict(self, keep) -> None:
+        # LRU: älteste Einträge verwerfen, `keep` aber immer behalten
+        while self._bytes > self._max_bytes and len(self._entries) > 1:
+            oldest = next(k for k in self._entries if k != keep)
+            self._drop(oldest)
+            self._evictions += 1
+
+    def _drop(self, key) -> None:
+        self._entries.pop(key)
+        self._bytes -= self._entry_bytes.pop(key)
+
+    def _grow(self, snapshot: Snapshot, nbytes: int) -> None:
+        # Rückruf aus `Snapshot.derived` (ohne self._lock aufgerufen)
+        with self._lock:
+            if self._entries.get(snapshot.key) is not snapshot:
+                return
+            self._entry_bytes[snapshot.key] += nbytes
+            self._bytes += nbytes
+            self._evict(keep=snapshot.key)
@@ -0,0 +1,491 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from cockpit.battery import (
+    BatteryTelemetry,
+    synthetic_histograms,
+    synthetic_levels_pvals,
+    synthetic_low_counts,
+)
+
+# =========================================================
+# BASISDATEN & FARBEN (in Anlehnung an AL-Prototyp)
+# =========================================================
+
+CITY_DATA = [
+    {"zone": "Zürich Innenstadt", "lat": 47.3769, "lon": 8.5417, "city": "Zürich", "region": "Zürich & Ostschweiz"},
+    {"zone": "Zürich West", "lat": 47.3890, "lon": 8.5000, "city": "Zürich", "region": "Zürich & Ostschweiz"},
+    {"zone": "Bern Zentrum", "lat": 46.9480, "lon": 7.4474, "city": "Bern", "region": "Mittelland & Nordwest"},
+    {"zone": "Bern Wankdorf", "lat": 46.9650, "lon": 7.4640, "city": "Bern", "region": "Mittelland & Nordwest"},
+    {"zone": "Luzern Altstadt", "lat": 47.0502, "lon": 8.3093, "city": "Luzern", "region": "Mittelland & Nordwest"},
+    {"zone": "Basel Bahnhof", "lat": 47.5475, "lon": 7.5890, "city": "Basel", "region": "Mittelland & Nordwest"},
+    {"zone": "Winterthur Bahnhof", "lat": 47.5000, "lon": 8.7240, "city": "Winterthur", "region": "Zürich & Ostschweiz"},
+    {"zone": "St. Gallen Zentrum", "lat": 47.4245, "lon": 9.3767, "city": "St. Gallen", "region": "Zürich & Ostschweiz"},
+    {"zone": "Lausanne Gare", "lat": 46.5160, "lon": 6.6291, "city": "Lausanne", "region": "Romandie"},
+    {"zone": "Genf Cornavin", "lat": 46.2100, "lon": 6.1423, "city": "Genf", "region": "Romandie"},
+]
+
+ZONES = [c["zone"] for c in CITY_DATA]
+
+# Partitionen: eine pro Stadt; ALL_CITIES steht für das ganze Netz
+ALL_CITIES = "Alle Städte"
+CITIES = list(dict.fromkeys(c["city"] for c in CITY_DATA))
+CITY_REGION = {c["city"]: c["region"] for c in CITY_DATA}
+REGIONS = list(dict.fromkeys(CITY_REGION.values()))
+
+# Stadt jeder Basis-Zone (Index = parent aus zone_layout)
+PARENT_CITY = np.array([c["city"] for c in CITY_DATA], dtype=object)
+
+# Auswahl im Sidebar-Regler; alles über 10 sind synthetische Mikro-Zonen
+ZONE_COUNT_OPTIONS = [10, 100, 1000, 5000, 10000]
+
+SCENARIOS = [
+    "Pendler:innen Spitzenzeit",
+    "Wochenend-Nacht / Nightlife",
+    "Schulweg-Sicherheit",
+    "Baustellen & Umleitungen",
+]
+
+RISK_LABELS = ["niedrig", "mittel", "hoch", "kritisch"]
+
+RISK_COLOR_MAP = {
+    "niedrig": [46, 204, 113, 160],   # grünlich
+    "mittel": [241, 196, 15, 180],    # gelb
+    "hoch": [230, 126, 34, 200],      # orange
+    "kritisch": [231, 76, 60, 220],   # rot
+}
+
+# Farben als RGBA-Array, indexiert über den Risiko-Code (0 = niedrig … 3 = kritisch)
+RISK_COLORS = np.array([RISK_COLOR_MAP[label] for label in RISK_LABELS], dtype=np.uint8)
+
+# Farbspalten in df_map (pydeck: get_fill_color="[r, g, b, a]")
+COLOR_COLUMNS = ["r", "g", "b", "a"]
+
+PRIO_LABELS = ["hoch", "mittel", "niedrig"]
+
+# Uhrzeit "HH:MM" aller Minuten eines Tages; die Meldungs-Zeit ist ein Code (h * 60 + m) darauf
+CLOCK_DTYPE = pd.CategoricalDtype([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)])
+
+# Namen der Frames im Tupel (df_zones, df_trend, df_map, df_reports, df_fleet, df_battery).
+# Zonen, Karte und Flotte braucht jede Ansicht (Kennzahlen, Städte-Übersicht);
+# die übrigen werden nur für Rollen erzeugt, die sie anzeigen
+FRAME_NAMES = ("zones", "trend", "map", "reports", "fleet", "battery")
+ALL_FRAMES = frozenset(FRAME_NAMES)
+CORE_FRAMES = frozenset({"zones", "map", "fleet"})
+
+STATUS_KEYS = ["free", "reserved", "in_use", "blocked"]
+STATUS_LABELS = {
+    "free": "Frei verfügbar",
+    "reserved": "Online reserviert",
+    "in_use": "In Fahrt",
+    "blocked": "Gesperrt / offline",
+}
+
+# Verteilung der Flotte auf die Status, abhängig vom Risiko
+FLEET_WEIGHTS_LOW = np.array([0.60, 0.10, 0.25, 0.05])
+FLEET_WEIGHTS_HIGH = np.array([0.45, 0.15, 0.30, 0.10])
+
+REPORT_TEMPLATES = [
+    "Nutzer-Meldung: Gefährliche Querung in {zone}",
+    "E-Scooter blockiert Fussweg in {zone}",
+    "Mehrere Scooter umgestossen in {zone}",
+    "Hohe Geschwindigkeiten von Scootern in {zone}",
+    "Polizeimeldung: Unfall mit Scooter in {zone}",
+    "ÖV-Meldung: Haltestelle beeinträchtigt in {zone}",
+    "Kontrolle: Scooter falsch parkiert in {zone}",
+    "Baustelle: Umleitung betrifft Scooter-Route in {zone}",
+    "Anwohnerbeschwerde zu Lärm in {zone}",
+    "Technik: Connectivity-Probleme in {zone}",
+]
+
+# Alle Vorlagen enden auf "{zone}" – so lässt sich der Text als Präfix + Zone bauen
+REPORT_PREFIXES = np.array([t.replace("{zone}", "") for t in REPORT_TEMPLATES], dtype=object)
+
+# Abstand der Mikro-Zonen (Grad) und Goldener Winkel für die Spiral-Anordnung
+MICRO_ZONE_SPACING = 0.004
+GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+# =========================================================
+# ZONEN-RASTER
+# =========================================================
+@lru_cache(maxsize=8)
+def zone_layout(n_zones: int = len(CITY_DATA)):
+    """
+    Liefert (zone, lat, lon, parent) als Arrays für `n_zones` Zonen.
+
+    Die ersten 10 Zonen sind die Städte aus CITY_DATA. Weitere Mikro-Zonen
+    werden reihum den Städten zugeordnet und spiralförmig um deren Zentrum
+    angeordnet. Das Layout ist deterministisch, damit Zonen über mehrere
+    Datengenerierungen hinweg stabil bleiben.
+    """
+    return _layout_at(np.arange(n_zones), n_zones > len(CITY_DATA))
+
+
+def partition_parents(city: str = ALL_CITIES) -> list:
+    """Basis-Zonen (Index in CITY_DATA) einer Stadt; ALL_CITIES: alle."""
+    if city == ALL_CITIES:
+        return list(range(len(CITY_DATA)))
+    parents = [k for k, c in enumerate(CITY_DATA) if c["city"] == city]
+    if not parents:
+        raise KeyError(f"Unbekannte Stadt: {city!r}")
+    return parents
+
+
+def partition_indices(n_zones: int, city: str) -> np.ndarray:
+    """Positionen der Zonen einer Stadt im Raster mit `n_zones` Zonen (aufsteigend)."""
+    n_base = len(CITY_DATA)
+    # Zone i gehört zur Basis-Zone i % 10: direkt erzeugen, ohne das ganze Raster zu bauen
+    return np.sort(np.concatenate([np.arange(p, n_zones, n_base) for p in partition_parents(city)]))
+
+
+@lru_cache(maxsize=64)
+def partition_layout(n_zones: int, city: str = ALL_CITIES):
+    """
+    Wie `zone_layout`, aber nur für die Zonen einer Stadt. Namen, Lage und
+    Reihenfolge entsprechen den Zeilen des ganzen Rasters; der Aufwand
+    hängt nur von der Grösse der Partition ab.
+    """
+    if city == ALL_CITIES:
+        return zone_layout(n_zones)
+    return _layout_at(partition_indices(n_zones, city), n_zones > len(CITY_DATA))
+
+
+def _layout_at(idx: np.ndarray, numbered: bool):
+    n_base = len(CITY_DATA)
+    base_names = np.array(ZONES, dtype=object)
+    base_lat = np.array([c["lat"] for c in CITY_DATA])
+    base_lon = np.array([c["lon"] for c in CITY_DATA])
+
+    parent = idx % n_base
+    ring = idx // n_base
+
+    radius = MICRO_ZONE_SPACING * np.sqrt(ring)
+    angle = ring * GOLDEN_ANGLE
+    lat = base_lat[parent] + radius * np.sin(angle)
+    lon = base_lon[parent] + radius * np.cos(angle) / np.cos(np.radians(lat))
+
+    names = base_names[parent]
+    if numbered:
+        suffix = np.where(ring > 0, " #" + ring.astype(str), "").astype(object)
+        names = names + suffix
+
+    for arr in (names, lat, lon, parent):
+        arr.flags.writeable = False
+    return names, lat, lon, parent
+
+
+@lru_cache(maxsize=8)
+def zone_dtype(n_zones: int = len(CITY_DATA)) -> pd.CategoricalDtype:
+    """Kategorien-Typ der Zonen eines Rasters (von allen Frames gemeinsam genutzt)."""
+    return pd.CategoricalDtype(zone_layout(n_zones)[0])
+
+
+@lru_cache(maxsize=64)
+def partition_dtype(n_zones: int, city: str = ALL_CITIES) -> pd.CategoricalDtype:
+    if city == ALL_CITIES:
+        return zone_dtype(n_zones)
+    return pd.CategoricalDtype(partition_layout(n_zones, city)[0])
+
+
+def base_zone(zone: str) -> str:
+    """Basis-Zone einer Zone (Mikro-Zonen heissen wie ihre Basis-Zone plus " #n")."""
+    return str(zone).split(" #", 1)[0]
+
+
+def city_of_zone(zone: str) -> str:
+    """Stadt einer Zone; "" für unbekannte Zonen."""
+    base = base_zone(zone)
+    return PARENT_CITY[ZONES.index(base)] if base in ZONES else ""
+
+
+def zone_categorical(zone_names, codes=None, dtype=None) -> pd.Categorical:
+    """
+    Zonen als Categorical: `codes` indizieren `zone_names` (Standard: eine
+    Zeile pro Zone). Für Raster aus `zone_layout` wird der gemeinsame
+    Kategorien-Typ wiederverwendet, statt die Namen erneut zu hashen;
+    Partitionen übergeben ihren Typ als `dtype`.
+    """
+    n = len(zone_names)
+    if dtype is None:
+        layout_names = zone_layout(n)[0] if n >= len(CITY_DATA) else None
+        dtype = zone_dtype(n) if zone_names is layout_names else pd.CategoricalDtype(zone_names)
+    codes = np.arange(n) if codes is None else np.asarray(codes)
+    return pd.Categorical.from_codes(codes.astype(np.int16 if n < 2**15 else np.int32), dtype=dtype)
+
+
+def scenario_bias(scenario: str, parent: np.ndarray, rng) -> np.ndarray:
+    """Risiko-Grundniveau je Zone; Mikro-Zonen erben den Bias ihrer Stadt."""
+    base_bias = np.full(len(parent), 2.0)
+
+    if "Pendler" in scenario:
+        base_bias += np.array([1.5, 1.0, 0.8, 0.4, 0.4, 0.8, 0.5, 0.7, 0.2, 0.3])[parent]
+    elif "Nightlife" in scenario:
+        base_bias += np.array([1.2, 0.6, 0.8, 1.0, 1.0, 0.7, 0.4, 0.8, 0.3, 0.4])[parent]
+    elif "Schulweg" in scenario:
+        base_bias += np.array([0.4, 0.8, 0.3, 0.2, 0.2, 0.7, 0.4, 0.3, 0.2, 0.5])[parent]
+    elif "Baustellen" in scenario:
+        base_bias += rng.uniform(0.3, 1.5, size=len(parent))
+
+    return base_bias
+
+
+# =========================================================
+# FRAME-BAUSTEINE (gemeinsames Schema aller Datenquellen)
+# =========================================================
+def build_zone_frames(zone_names, lat, lon, risk_scores, incidents_5, incidents_30,
+                      incidents_24, blocked_min, low_battery=None, zone_dtype=None):
+    """
+    Baut df_zones und df_map aus Arrays gleicher Länge (eine Zeile pro Zone).
+
+    Kompakte Typen: Zone und Risiko als Categorical, Zähler als int16/int32,
+    Koordinaten und Minuten als float32. df_map teilt sich alle Spalten mit
+    df_zones (Copy-on-Write) und ergänzt nur die RGBA-Farbe als uint8.
+    """
+    risk_scores = np.asarray(risk_scores).astype(np.int8)
+    risk_codes = risk_scores - 1
+    n = len(risk_scores)
+
+    df_zones = pd.DataFrame(
+        {
+            "zone": zone_categorical(zone_names, dtype=zone_dtype),
+            "lat": np.asarray(lat, dtype=np.float32),
+            "lon": np.asarray(lon, dtype=np.float32),
+            "risk_score": risk_scores,
+            "risk_label": pd.Categorical.from_codes(risk_codes, RISK_LABELS, ordered=True),
+            "incidents_5min": np.asarray(incidents_5, dtype=np.int16),
+            "incidents_30min": np.asarray(incidents_30, dtype=np.int16),
+            "incidents_24h": np.asarray(incidents_24, dtype=np.int32),
+            "blocked_min": np.asarray(blocked_min, dtype=np.float32),
+            "low_battery": np.zeros(n, dtype=np.int32) if low_battery is None
+            else np.asarray(low_battery, dtype=np.int32),
+        }
+    )
+
+    return df_zones, map_frame(df_zones)
+
+
+def map_frame(df_zones: pd.DataFrame) -> pd.DataFrame:
+    """df_map: df_zones (geteilte Spalten) plus RGBA-Farbe der Risikostufe."""
+    colors = RISK_COLORS[df_zones["risk_score"].to_numpy() - 1]
+    return df_zones.assign(**{c: colors[:, k] for k, c in enumerate(COLOR_COLUMNS)})
+
+
+def build_fleet_frame(zone_names, counts, zone_dtype=None) -> pd.DataFrame:
+    """Flottenstatus im Long-Format aus einer (Zonen × Status)-Matrix."""
+    n_status = len(STATUS_KEYS)
+    status_codes = np.tile(np.arange(n_status), len(zone_names))
+
+    return pd.DataFrame(
+        {
+            "zone": zone_categorical(
+                zone_names, np.repeat(np.arange(len(zone_names)), n_status), zone_dtype
+            ),
+            "status_key": pd.Categorical.from_codes(status_codes, STATUS_KEYS),
+            "status": pd.Categorical.from_codes(
+                status_codes, [STATUS_LABELS[k] for k in STATUS_KEYS]
+            ),
+            "count": np.asarray(counts).ravel().astype(np.int16),
+        }
+    )
+
+
+def build_report_frame(ts, zone, meldung, prio) -> pd.DataFrame:
+    ts = pd.to_datetime(pd.Series(ts, dtype="datetime64[us]"))
+    return pd.DataFrame(
+        {
+            "ts": ts,
+            # "HH:MM" als Kategorie über die Minute des Tages, ohne Formatieren pro Zeile
+            "zeit": pd.Categorical.from_codes(
+                (ts.dt.hour * 60 + ts.dt.minute).to_numpy(np.int16), dtype=CLOCK_DTYPE
+            ),
+            # Nur die vorkommenden Zonen als Kategorien (wenige Zeilen, grosse Raster)
+            "zone": pd.Categorical(zone),
+            "meldung": meldung,
+            "prio": pd.Categorical(prio, categories=PRIO_LABELS, ordered=True),
+        }
+    )
+
+
+# =========================================================
+# FUNKTION FÜR LIVE-DATEN (angelehnt an AL)
+# =========================================================
+def generate_live_data(scenario: str, n_zones: int = len(CITY_DATA), n_reports: int = 10,
+                       seed: int = None, now: datetime = None, city: str = ALL_CITIES,
+                       frames=ALL_FRAMES):
+    """
+    Generiert Fake-Live-Daten für mehrere Städte:
+    - Zonenrisiko & Blockierungszeit
+    - Trenddaten (Rides, Reports, Tech-Issues)
+    - Flottenstatus
+    - Batterielevel
+    - Meldungstabelle
+
+    Alle Frames werden spaltenweise aus NumPy-Arrays gebaut (keine Schleife
+    pro Zone), damit auch Raster mit mehreren tausend Zonen schnell bleiben.
+    Mit `seed` (und festem `now`) sind die Daten reproduzierbar.
+
+    Jede Basis-Zone zieht ihre Zonen (sie selbst und ihre Mikro-Zonen) aus
+    einem eigenen, aus `seed` abgeleiteten Zufallsstrom. Mit `city` werden
+    nur die Ströme dieser Stadt gezogen: der Aufwand hängt nur von der
+    Grösse der Partition ab, und jede Zone hat bei gleichem `seed` dieselben
+    Werte wie im Snapshot des ganzen Netzes (Alarme, Historie und
+    Städte-Übersicht kommen von dort).
+
+    `frames` wählt die zu erzeugenden Frames (siehe FRAME_NAMES); die
+    übrigen sind None, CORE_FRAMES entstehen immer. Trend, Batterie und
+    Meldungen ziehen aus eigenen Zufallsströmen: die übrigen Frames sind
+    unabhängig von der Auswahl dieselben, und fehlende lassen sich später
+    passend nachgenerieren.
+    """
+    frames = CORE_FRAMES | frozenset(frames)
+    trend_seq, report_seq, zones_seq = np.random.SeedSequence(seed).spawn(3)
+    base_seqs = zones_seq.spawn(len(CITY_DATA))
+    zone_names, lat, lon, _ = partition_layout(n_zones, city)
+    dtype = partition_dtype(n_zones, city)
+
+    # Pro Basis-Zone ziehen und an die Zeilen der Partition verteilen
+    parents = partition_parents(city)
+    rows = np.arange(n_zones) if city == ALL_CITIES else partition_indices(n_zones, city)
+    pvals = synthetic_levels_pvals()
+    draws = []
+    for p in parents:
+        grid_idx = np.arange(p, n_zones, len(CITY_DATA))
+        draws.append((np.searchsorted(rows, grid_idx),
+                      _base_zone_draws(scenario, p, len(grid_idx), base_seqs[p], pvals,
+                                       histograms="battery" in frames)))
+
+    def column(name):
+        parts = [(pos, values[name]) for pos, values in draws]
+        out = np.empty((len(rows),) + parts[0][1].shape[1:], dtype=parts[0][1].dtype)
+        for pos, values in parts:
+            out[pos] = values
+        return out
+
+    risk_scores = column("risk_scores")
+    fleet_counts = column("fleet_counts")
+
+    now = now or datetime.now()
+
+    # Trenddaten
+    df_trend = (_trend_frame(scenario, now, np.random.default_rng(trend_seq))
+                if "trend" in frames else None)
+
+    # Flottenstatus, abhängig vom Risiko
+    df_fleet = build_fleet_frame(zone_names, fleet_counts, dtype)
+
+    # Batterie-Histogramm über die Zonen der Partition, falls gewünscht
+    df_battery = None
+    if "battery" in frames:
+        df_battery = BatteryTelemetry.from_counts(column("histograms")).frame()
+
+    # Zonen- und Map-DataFrame
+    df_zones, df_map = build_zone_frames(
+        zone_names, lat, lon, risk_scores, column("incidents_5"), column("incidents_30"),
+        column("incidents_24"), column("blocked_min"), column("low_battery"), dtype,
+    )
+
+    # Meldungs-Feed (Partition: die Meldungen des Netzes in ihren Zonen)
+    df_reports = None
+    if "reports" in frames:
+        df_reports = _report_frame(n_zones, n_reports, now, np.random.default_rng(report_seq),
+                                   parents=None if city == ALL_CITIES else parents)
+
+    return df_zones, df_trend, df_map, df_reports, df_fleet, df_battery
+
+
+def _base_zone_draws(scenario: str, parent: int, count: int, seed_seq, pvals,
+                     histograms: bool = True) -> dict:
+    """Zufallswerte der `count` Zonen einer Basis-Zone (in Ring-Reihenfolge)."""
+    rng, battery_rng = (np.random.default_rng(s) for s in seed_seq.spawn(2))
+    base_bias = scenario_bias(scenario, np.full(count, parent), rng)
+
+    # Risiko-Scores 1–4
+    risk_scores = np.clip(
+        np.round(base_bias + rng.normal(0, 0.6, size=count)),
+        1,
+        4,
+    ).astype(np.int8)
+
+    # Incidents & Blockierungen
+    incidents_5 = rng.integers(0, 10, size=count)
+    incidents_30 = incidents_5 + rng.integers(0, 20, size=count)
+    incidents_24 = incidents_30 + rng.integers(0, 60, size=count)
+    blocked_min = np.clip(risk_scores * 10 + rng.normal(0, 6, size=count), 0, None)
+
+    # Flottenstatus, abhängig vom Risiko
+    totals = rng.integers(80, 200, size=count)
+    high_risk = risk_scores - 1 >= RISK_LABELS.index("hoch")
+    weights = np.where(high_risk[:, None], FLEET_WEIGHTS_HIGH, FLEET_WEIGHTS_LOW)
+    fleet_counts = np.rint(totals[:, None] * weights).astype(int)
+
+    # Batterie-Levels: pro Zone nur die Anzahl unter 20 % (für df_zones); das
+    # Histogramm über alle Klassen wird bedingt darauf gezogen, falls gewünscht
+    fleet_sizes = fleet_counts.sum(axis=1)
+    low_battery = synthetic_low_counts(battery_rng, fleet_sizes, pvals)
+
+    draws = {
+        "risk_scores": risk_scores,
+        "incidents_5": incidents_5,
+        "incidents_30": incidents_30,
+        "incidents_24": incidents_24,
+        "blocked_min": blocked_min,
+        "fleet_counts": fleet_counts,
+        "low_battery": low_battery,
+    }
+    if histograms:
+        draws["histograms"] = synthetic_histograms(battery_rng, fleet_sizes, low_battery, pvals)
+    return draws
+
+
+def _trend_frame(scenario: str, now: datetime, rng) -> pd.DataFrame:
+    """df_trend: Fahrten, Meldungen und Tech-Issues der letzten 2 Stunden im 5-Minuten-Takt."""
+    times = [now - timedelta(minutes=5 * i) for i in range(24)][::-1]
+
+    if "Nightlife" in scenario:
+        base_flow = np.linspace(40, 120, len(times))
+    elif "Pendler" in scenario:
+        base_flow = np.linspace(30, 150, len(times))
+    elif "Schulweg" in scenario:
+        base_flow = np.linspace(20, 80, len(times))
+    else:
+        base_flow = np.linspace(25, 100, len(times))
+
+    crowd_flow = np.clip(base_flow + rng.normal(0, 15, len(times)), 5, None)
+    citizen_reports = np.clip(crowd_flow / 12 + rng.normal(0, 1.5, len(times)), 0, None)
+    tech_issues = np.clip(
+        rng.normal(loc=crowd_flow / 60, scale=0.5, size=len(times)), 0, None
+    )
+
+    return pd.DataFrame(
+        {
+            "timestamp": times,
+            "rides": crowd_flow,
+            "reports": citizen_reports,
+            "tech_issues": tech_issues,
+        }
+    )
+
+
+def _report_frame(n_zones: int, n_reports: int, now: datetime, rng, parents=None) -> pd.DataFrame:
+    """
+    df_reports: `n_reports` Meldungen der letzten 45 Minuten im Raster mit
+    `n_zones` Zonen; mit `parents` nur die in Zonen dieser Basis-Zonen.
+    """
+    zone_idx = rng.integers(0, n_zones, size=n_reports)
+    minutes_ago = rng.integers(1, 45, size=n_reports)
+    prios = rng.choice(PRIO_LABELS, size=n_reports, p=[0.4, 0.4, 0.2])
+    template = np.arange(n_reports) % len(REPORT_PREFIXES)
+    if parents is not None:
+        keep = np.isin(zone_idx % len(CITY_DATA), parents)
+        zone_idx, minutes_ago, prios, template = (
+            zone_idx[keep], minutes_ago[keep], prios[keep], template[keep]
+        )
+    # Namen nur für die gezogenen Zonen, nicht über das ganze Raster
+    zones_for_msgs = _layout_at(zone_idx, n_zones > len(CITY_DATA))[0]
+    report_ts = np.datetime64(now.replace(second=0, microsecond=0), "us") - minutes_ago.astype("timedelta64[m]")
+    meldungen = REPORT_PREFIXES[template] + zones_for_msgs
+    return build_report_frame(report_ts, zones_for_msgs, meldungen, prios)
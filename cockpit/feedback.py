@@ -0,0 +1,92 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+# Schema der bisherigen feedback.xlsx
+FEEDBACK_COLUMNS = [
+    "timestamp",
+    "happiness_usage",
+    "usability",
+    "happiness_methods",
+    "comments",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    happiness_usage INTEGER,
+    usability INTEGER,
+    happiness_methods INTEGER,
+    comments TEXT
+)
+"""
+
+# PRAGMA user_version: 1 = feedback.xlsx wurde bereits übernommen
+_MIGRATED_VERSION = 1
+
+
+class FeedbackStore:
+    """
+    Feedback-Ablage in SQLite (WAL-Modus).
+
+    Jede Abgabe ist ein einzelnes INSERT (O(1)), statt die ganze Excel-Datei
+    zu lesen und neu zu schreiben. SQLite serialisiert gleichzeitige
+    Schreiber über seine Datei-Sperre, parallele Sessions verlieren also
+    keine Einträge mehr. Beim ersten Start werden die Zeilen einer
+    vorhandenen `legacy_xlsx` einmalig übernommen; `export_excel` erzeugt
+    die Excel-Datei im alten Schema bei Bedarf neu.
+    """
+
+    def __init__(self, db_path: str = "feedback.db", legacy_xlsx: str = "feedback.xlsx"):
+        self.db_path = db_path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < _MIGRATED_VERSION:
+                if legacy_xlsx and os.path.exists(legacy_xlsx):
+                    self._import_rows(conn, pd.read_excel(legacy_xlsx))
+                conn.execute(f"PRAGMA user_version={_MIGRATED_VERSION}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Eine Verbindung pro Aufruf: sqlite3-Verbindungen sind nicht threadsicher
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @staticmethod
+    def _import_rows(conn, df: pd.DataFrame) -> None:
+        df = df.reindex(columns=FEEDBACK_COLUMNS)
+        rows = [
+            tuple(None if pd.isna(v) else (v.item() if hasattr(v, "item") else v) for v in row)
+            for row in df.itertuples(index=False)
+        ]
+        conn.executemany(
+            f"INSERT INTO feedback ({', '.join(FEEDBACK_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def append(self, entry: dict) -> int:
+        """Speichert einen Eintrag und liefert seine ID."""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                f"INSERT INTO feedback ({', '.join(FEEDBACK_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+                [entry.get(column) for column in FEEDBACK_COLUMNS],
+            )
+            return cursor.lastrowid
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def to_frame(self) -> pd.DataFrame:
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(FEEDBACK_COLUMNS)} FROM feedback ORDER BY id", conn
+            )
+
+    def export_excel(self, path: str = "feedback.xlsx") -> str:
+        """Schreibt alle Einträge im Schema der bisherigen feedback.xlsx."""
+        self.to_frame().to_excel(path, index=False)
+        return path
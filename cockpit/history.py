@@ -0,0 +1,350 @@
+import os
+import threading
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cockpit.data import ALL_CITIES
+
+# Pro Zone historisierte Kennzahlen aus df_zones
+HISTORY_METRICS = ["risk_score", "incidents_30min", "incidents_24h", "blocked_min", "low_battery"]
+
+METRIC_LABELS = {
+    "risk_score": "Ø Risiko-Score",
+    "incidents_30min": "Ø Incidents (30 min)",
+    "incidents_24h": "Ø Incidents (24 h)",
+    "blocked_min": "Ø Blockierung (min)",
+    "low_battery": "Ø Scooter < 20% Batterie",
+}
+
+# Zeiträume der Langzeit-Ansicht (Tage); die Länge bestimmt die gelesene Stufe (level_for_span)
+HISTORY_RANGES = {"24 Stunden": 1, "7 Tage": 7, "30 Tage": 30, "90 Tage": 90}
+
+ZONE_BUCKETS = 8
+
+
+@dataclass(frozen=True)
+class Level:
+    """Auflösungsstufe der Historie: Bucket-Länge, Hive-Partitionen, Schreibintervall."""
+
+    name: str
+    seconds: int
+    partitions: tuple
+    flush_seconds: int
+
+
+# Jede Stufe wird aus der nächstfeineren gebildet (5 min -> 1 h -> 1 Tag)
+LEVELS = (
+    Level("5min", 5 * 60, ("day", "zone_bucket"), 6 * 60 * 60),
+    Level("1h", 60 * 60, ("day", "zone_bucket"), 24 * 60 * 60),
+    Level("1d", 24 * 60 * 60, ("month",), 24 * 60 * 60),
+)
+
+_PARTITION_TYPES = {"day": pa.string(), "month": pa.string(), "zone_bucket": pa.int32()}
+
+_SCHEMA = pa.schema(
+    [("ts", pa.timestamp("ms")), ("scenario", pa.string()), ("n_zones", pa.int32()),
+     ("zone", pa.string()), ("zone_bucket", pa.int32())]
+    + [(metric, pa.float32()) for metric in HISTORY_METRICS]
+)
+
+
+def zone_bucket(zones) -> np.ndarray:
+    """Stabile Zuordnung Zone -> Partition (unabhängig von Prozess und Hash-Seed)."""
+    return np.array([zlib.crc32(z.encode("utf-8")) % ZONE_BUCKETS for z in zones], dtype=np.int32)
+
+
+def bucket_start(ts: int, level: Level) -> int:
+    """
+    Beginn des Buckets, in den `ts` fällt. Tages-Buckets beginnen um lokale
+    Mitternacht, passend zu den day/month-Partitionen (auch lokale Zeit).
+    """
+    if level.seconds % (24 * 60 * 60):
+        return ts - ts % level.seconds
+    midnight = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(midnight.timestamp())
+
+
+def level_for_span(span: timedelta) -> Level:
+    """Gröbste nötige Stufe, damit ein Zeitraum nur wenige hundert Punkte hat."""
+    if span <= timedelta(days=2):
+        return LEVELS[0]
+    if span <= timedelta(days=30):
+        return LEVELS[1]
+    return LEVELS[2]
+
+
+class _Bucket:
+    """Laufende Summe eines Zeit-Buckets für ein (Szenario, Zonen-Raster)."""
+
+    def __init__(self, start: int, zones, values: np.ndarray):
+        self.start = start
+        self.zones = zones
+        self.sums = np.zeros_like(values, dtype=float)
+        self.count = 0
+
+    def mean(self) -> np.ndarray:
+        return self.sums / self.count
+
+
+class HistoryStore:
+    """
+    Spaltenbasierte Historie der Zonen-Kennzahlen als partitionierte
+    Parquet-Dateien (Hive-Layout `<root>/<stufe>/day=…/zone_bucket=…/`).
+
+    Jeder Snapshot wird über `append` in den laufenden 5-Minuten-Bucket
+    gemittelt. Abgeschlossene Buckets wandern gepuffert auf die Platte
+    (höchstens eine Datei pro Partition und Schreibintervall) und werden
+    zugleich in die 1-Stunden- und weiter in die Tages-Stufe gerollt.
+    Abfragen wählen die Stufe nach der Länge des Zeitraums und filtern
+    über Partitionen und Parquet-Statistiken, statt Rohzeilen zu lesen.
+    Noch nicht geschriebene Zeilen sind in Abfragen bereits enthalten.
+
+    Schreiben, Verdichten und Lesen der Dateien laufen unter `_files_lock`:
+    eine Abfrage sieht einen Tag nie halb verdichtet (alte und neue Dateien
+    zugleich oder eine schon gelöschte Datei).
+    """
+
+    def __init__(self, root: str = "history"):
+        self.root = root
+        self._lock = threading.RLock()
+        # Immer nach `_lock` nehmen, nie umgekehrt
+        self._files_lock = threading.RLock()
+        self._buckets: dict = {}                          # (level, key) -> _Bucket
+        self._pending = {level.name: [] for level in LEVELS}
+        self._pending_since = {level.name: None for level in LEVELS}
+        self._zone_buckets: dict = {}
+        self._compacted = set()
+        self.rows_written = 0
+
+    # ---------------------------------------------------------
+    # Schreiben
+    # ---------------------------------------------------------
+    def append(self, snapshot) -> None:
+        """Einstieg für `SharedDataCache.subscribe`."""
+        # Nur das ganze Netz: der Schlüssel ist (scenario, Anzahl Zonen), eine
+        # Stadt-Partition würde mit einem kleineren Raster kollidieren
+        if snapshot.city != ALL_CITIES:
+            return
+        self.append_frame(snapshot.frames[0], snapshot.scenario, snapshot.created_at)
+
+    def append_frame(self, df_zones: pd.DataFrame, scenario: str, at: datetime) -> None:
+        zones = df_zones["zone"].to_numpy()
+        values = np.column_stack([
+            df_zones[metric].to_numpy(dtype=float) if metric in df_zones else np.zeros(len(zones))
+            for metric in HISTORY_METRICS
+        ])
+        key = (scenario, len(zones))
+        with self._lock:
+            self._accumulate(0, key, zones, int(at.timestamp()), values)
+
+    def _accumulate(self, level_idx: int, key, zones, ts: int, values) -> None:
+        level = LEVELS[level_idx]
+        start = bucket_start(ts, level)
+        bucket = self._buckets.get((level.name, key))
+        if bucket is not None and start > bucket.start:
+            self._close(level_idx, key, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self._buckets[(level.name, key)] = _Bucket(start, zones, values)
+        # Verspätete Snapshots zählen zum laufenden Bucket
+        bucket.sums += values
+        bucket.count += 1
+
+    def _close(self, level_idx: int, key, bucket: _Bucket) -> None:
+        level = LEVELS[level_idx]
+        mean = bucket.mean()
+        self._pending[level.name].append(self._rows(key[0], bucket.zones, bucket.start, mean))
+        if self._pending_since[level.name] is None:
+            self._pending_since[level.name] = bucket.start
+        elif bucket.start - self._pending_since[level.name] >= level.flush_seconds:
+            self._write(level)
+
+        if level_idx + 1 < len(LEVELS):
+            self._accumulate(level_idx + 1, key, bucket.zones, bucket.start, mean)
+        elif bucket.start not in self._compacted:
+            # Tag abgeschlossen: seine Tages-Partitionen zu je einer Datei zusammenfassen
+            self._compacted.add(bucket.start)
+            self._compact_day(datetime.fromtimestamp(bucket.start))
+            # Nur die letzten Tage merken; ein erneutes Verdichten wäre ohnehin ein No-op
+            horizon = bucket.start - 7 * level.seconds
+            self._compacted = {day for day in self._compacted if day >= horizon}
+
+    def _rows(self, scenario: str, zones, start: int, values) -> pa.Table:
+        # Zonen-Spalten nur einmal pro Zonen-Raster nach Arrow wandeln
+        cached = self._zone_buckets.get(len(zones))
+        if cached is None or not (cached[0] is zones or np.array_equal(cached[0], zones)):
+            cached = self._zone_buckets[len(zones)] = (
+                zones, pa.array(zones, pa.string()), pa.array(zone_bucket(zones), pa.int32())
+            )
+        n = len(zones)
+        columns = [
+            pa.array(np.full(n, np.datetime64(datetime.fromtimestamp(start), "ms"))),
+            pa.array(np.full(n, scenario, dtype=object), pa.string()),
+            pa.array(np.full(n, n, dtype=np.int32)),
+            cached[1],
+            cached[2],
+        ]
+        columns += [pa.array(values[:, k].astype(np.float32)) for k in range(len(HISTORY_METRICS))]
+        return pa.Table.from_arrays(columns, schema=_SCHEMA)
+
+    def _write(self, level: Level) -> None:
+        tables = self._pending[level.name]
+        self._pending[level.name] = []
+        self._pending_since[level.name] = None
+        if not tables:
+            return
+        # Ein Chunk statt einem pro Bucket – sonst schreibt Arrow sehr langsam
+        table = pa.concat_tables(tables).combine_chunks()
+        if "day" in level.partitions:
+            table = table.append_column("day", pc.strftime(table["ts"], "%Y-%m-%d"))
+        if "month" in level.partitions:
+            table = table.append_column("month", pc.strftime(table["ts"], "%Y-%m"))
+        with self._files_lock:
+            pq.write_to_dataset(
+                table,
+                root_path=os.path.join(self.root, level.name),
+                partition_cols=list(level.partitions),
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+        self.rows_written += table.num_rows
+
+    def _compact_day(self, day: datetime) -> None:
+        with self._files_lock:
+            self._compact_day_files(day)
+
+    def _compact_day_files(self, day: datetime) -> None:
+        for level in LEVELS:
+            if "day" not in level.partitions:
+                continue
+            self._write(level)
+            path = os.path.join(self.root, level.name, f"day={day:%Y-%m-%d}")
+            if not os.path.isdir(path):
+                continue
+            old_files = [
+                os.path.join(directory, name)
+                for directory, _, names in os.walk(path)
+                for name in names
+            ]
+            if len(old_files) <= ZONE_BUCKETS:
+                continue
+            table = ds.dataset(
+                path, format="parquet",
+                partitioning=ds.partitioning(pa.schema([("zone_bucket", pa.int32())]), flavor="hive"),
+            ).to_table()
+            table = table.sort_by("ts")
+            pq.write_to_dataset(
+                table,
+                root_path=path,
+                partition_cols=["zone_bucket"],
+                basename_template=f"day-{uuid.uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            for name in old_files:
+                os.remove(name)
+
+    def flush(self, close_buckets: bool = False) -> None:
+        """Schreibt alle gepufferten Zeilen; mit `close_buckets` auch die laufenden Buckets."""
+        with self._lock:
+            if close_buckets:
+                for level_idx, level in enumerate(LEVELS):
+                    for (name, key), bucket in list(self._buckets.items()):
+                        if name == level.name:
+                            del self._buckets[(name, key)]
+                            self._close(level_idx, key, bucket)
+            for level in LEVELS:
+                self._write(level)
+
+    # ---------------------------------------------------------
+    # Lesen
+    # ---------------------------------------------------------
+    def query(self, start: datetime, end: datetime, scenario: str = None, n_zones: int = None,
+              zones=None, level: str = None, metrics=None) -> pd.DataFrame:
+        """
+        Zeilen (ts, zone, Kennzahlen) im Zeitraum [start, end], optional nur
+        für ein Szenario, ein Zonen-Raster (`n_zones`) und einzelne Zonen.
+        Ohne `level` wird die Stufe nach der Länge des Zeitraums gewählt.
+        """
+        table = self._query_table(start, end, scenario, n_zones, zones, level, metrics)
+        return table.sort_by([("ts", "ascending"), ("zone", "ascending")]).to_pandas()
+
+    def _query_table(self, start, end, scenario, n_zones, zones, level, metrics) -> pa.Table:
+        level = next((lv for lv in LEVELS if lv.name == level), None) or level_for_span(end - start)
+        metrics = list(metrics or HISTORY_METRICS)
+        columns = ["ts", "zone"] + metrics
+
+        expr = (ds.field("ts") >= pa.scalar(start, pa.timestamp("ms"))) & (
+            ds.field("ts") <= pa.scalar(end, pa.timestamp("ms"))
+        )
+        if scenario is not None:
+            expr &= ds.field("scenario") == scenario
+        if n_zones is not None:
+            expr &= ds.field("n_zones") == n_zones
+        if zones is not None:
+            zones = list(zones)
+            expr &= ds.field("zone").isin(zones)
+
+        # Noch nicht geschriebene Zeilen und laufende Buckets. Die Dateien
+        # werden gesperrt, bevor `_lock` frei wird: so kann kein `_write`
+        # diese Zeilen dazwischen auf die Platte bringen (doppelt gelesen)
+        with self._lock:
+            tables = list(self._pending[level.name])
+            for (name, key), bucket in self._buckets.items():
+                if name == level.name:
+                    tables.append(self._rows(key[0], bucket.zones, bucket.start, bucket.mean()))
+            self._files_lock.acquire()
+        try:
+            stored = self._read_files(level, start, end, zones, columns, expr)
+        finally:
+            self._files_lock.release()
+        tables = [t.filter(expr).select(columns) for t in tables] + stored
+
+        if not tables:
+            return _SCHEMA.empty_table().select(columns)
+        return pa.concat_tables(tables)
+
+    def _read_files(self, level: Level, start, end, zones, columns, expr) -> list:
+        path = os.path.join(self.root, level.name)
+        if not os.path.isdir(path):
+            return []
+        # Partitionen ausserhalb des Zeitraums bzw. der Zonen gar nicht erst öffnen
+        if "day" in level.partitions:
+            expr &= (ds.field("day") >= f"{start:%Y-%m-%d}") & (ds.field("day") <= f"{end:%Y-%m-%d}")
+        else:
+            expr &= (ds.field("month") >= f"{start:%Y-%m}") & (ds.field("month") <= f"{end:%Y-%m}")
+        if zones is not None and "zone_bucket" in level.partitions:
+            expr &= ds.field("zone_bucket").isin(zone_bucket(zones).tolist())
+        partitioning = ds.partitioning(
+            pa.schema([(p, _PARTITION_TYPES[p]) for p in level.partitions]), flavor="hive"
+        )
+        dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+        return [dataset.to_table(columns=columns, filter=expr)]
+
+    def trend(self, start: datetime, end: datetime, scenario: str, metric: str,
+              n_zones: int = None, zones=None) -> pd.DataFrame:
+        """
+        Zeitreihe (ts, Wert) einer Kennzahl, gemittelt über die Zonen. Fehlen
+        auf der passenden Stufe noch Daten (junge Historie), wird auf die
+        nächstfeinere ausgewichen.
+        """
+        level_idx = LEVELS.index(level_for_span(end - start))
+        for level in reversed(LEVELS[: level_idx + 1]):
+            table = self._query_table(start, end, scenario, n_zones, zones, level.name, [metric])
+            if table.num_rows:
+                break
+        table = table.group_by("ts").aggregate([(metric, "mean")])
+        return (
+            table.select(["ts", f"{metric}_mean"])
+            .rename_columns(["ts", "Wert"])
+            .sort_by("ts")
+            .to_pandas()
+        )
@@ -0,0 +1,149 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Zonen gelten als geändert, wenn sich eine dieser Spalten ändert
+DELTA_COLUMNS = ["risk_score", "incidents_30min", "blocked_min"]
+
+# Schlüssel einer Meldung (df_reports hat keine ID)
+REPORT_KEY = ["zeit", "zone", "meldung"]
+
+# Höchstens so viele geänderte Zonen auf der Karte hervorheben
+N_MARKED_ZONES = 50
+
+
+@dataclass(frozen=True)
+class SnapshotDelta:
+    """
+    Änderungen zwischen zwei aufeinanderfolgenden Snapshots eines
+    (scenario, n_zones): geänderte Zonen, neue Meldungen, neue Trendpunkte.
+    """
+
+    from_epoch: int
+    to_epoch: int
+    changed_zones: pd.DataFrame
+    new_reports: pd.DataFrame
+    new_trend: pd.DataFrame
+
+    @property
+    def is_empty(self) -> bool:
+        return self.changed_zones.empty and self.new_reports.empty and self.new_trend.empty
+
+    def top_changes(self, k: int = N_MARKED_ZONES) -> pd.DataFrame:
+        """Die `k` Zonen mit der grössten Änderung der Incidents (für die Karte)."""
+        strength = np.abs(self.changed_zones["incidents_30min_diff"].to_numpy())
+        return self.changed_zones.iloc[np.argsort(-strength, kind="stable")[:k]]
+
+    def mark_hotspots(self, hotspots: pa.Table) -> pa.Table:
+        """Hotspot-Tabelle (Spalte "Zone") mit Änderung der Incidents seit dem Vorgänger."""
+        diff = pd.Series(
+            self.changed_zones["incidents_30min_diff"].to_numpy(),
+            index=self.changed_zones["zone"].astype(str),
+        )
+        change = hotspots["Zone"].to_pandas().astype(str).map(diff)
+        label = np.where(change > 0, "▲ +", np.where(change < 0, "▼ ", "● "))
+        marks = np.where(change.notna(), label + change.fillna(0).astype(int).astype(str), "")
+        # Nur die neue Spalte wird angelegt, die übrigen bleiben die der geteilten Tabelle
+        return hotspots.append_column("Änderung", pa.array(marks, pa.string()))
+
+    def mark_reports(self, reports: pa.Table) -> pa.Table:
+        """Meldungen mit Markierung der seit dem Vorgänger neu hinzugekommenen Zeilen."""
+        is_new = _report_keys(reports.select(REPORT_KEY).to_pandas()).isin(_report_keys(self.new_reports))
+        return reports.append_column("Neu", pa.array(np.where(is_new, "🆕", ""), pa.string()))
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.changed_zones)} Zonen geändert, {len(self.new_reports)} neue Meldungen, "
+            f"{len(self.new_trend)} neue Trendpunkte"
+        )
+
+
+def _report_keys(reports: pd.DataFrame) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(reports[REPORT_KEY].astype(str))
+
+
+def compute_delta(previous, current) -> SnapshotDelta:
+    """
+    Vergleicht zwei Snapshots mit gleichem Zonen-Raster. Die Zonen stehen in
+    beiden Frames in derselben Reihenfolge (zone_layout ist deterministisch),
+    der Vergleich läuft daher spaltenweise ohne Join. Fehlen Meldungen oder
+    Trend in einem der beiden Snapshots, gibt es dafür keine neuen Zeilen.
+    """
+    old_zones, old_trend, _, old_reports = previous.frames[:4]
+    new_zones, new_trend, _, new_reports = current.frames[:4]
+
+    changed = np.zeros(len(new_zones), dtype=bool)
+    for column in DELTA_COLUMNS:
+        changed |= old_zones[column].to_numpy() != new_zones[column].to_numpy()
+    idx = np.flatnonzero(changed)
+    changed_zones = pd.DataFrame(
+        {
+            "zone": new_zones["zone"].to_numpy()[idx],
+            "lat": new_zones["lat"].to_numpy()[idx],
+            "lon": new_zones["lon"].to_numpy()[idx],
+            "risk_score": new_zones["risk_score"].to_numpy()[idx],
+            "risk_score_diff": (new_zones["risk_score"].to_numpy()[idx].astype(np.int16)
+                                - old_zones["risk_score"].to_numpy()[idx]),
+            "incidents_30min_diff": (new_zones["incidents_30min"].to_numpy()[idx].astype(np.int32)
+                                     - old_zones["incidents_30min"].to_numpy()[idx]),
+        }
+    )
+
+    if old_reports is None or new_reports is None:
+        new_reports = pd.DataFrame(columns=REPORT_KEY)
+    else:
+        new_reports = new_reports[~_report_keys(new_reports).isin(_report_keys(old_reports))]
+    if old_trend is None or new_trend is None:
+        new_trend = pd.DataFrame(columns=["timestamp"])
+    else:
+        new_trend = new_trend[new_trend["timestamp"] > old_trend["timestamp"].max()]
+
+    return SnapshotDelta(
+        from_epoch=previous.epoch,
+        to_epoch=current.epoch,
+        changed_zones=changed_zones,
+        new_reports=new_reports,
+        new_trend=new_trend,
+    )
+
+
+class SnapshotStream:
+    """
+    Geteilter Snapshot-Strom für den Live-Modus.
+
+    Hängt sich an `SharedDataCache.subscribe` und berechnet beim
+    Veröffentlichen eines Snapshots einmal das Delta zum Vorgänger mit
+    gleichem Schlüssel (scenario, n_zones, city) – im Thread des Refreshers, nicht im
+    Rerun. Sessions im Live-Modus lesen den neuesten Snapshot per
+    `SharedDataCache.peek` und das Delta per `delta`; 100 offene Cockpits
+    lösen damit keine einzige zusätzliche Generierung aus.
+    """
+
+    def __init__(self, cache):
+        self._lock = threading.Lock()
+        self._previous = {}
+        self._deltas = {}
+        cache.subscribe(self.on_snapshot)
+
+    def on_snapshot(self, snapshot) -> None:
+        key = snapshot.key
+        with self._lock:
+            previous = self._previous.get(key)
+            if previous is not None and previous.epoch >= snapshot.epoch:
+                return
+            self._previous[key] = snapshot
+        if previous is not None:
+            delta = compute_delta(previous, snapshot)
+            with self._lock:
+                self._deltas[key] = delta
+
+    def delta(self, snapshot):
+        """Delta zum Vorgänger von `snapshot`, sonst None (erster Stand)."""
+        with self._lock:
+            delta = self._deltas.get(snapshot.key)
+        if delta is None or delta.to_epoch != snapshot.epoch:
+            return None
+        return delta
@@ -0,0 +1,326 @@
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+_LOGGER = logging.getLogger(__name__)
+
+# Zustellstatus
+QUEUED = "eingereiht"
+COALESCED = "zusammengefasst"
+DELIVERED = "zugestellt"
+FAILED = "fehlgeschlagen"
+DROPPED = "verworfen"
+
+# Versandwege: manuell abgesetzte Nachrichten und automatische Alarme
+MANUAL = "manuell"
+AUTOMATIC = "automatisch"
+
+# Standard-Limit pro Empfänger-Organisation: (Nachrichten pro Minute, Burst)
+DEFAULT_RATE_LIMIT = (6, 3)
+
+# Höchstens so viele automatische Alarme warten pro Organisation auf ein Token
+DEFAULT_AUTOMATIC_BACKLOG = 10
+
+
+def organisation_of(template: str) -> str:
+    """Empfänger-Organisation aus dem Präfix der Vorlage ("Polizei: …" -> "Polizei")."""
+    prefix, sep, _ = template.partition(":")
+    return prefix.strip() if sep else "Allgemein"
+
+
+@dataclass(frozen=True)
+class DeliveryReceipt:
+    id: int
+    status: str
+    organisation: str
+    queued_at: datetime
+
+
+@dataclass
+class Notification:
+    id: int
+    template: str
+    zone: str
+    organisation: str
+    body: str
+    created_at: datetime = field(default_factory=datetime.now)
+    count: int = 1          # Anzahl zusammengefasster Auslösungen
+    attempts: int = 0
+    status: str = QUEUED
+    delivered_at: float = None
+    lane: str = MANUAL
+
+
+class TokenBucket:
+    """Token-Bucket: `rate` Tokens pro Sekunde, höchstens `burst` auf Vorrat."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self, now: float = None) -> float:
+        """Nimmt ein Token; liefert 0 oder die Wartezeit bis zum nächsten Token."""
+        now = time.monotonic() if now is None else now
+        # `now` kann knapp vor dem Anlegen des Buckets gemessen worden sein
+        self._tokens = min(self.burst, self._tokens + max(0.0, now - self._updated) * self.rate)
+        self._updated = max(now, self._updated)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class LocalSink:
+    """
+    Lokaler Ersatz für den echten Versand: schreibt jede Nachricht als
+    JSON-Zeile in `path` und merkt sie sich in `delivered` (für Tests).
+    """
+
+    def __init__(self, path: str = "notifications.jsonl"):
+        self.path = path
+        self.delivered = []
+        self._lock = threading.Lock()
+
+    def __call__(self, notification: Notification) -> None:
+        record = asdict(notification)
+        record["created_at"] = notification.created_at.isoformat(timespec="seconds")
+        with self._lock:
+            self.delivered.append(notification)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class PushSink:
+    """
+    Zustellung als Browser-Push an die Sessions der Empfänger.
+
+    Ein Push (`streamlit_push_notifications.send_push`) lässt sich nur im
+    Rerun einer Session rendern, nicht im Dispatcher-Thread. Der Sink legt
+    jede Nachricht deshalb in einen begrenzten Postausgang; jede Session holt
+    sich mit `drain` die seit ihrem letzten Aufruf zugestellten Nachrichten
+    und rendert sie selbst. Ist beim Zustellen keine Session der Organisation
+    offen, fällt die Nachricht nach `maxlen` weiteren aus dem Postausgang.
+    """
+
+    def __init__(self, maxlen: int = 500):
+        self._outbox = deque(maxlen=maxlen)     # (seq, Notification)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, notification: Notification) -> None:
+        with self._lock:
+            self._seq += 1
+            self._outbox.append((self._seq, notification))
+
+    def cursor(self) -> int:
+        """Aktueller Stand; neue Sessions starten hier statt beim ältesten Eintrag."""
+        with self._lock:
+            return self._seq
+
+    def drain(self, after: int, organisation: str = None, ids=()) -> tuple:
+        """
+        Nachrichten nach `after` für `organisation` oder mit einer der `ids`
+        (selbst abgesetzte). Liefert (neuer Stand, [Notification, ...]).
+        """
+        with self._lock:
+            pending = [
+                n for seq, n in self._outbox
+                if seq > after and (n.organisation == organisation or n.id in ids)
+            ]
+            return self._seq, pending
+
+
+class NotificationDispatcher:
+    """
+    Asynchroner Versand vorgefertigter Nachrichten.
+
+    - `submit` kehrt sofort mit einer Empfangsbestätigung zurück.
+    - Gleiche Vorlage + Zone innerhalb von `coalesce_seconds` wird zu einer
+      Nachricht zusammengefasst (Zähler statt Mehrfachversand).
+    - Pro Empfänger-Organisation und Versandweg (`lane`) begrenzt ein
+      Token-Bucket die Rate: automatische Alarme verbrauchen nie die Tokens
+      manuell abgesetzter Nachrichten, und manuelle Nachrichten gehen bei
+      gleicher Fälligkeit vor.
+    - Automatische Alarme warten pro Organisation höchstens
+      `automatic_backlog` Stück gleichzeitig; ist der Rückstand voll, wird
+      ein neuer Alarm verworfen (Status DROPPED) statt endlos eingereiht.
+    - Fehlgeschlagene Zustellungen werden mit exponentiellem Backoff (mit
+      Jitter) bis `max_retries` wiederholt.
+
+    `sink` ist ein beliebiges Callable, das eine `Notification` zustellt
+    und bei Fehlern eine Exception wirft.
+
+    Zugestellte Nachrichten werden nach Ablauf von `coalesce_seconds`
+    vergessen, fehlgeschlagene sofort beim nächsten Aufräumen; `status`
+    liefert für sie dann None. `stats` zählt weiter über alle Nachrichten.
+    """
+
+    def __init__(self, sink=None, coalesce_seconds: float = 60.0, rate_limits=None,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 automatic_backlog: int = DEFAULT_AUTOMATIC_BACKLOG):
+        self._sink = sink if sink is not None else LocalSink()
+        self._automatic_backlog = automatic_backlog
+        self._coalesce_seconds = coalesce_seconds
+        self._rate_limits = dict(rate_limits or {})
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._queue = []                 # Heap aus (fällig_ab, seq, Notification)
+        self._by_key = {}                # (template, zone, lane) -> letzte Notification
+        self._by_id = {}
+        self._buckets = {}               # (organisation, lane) -> TokenBucket
+        self._backlog = {}               # organisation -> wartende automatische Alarme
+        self._totals = {DELIVERED: 0, FAILED: 0, COALESCED: 0, DROPPED: 0}
+        self._pruned_at = time.monotonic()
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------
+    # Öffentliche API
+    # ---------------------------------------------------------
+    def submit(self, template: str, zone: str = "", body: str = None,
+               lane: str = MANUAL, organisation: str = None) -> DeliveryReceipt:
+        # Ohne explizite Empfänger-Organisation gilt das Präfix der Vorlage
+        organisation = organisation or organisation_of(template)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at >= self._coalesce_seconds:
+                self._prune(now)
+            previous = self._by_key.get((template, zone, lane))
+            if previous is not None and previous.status != FAILED and (
+                previous.status == QUEUED
+                or now - previous.delivered_at < self._coalesce_seconds
+            ):
+                previous.count += 1
+                self._totals[COALESCED] += 1
+                return DeliveryReceipt(previous.id, COALESCED, organisation, previous.created_at)
+
+            if lane == AUTOMATIC:
+                if self._backlog.get(organisation, 0) >= self._automatic_backlog:
+                    self._totals[DROPPED] += 1
+                    return DeliveryReceipt(0, DROPPED, organisation, datetime.now())
+                self._backlog[organisation] = self._backlog.get(organisation, 0) + 1
+
+            notification = Notification(
+                id=next(self._ids),
+                template=template,
+                zone=zone,
+                organisation=organisation,
+                body=body or (f"{template} ({zone})" if zone else template),
+                lane=lane,
+            )
+            self._by_key[(template, zone, lane)] = notification
+            self._by_id[notification.id] = notification
+            self._schedule(notification, now)
+            return DeliveryReceipt(notification.id, QUEUED, organisation, notification.created_at)
+
+    @property
+    def sink(self):
+        return self._sink
+
+    def status(self, notification_id: int) -> str:
+        with self._lock:
+            notification = self._by_id.get(notification_id)
+            return notification.status if notification else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            queued = sum(1 for n in self._by_id.values() if n.status == QUEUED)
+            return {QUEUED: queued, **self._totals}
+
+    def close(self, timeout: float = None) -> None:
+        with self._lock:
+            self._stopped = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+
+    # ---------------------------------------------------------
+    # Worker
+    # ---------------------------------------------------------
+    def _prune(self, now: float) -> None:
+        # Abgeschlossene Nachrichten vergessen, sobald sie nichts mehr zusammenfassen können
+        self._pruned_at = now
+        for notification in list(self._by_id.values()):
+            if notification.status == FAILED or (
+                notification.status == DELIVERED
+                and now - notification.delivered_at >= self._coalesce_seconds
+            ):
+                del self._by_id[notification.id]
+                key = (notification.template, notification.zone, notification.lane)
+                if self._by_key.get(key) is notification:
+                    del self._by_key[key]
+
+    def _schedule(self, notification: Notification, due: float) -> None:
+        priority = 0 if notification.lane == MANUAL else 1
+        heapq.heappush(self._queue, (due, priority, next(self._seq), notification))
+        self._wakeup.notify()
+
+    def _bucket(self, organisation: str, lane: str) -> TokenBucket:
+        bucket = self._buckets.get((organisation, lane))
+        if bucket is None:
+            per_minute, burst = self._rate_limits.get(organisation, DEFAULT_RATE_LIMIT)
+            bucket = self._buckets[(organisation, lane)] = TokenBucket(per_minute / 60.0, burst)
+        return bucket
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._stopped:
+                    now = time.monotonic()
+                    if self._queue and self._queue[0][0] <= now:
+                        break
+                    timeout = self._queue[0][0] - now if self._queue else None
+                    self._wakeup.wait(timeout)
+                if self._stopped:
+                    return
+
+                due, _, _, notification = heapq.heappop(self._queue)
+                wait = self._bucket(notification.organisation, notification.lane).acquire(now)
+                if wait > 0:
+                    # Rate-Limit erreicht: erneut einplanen, sobald ein Token frei ist
+                    self._schedule(notification, now + wait)
+                    continue
+                notification.attempts += 1
+
+            try:
+                self._sink(notification)
+            except Exception:
+                _LOGGER.warning("Zustellung #%s fehlgeschlagen (Versuch %s)",
+                                notification.id, notification.attempts, exc_info=True)
+                with self._lock:
+                    if notification.attempts > self._max_retries:
+                        notification.status = FAILED
+                        self._totals[FAILED] += 1
+                        self._settle(notification)
+                    else:
+                        delay = min(self._backoff_max,
+                                    self._backoff_base * 2 ** (notification.attempts - 1))
+                        self._schedule(notification, time.monotonic() + delay * random.uniform(0.5, 1.0))
+            else:
+                with self._lock:
+                    notification.status = DELIVERED
+                    notification.delivered_at = time.monotonic()
+                    self._totals[DELIVERED] += 1
+                    self._settle(notification)
+
+    def _settle(self, notification: Notification) -> None:
+        # Zustellung abgeschlossen: gibt den Platz im automatischen Rückstand frei
+        if notification.lane == AUTOMATIC:
+            self._backlog[notification.organisation] -= 1
@@ -0,0 +1,151 @@
+import threading
+from dataclasses import dataclass, fields
+from datetime import datetime
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from cockpit.data import ALL_CITIES, CITIES, CITY_REGION, REGIONS, city_of_zone
+
+# Gesamtzeile der Städte-Übersicht
+NETWORK_LABEL = "Schweiz gesamt"
+
+
+@dataclass(frozen=True)
+class PartitionSummary:
+    """
+    Vorab aggregierte Kennzahlen einer Stadt-Partition. Alle Felder ausser
+    `created_at` sind Summen, damit sich Regionen und das ganze Netz durch
+    Addieren der Städte ergeben (`merge`), ohne deren Frames zu laden.
+    """
+
+    zones: int
+    risk_score_sum: int
+    critical: int
+    high: int
+    incidents_30min: int
+    blocked_min_sum: float
+    scooters: int
+    low_battery: int
+    created_at: datetime
+
+    def merge(self, other: "PartitionSummary") -> "PartitionSummary":
+        values = {f.name: getattr(self, f.name) + getattr(other, f.name)
+                  for f in fields(self) if f.name != "created_at"}
+        return PartitionSummary(created_at=min(self.created_at, other.created_at), **values)
+
+    def row(self) -> dict:
+        zones = max(self.zones, 1)
+        return {
+            "Zonen": self.zones,
+            # Wie global_safety_index in compute_kpis, aus Summen statt aus den Frames
+            "Safety-Index": int(np.clip(100 - self.risk_score_sum / zones * 18
+                                        - self.blocked_min_sum / zones / 4, 0, 100)),
+            "Kritisch": self.critical,
+            "Hoch": self.high,
+            "Incidents 30min": self.incidents_30min,
+            "Scooter": self.scooters,
+            "< 20% Batterie": f"{self.low_battery / self.scooters:.0%}" if self.scooters else "–",
+            "Stand": self.created_at.strftime("%H:%M:%S"),
+        }
+
+
+def summarize(snapshot) -> dict:
+    """
+    Zusammenfassung pro Stadt eines Snapshots. Eine Partition liefert eine
+    Stadt, ein Snapshot des ganzen Netzes alle Städte (ein Durchlauf mit
+    `np.bincount` über die Stadt jeder Zone).
+    """
+    df_zones, df_fleet = snapshot.frames[0], snapshot.frames[4]
+    # Stadt pro Zonen-Kategorie bestimmen, dann über die Codes auf die Zeilen verteilen
+    zone = df_zones["zone"].cat
+    category_city = np.array([city_of_zone(z) for z in zone.categories], dtype=object)
+    city_codes, cities = pd.factorize(category_city[zone.codes])
+    n = len(cities)
+
+    def per_city(values, dtype=np.int64):
+        return np.bincount(city_codes, weights=np.asarray(values, dtype=float), minlength=n).astype(dtype)
+
+    risk = df_zones["risk_score"].to_numpy()
+    scooters = df_fleet.groupby("zone", observed=True, sort=False)["count"].sum()
+    scooters = scooters.reindex(df_zones["zone"]).fillna(0).to_numpy()
+
+    columns = {
+        "zones": np.bincount(city_codes, minlength=n),
+        "risk_score_sum": per_city(risk),
+        "critical": per_city(risk == 4),
+        "high": per_city(risk == 3),
+        "incidents_30min": per_city(df_zones["incidents_30min"]),
+        "blocked_min_sum": per_city(df_zones["blocked_min"], float),
+        "scooters": per_city(scooters),
+        "low_battery": per_city(df_zones["low_battery"]),
+    }
+    return {
+        city: PartitionSummary(
+            created_at=snapshot.created_at,
+            **{name: values[k].item() for name, values in columns.items()},
+        )
+        for k, city in enumerate(cities)
+    }
+
+
+def rollup_frame(summaries: dict) -> pd.DataFrame:
+    """
+    Städte-Übersicht aus Partition-Summaries: eine Zeile pro Stadt, dazu
+    Regionen und das ganze Netz als Summe ihrer Städte. Summen erscheinen
+    erst, wenn alle ihre Städte vorliegen; eine Teilsumme sähe aus wie ein
+    Gesamtwert.
+    """
+    rows = []
+    for region in REGIONS:
+        region_cities = [c for c in CITIES if CITY_REGION[c] == region]
+        cities = [c for c in region_cities if c in summaries]
+        for city in cities:
+            rows.append({"Ebene": "Stadt", "Name": city, **summaries[city].row()})
+        if len(region_cities) > 1 and len(cities) == len(region_cities):
+            total = reduce(PartitionSummary.merge, (summaries[c] for c in cities))
+            rows.append({"Ebene": "Region", "Name": region, **total.row()})
+    if all(c in summaries for c in CITIES):
+        total = reduce(PartitionSummary.merge, summaries.values())
+        rows.append({"Ebene": "Netz", "Name": NETWORK_LABEL, **total.row()})
+    return pd.DataFrame(rows)
+
+
+class PartitionSummaries:
+    """
+    Neueste Summary pro (scenario, n_zones, Stadt), gespeist über
+    `SharedDataCache.subscribe`. Die Übersicht über alle Städte liest nur
+    diese kleinen Summaries; keine Stadt-Partition muss dafür geladen
+    werden, die Kosten wachsen nur mit der Anzahl Städte, nicht mit deren
+    Zonen.
+
+    Quelle sind nur Snapshots des ganzen Netzes: alle Städte stammen so aus
+    derselben Generierung, Regionen und Netz-Summe mischen keine Stände.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest: dict = {}
+
+    def on_snapshot(self, snapshot) -> None:
+        if snapshot.city != ALL_CITIES:
+            return
+        key = (snapshot.scenario, snapshot.n_zones)
+        summaries = summarize(snapshot)
+        with self._lock:
+            current = self._latest.get(key)
+            if current is None or max(s.created_at for s in current.values()) <= snapshot.created_at:
+                # Ganz ersetzen: Städte ohne Zonen im neuen Stand sollen nicht stehen bleiben
+                self._latest[key] = summaries
+
+    def get(self, scenario: str, n_zones: int) -> dict:
+        with self._lock:
+            return dict(self._latest.get((scenario, n_zones), {}))
+
+    def frame(self, scenario: str, n_zones: int, city: str = ALL_CITIES) -> pd.DataFrame:
+        """Übersicht; bei einer Stadt nur deren Zeile, ihre Region und das Netz."""
+        df = rollup_frame(self.get(scenario, n_zones))
+        if city != ALL_CITIES and not df.empty:
+            df = df[(df["Ebene"] == "Netz") | df["Name"].isin([city, CITY_REGION[city]])]
+        return df
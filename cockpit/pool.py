@@ -0,0 +1,251 @@
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import fields
+from multiprocessing import shared_memory
+
+import pandas as pd
+import pyarrow as pa
+
+from cockpit.aggregates import AGGREGATES_KEY, ChartAggregates, compute_aggregates
+from cockpit.data import ALL_CITIES, ALL_FRAMES, map_frame, partition_dtype
+from cockpit.tables import ipc_bytes, read_ipc, to_arrow
+
+# Übertragene Frames; df_map (Index 2) teilt seine Spalten mit df_zones und
+# wird im Hauptprozess mit `map_frame` neu abgeleitet
+SHIPPED_FRAMES = (0, 1, 3, 4, 5)
+
+# Frames, deren Zonen-Spalte den gemeinsamen Kategorien-Typ des Rasters nutzt
+GRID_ZONE_FRAMES = (0, 4)
+
+AGGREGATE_TABLES = tuple(f.name for f in fields(ChartAggregates) if f.name != "kpis")
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def precompute(source, scenario: str, n_zones: int, epoch: int, city: str = ALL_CITIES,
+               frames=ALL_FRAMES) -> dict:
+    """
+    Läuft im Worker-Prozess: generiert die Frames und ihre Aggregate und
+    legt sie als Arrow-IPC-Streams hintereinander in einen Shared-Memory-Block.
+    Zurück an den Hauptprozess geht nur dessen Name, das Layout
+    (Name → Offset, Länge) und die KPIs; keine gepickelten DataFrames.
+    Nicht generierte Frames und ihre Aggregate fehlen im Layout.
+    """
+    frames = tuple(source.load(scenario, n_zones, epoch=epoch, city=city, frames=frames))
+    aggregates = compute_aggregates(frames)
+
+    # Die Aggregate sind schon Arrow-Tabellen und gehen ohne Umweg über pandas mit
+    buffers = {f"frame_{i}": ipc_bytes(to_arrow(frames[i]))
+               for i in SHIPPED_FRAMES if frames[i] is not None}
+    buffers.update({name: ipc_bytes(getattr(aggregates, name))
+                    for name in AGGREGATE_TABLES if getattr(aggregates, name) is not None})
+
+    block = shared_memory.SharedMemory(create=True, size=sum(b.size for b in buffers.values()))
+    layout = {}
+    offset = 0
+    try:
+        for name, buffer in buffers.items():
+            block.buf[offset:offset + buffer.size] = memoryview(buffer).cast("B")
+            layout[name] = (offset, buffer.size)
+            offset += buffer.size
+    except BaseException:
+        # Der Name erreicht den Hauptprozess nie: hier freigeben
+        block.close()
+        block.unlink()
+        raise
+    # Nur schliessen: freigegeben (unlink) wird der Block vom Hauptprozess
+    block.close()
+    return {"shm": block.name, "layout": layout, "kpis": aggregates.kpis}
+
+
+def read_shared(result: dict) -> dict:
+    """
+    IPC-Bytes der Tabellen eines `precompute`-Ergebnisses (Name → Buffer);
+    gibt den Block frei.
+
+    Arrow und pandas übernehmen Spalten ohne Kopie; damit der Block sofort
+    freigegeben werden kann, wird er einmal am Stück in einen
+    prozesseigenen Arrow-Buffer kopiert (ein memcpy, kein Unpickling). Die
+    Buffer sind Ausschnitte davon.
+    """
+    block = shared_memory.SharedMemory(name=result["shm"])
+    try:
+        size = sum(length for _, length in result["layout"].values())
+        data = pa.allocate_buffer(size)
+        memoryview(data).cast("B")[:] = block.buf[:size]
+    finally:
+        block.close()
+        block.unlink()
+    return {name: data.slice(offset, length) for name, (offset, length) in result["layout"].items()}
+
+
+def release_shared(result: dict) -> None:
+    """Gibt den Block eines nicht abgeholten `precompute`-Ergebnisses frei."""
+    try:
+        block = shared_memory.SharedMemory(name=result["shm"])
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+def _release_future(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        release_shared(future.result())
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+@contextmanager
+def _without_main_module():
+    """
+    Streamlit führt das App-Skript als `__main__` aus, und `spawn` importiert
+    `__main__` in jedem neuen Prozess erneut – jeder Worker würde die ganze
+    App starten (samt eigenem Pool). Solange Worker starten, steht deshalb
+    ein leeres Modul an seiner Stelle.
+    """
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _with_dtype(df, dtype):
+    # Arrow liefert pro Frame eigene Kategorien; den gemeinsamen Typ wieder einsetzen
+    if df["zone"].cat.categories.equals(dtype.categories):
+        return df.assign(zone=pd.Categorical.from_codes(df["zone"].cat.codes, dtype=dtype))
+    return df
+
+
+class ScenarioPool:
+    """
+    Prozess-Pool für die Generierung von Snapshots.
+
+    Die Worker werden per `spawn` gestartet (kein Fork eines Prozesses mit
+    laufenden Threads), alle gleich beim Anlegen des Pools, und erhalten die
+    Datenquelle gepickelt; sie muss
+    daher ohne Prozesszustand auskommen (`SyntheticSource`, nicht
+    `EventStreamSource`). Frames und Aggregate kommen als Arrow-IPC über
+    Shared Memory zurück (`precompute`); `collect` baut daraus im
+    Hauptprozess wieder Frames mit geteilten Spalten und Kategorien.
+
+    Jedes Future aus `submit` muss mit `collect` abgeholt oder mit
+    `discard` aufgegeben werden, sonst bleibt sein Block liegen.
+    `shutdown` gibt die Blöcke aller noch offenen Futures frei.
+
+    Stirbt ein Worker (OOM, Signal), ist der Executor unbrauchbar
+    (`BrokenProcessPool`). `submit` und `collect` starten dann einen neuen
+    Executor und bauen die betroffenen Jobs einmal seriell im
+    Hauptprozess; spätere Jobs laufen wieder im Pool.
+    """
+
+    def __init__(self, source, max_workers: int = None):
+        self._source = source
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Abgeschickte, noch nicht abgeholte Futures -> (Job-Argumente, Executor)
+        self._lock = threading.Lock()
+        self._open: dict = {}
+        self._executor = self._start_executor()
+
+    def _start_executor(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        # Alle Worker sofort starten: mit `spawn` startet jedes `submit` ohne
+        # freien Worker einen weiteren Prozess, danach kommen keine mehr dazu
+        with _without_main_module():
+            for _ in range(self.max_workers):
+                executor.submit(_ready)
+        return executor
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Ersetzt einen kaputten Executor; mehrere Threads ersetzen ihn nur einmal."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            _LOGGER.warning("Worker-Prozess abgestürzt, starte den Pool neu")
+            self._executor = self._start_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, scenario: str, n_zones: int, epoch: int, city: str = ALL_CITIES,
+               frames=ALL_FRAMES):
+        """Startet die Generierung; das Future liefert das Ergebnis für `collect`."""
+        job = (scenario, n_zones, epoch, city, frames)
+        executor = self._executor
+        try:
+            future = executor.submit(precompute, self._source, *job)
+        except BrokenProcessPool as exc:
+            self._restart(executor)
+            # `collect` baut diesen Job seriell
+            future = Future()
+            future.set_exception(exc)
+        with self._lock:
+            self._open[future] = (job, executor)
+        return future
+
+    def discard(self, future) -> None:
+        """Gibt ein nicht mehr benötigtes Future auf; ein schon erzeugter Block wird freigegeben."""
+        with self._lock:
+            self._open.pop(future, None)
+        if not future.cancel():
+            future.add_done_callback(_release_future)
+
+    def collect(self, future, n_zones: int, city: str = ALL_CITIES) -> tuple:
+        """
+        (frames, derived) eines abgeschlossenen Futures; `derived` enthält die
+        im Worker berechneten Aggregate.
+        """
+        with self._lock:
+            job, executor = self._open.pop(future, (None, None))
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            if job is None:
+                raise
+            self._restart(executor)
+            return self._build_serial(*job)
+        buffers = read_shared(result)
+
+        dtype = partition_dtype(n_zones, city)
+        frames = [read_ipc(buffers[f"frame_{i}"]).to_pandas() if f"frame_{i}" in buffers else None
+                  for i in range(6)]
+        for i in GRID_ZONE_FRAMES:
+            frames[i] = _with_dtype(frames[i], dtype)
+        frames[2] = map_frame(frames[0])
+
+        aggregates = ChartAggregates(
+            kpis=result["kpis"],
+            **{name: read_ipc(buffers[name]) if name in buffers else None for name in AGGREGATE_TABLES},
+        )
+        return tuple(frames), {AGGREGATES_KEY: aggregates}
+
+    def build(self, scenario: str, n_zones: int, epoch: int, city: str = ALL_CITIES,
+              frames=ALL_FRAMES) -> tuple:
+        return self.collect(self.submit(scenario, n_zones, epoch, city, frames), n_zones, city)
+
+    def _build_serial(self, scenario, n_zones, epoch, city, frames) -> tuple:
+        """Ersatz für einen Job, dessen Worker abgestürzt ist: im Hauptprozess bauen."""
+        frames = tuple(self._source.load(scenario, n_zones, epoch=epoch, city=city, frames=frames))
+        return frames, {AGGREGATES_KEY: compute_aggregates(frames)}
+
+    def shutdown(self) -> None:
+        """
+        Verwirft wartende Jobs, wartet auf die laufenden und gibt die Blöcke
+        aller nicht abgeholten Ergebnisse frei.
+        """
+        with self._lock:
+            pending, self._open = self._open, {}
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for future in pending:
+            _release_future(future)
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+
+from cockpit.data import ALL_FRAMES, CORE_FRAMES
+from cockpit.roles import LEITSTELLE, OEV_PLANUNG, POLIZEI, STADTVERWALTUNG
+
+# Tooltip-Spalten der Karte, die ein Profil wählen kann (Spalte -> Beschriftung).
+# Die Heatmap-Pyramide führt alle mit, damit auch aggregierte Zellen sie zeigen
+MAP_TOOLTIP_COLUMNS = {
+    "incidents_30min": "Incidents 30min",
+    "incidents_24h": "Incidents 24h",
+    "blocked_min": "Blockiert (min)",
+    "low_battery": "Scooter < 20% Batterie",
+}
+
+
+@dataclass(frozen=True)
+class DataProfile:
+    """
+    Welche Daten eine Rolle sieht: die Frames eines Snapshots (geladen,
+    gecacht und im Live-Modus aktualisiert werden nur diese, siehe
+    `SharedDataCache.get`), die Tooltip-Spalten der Karte und der
+    Standard-Zeitraum der Historie, der auch deren Auflösung bestimmt
+    (5 min, 1 h oder 1 Tag).
+    """
+
+    role: str
+    frames: frozenset
+    # Schlüssel aus MAP_TOOLTIP_COLUMNS bzw. HISTORY_RANGES
+    map_columns: tuple = ("incidents_30min",)
+    history_range: str = "24 Stunden"
+    history_expanded: bool = False
+
+    def shows(self, frame: str) -> bool:
+        return frame in self.frames
+
+
+PROFILES = {
+    # Leitstelle: Gesamtlage, alle Frames
+    LEITSTELLE: DataProfile(LEITSTELLE, ALL_FRAMES),
+    # Polizei: Incidents und Meldungen, keine Batterie-Telemetrie
+    POLIZEI: DataProfile(
+        POLIZEI,
+        CORE_FRAMES | {"trend", "reports"},
+        map_columns=("incidents_30min", "incidents_24h"),
+    ),
+    # Stadtverwaltung: Blockierungen, Meldungen und Rebalancing, ohne Kurzzeit-Trend
+    STADTVERWALTUNG: DataProfile(
+        STADTVERWALTUNG,
+        CORE_FRAMES | {"reports", "battery"},
+        map_columns=("blocked_min", "low_battery"),
+        history_range="7 Tage",
+    ),
+    # ÖV-Planung: lange Trends statt Live-Feed
+    OEV_PLANUNG: DataProfile(
+        OEV_PLANUNG,
+        CORE_FRAMES | {"trend"},
+        map_columns=("incidents_30min", "blocked_min"),
+        history_range="30 Tage",
+        history_expanded=True,
+    ),
+}
+
+
+def profile_for(role: str) -> DataProfile:
+    """Profil einer Rolle; unbekannte Rollen sehen alles wie die Leitstelle."""
+    return PROFILES.get(role, PROFILES[LEITSTELLE])
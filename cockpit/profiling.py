@@ -0,0 +1,236 @@
+import hmac
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Geteilter No-op-Kontext: bei ausgeschaltetem Profiling kostet ein Span nur
+# den Methodenaufruf
+_NULL_SPAN = nullcontext()
+
+
+@dataclass
+class RerunProfile:
+    """Messwerte eines Reruns: Spans (Sekunden), Zähler und Payload-Grössen (Bytes)."""
+
+    session: str
+    fragment: str = ""
+    started_at: datetime = field(default_factory=datetime.now)
+    total: float = 0.0
+    spans: dict = field(default_factory=lambda: defaultdict(float))
+    counters: dict = field(default_factory=lambda: defaultdict(int))
+    payload_bytes: dict = field(default_factory=lambda: defaultdict(int))
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+
+class Profiler:
+    """
+    Instrumentierung pro Rerun.
+
+    `begin_rerun` / `end_rerun` klammern einen Skriptdurchlauf; dazwischen
+    sammeln `span`, `count` und `payload` Messwerte für den Rerun des
+    aktuellen Threads (Streamlit führt jede Session in einem eigenen
+    Script-Thread aus). `fragment` misst ein `st.fragment`: im vollen Rerun
+    als Span, bei einem Fragment-Rerun als eigener Eintrag. Abgeschlossene
+    Reruns landen in einem Ringpuffer (`recent`) und in prozessweiten
+    Summen für den Prometheus-Export.
+
+    Ausgeschaltet (`enabled=False`) sind alle Methoden No-ops; `payload`
+    nimmt die Grösse deshalb als Callable, damit z. B. die JSON-Serialisierung
+    nur bei eingeschaltetem Profiling zusätzlich läuft.
+    """
+
+    def __init__(self, enabled: bool = False, history: int = 50, export_path: str = None,
+                 export_interval_seconds: float = 15.0):
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+
+        self._reruns = defaultdict(int)
+        self._span_sum = defaultdict(float)
+        self._span_count = defaultdict(int)
+        self._counters = defaultdict(int)
+        self._payload_bytes = defaultdict(int)
+        self._gauges = {}
+
+        self._export_path = export_path
+        self._export_interval = export_interval_seconds
+        self._last_export = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        """COCKPIT_PROFILING=1 schaltet ein; COCKPIT_METRICS_FILE schreibt den Prometheus-Text."""
+        return cls(
+            enabled=os.environ.get("COCKPIT_PROFILING", "0").lower() in ("1", "true", "yes"),
+            history=int(os.environ.get("COCKPIT_PROFILING_HISTORY", "50")),
+            export_path=os.environ.get("COCKPIT_METRICS_FILE"),
+        )
+
+    # ---------------------------------------------------------
+    # Messen
+    # ---------------------------------------------------------
+    def begin_rerun(self, session: str = "", fragment: str = "") -> None:
+        if not self.enabled:
+            return
+        self._local.current = RerunProfile(session=session, fragment=fragment)
+
+    def end_rerun(self) -> None:
+        if not self.enabled:
+            return
+        profile = getattr(self._local, "current", None)
+        if profile is None:
+            return
+        self._local.current = None
+        profile.total = time.perf_counter() - profile._start
+
+        with self._lock:
+            self._reruns["fragment" if profile.fragment else "app"] += 1
+            self._recent.append(profile)
+            for name, seconds in profile.spans.items():
+                self._span_sum[name] += seconds
+                self._span_count[name] += 1
+            for name, value in profile.counters.items():
+                self._counters[name] += value
+            for kind, nbytes in profile.payload_bytes.items():
+                self._payload_bytes[kind] += nbytes
+        self._maybe_export()
+
+    def span(self, name: str):
+        """Kontextmanager, der die Dauer des Blocks dem aktuellen Rerun zuschreibt."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timed(name)
+
+    def fragment(self, name: str, session: str = ""):
+        """Wie `span`; läuft nur das Fragment neu, entsteht ein eigener Rerun-Eintrag."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._fragment(name, session)
+
+    @contextmanager
+    def _fragment(self, name: str, session: str):
+        own_rerun = getattr(self._local, "current", None) is None
+        if own_rerun:
+            self.begin_rerun(session, fragment=name)
+        try:
+            with self._timed(name):
+                yield
+        finally:
+            if own_rerun:
+                self.end_rerun()
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            profile = getattr(self._local, "current", None)
+            if profile is not None:
+                profile.spans[name] += time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1) -> None:
+        if not self.enabled:
+            return
+        profile = getattr(self._local, "current", None)
+        if profile is not None:
+            profile.counters[name] += value
+
+    def payload(self, kind: str, size) -> None:
+        """Grösse eines an den Browser gesendeten Elements; `size()` wird nur eingeschaltet aufgerufen."""
+        if not self.enabled:
+            return
+        profile = getattr(self._local, "current", None)
+        if profile is not None:
+            profile.payload_bytes[kind] += int(size())
+            profile.counters[f"{kind}_elements"] += 1
+
+    def register_gauge(self, name: str, read) -> None:
+        """Momentanwert für den Export, z. B. Cache-Treffer; `read()` liefert eine Zahl."""
+        self._gauges[name] = read
+
+    # ---------------------------------------------------------
+    # Auswerten
+    # ---------------------------------------------------------
+    def recent(self, limit: int = None) -> list:
+        """Die letzten abgeschlossenen Reruns, neueste zuerst."""
+        with self._lock:
+            profiles = list(self._recent)[::-1]
+        return profiles[:limit] if limit else profiles
+
+    def prometheus_text(self) -> str:
+        """Prozessweite Summen im Prometheus-Textformat (Exposition 0.0.4)."""
+        with self._lock:
+            span_sum = dict(self._span_sum)
+            span_count = dict(self._span_count)
+            counters = dict(self._counters)
+            payload_bytes = dict(self._payload_bytes)
+            reruns = dict(self._reruns)
+
+        lines = [
+            "# HELP cockpit_reruns_total Abgeschlossene Reruns (ganzes Skript oder ein Fragment).",
+            "# TYPE cockpit_reruns_total counter",
+        ]
+        for scope in sorted(reruns):
+            lines.append(f'cockpit_reruns_total{{scope="{scope}"}} {reruns[scope]}')
+        lines += [
+            "# HELP cockpit_span_seconds Dauer der instrumentierten Abschnitte.",
+            "# TYPE cockpit_span_seconds summary",
+        ]
+        for name in sorted(span_sum):
+            lines.append(f'cockpit_span_seconds_sum{{span="{_label(name)}"}} {span_sum[name]:.6f}')
+            lines.append(f'cockpit_span_seconds_count{{span="{_label(name)}"}} {span_count[name]}')
+        lines += ["# HELP cockpit_events_total Zähler pro Rerun, aufsummiert.",
+                  "# TYPE cockpit_events_total counter"]
+        for name in sorted(counters):
+            lines.append(f'cockpit_events_total{{event="{_label(name)}"}} {counters[name]}')
+        lines += ["# HELP cockpit_payload_bytes_total An den Browser gesendete Chart-Daten.",
+                  "# TYPE cockpit_payload_bytes_total counter"]
+        for kind in sorted(payload_bytes):
+            lines.append(f'cockpit_payload_bytes_total{{kind="{_label(kind)}"}} {payload_bytes[kind]}')
+        for name, read in sorted(self._gauges.items()):
+            lines += [f"# TYPE cockpit_{name} gauge", f"cockpit_{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """Schreibt atomar (für den Textfile-Collector des node_exporter)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def _maybe_export(self) -> None:
+        if not self._export_path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < self._export_interval:
+                return
+            self._last_export = now
+        self.write_prometheus(self._export_path)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def admin_users() -> set:
+    """
+    Benutzernamen, denen das Profiling-Panel angeboten wird (COCKPIT_ADMINS,
+    kommagetrennt). Keine Zugriffskontrolle: der Login ist ein Mock und der
+    Name frei wählbar, freigeschaltet wird erst mit `admin_token_ok`.
+    """
+    return {name.strip() for name in os.environ.get("COCKPIT_ADMINS", "").split(",") if name.strip()}
+
+
+def admin_token_ok(token: str) -> bool:
+    """
+    Prüft `token` gegen das serverseitige Geheimnis COCKPIT_ADMIN_TOKEN
+    (Vergleich in konstanter Zeit). Ohne Geheimnis ist niemand freigeschaltet.
+    """
+    secret = os.environ.get("COCKPIT_ADMIN_TOKEN", "")
+    return bool(secret and token) and hmac.compare_digest(token.encode("utf-8"), secret.encode("utf-8"))
@@ -0,0 +1,65 @@
+import logging
+import threading
+
+from cockpit.data import CITY_DATA, SCENARIOS
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SnapshotRefresher:
+    """
+    Hintergrund-Thread, der alle Szenarien im festen Takt neu generiert.
+
+    Die neuen Snapshots werden über `SharedDataCache.refresh_many` eingetauscht;
+    das ganze Netz mit `default_n_zones` Zonen immer, weil Alarme, Historie
+    und die Städte-Übersicht daraus gespeist werden, alle übrigen Schlüssel
+    (andere Raster, Stadt-Partitionen, Datenprofile) nur, solange Sessions
+    sie innerhalb der TTL des Caches anfordern.
+    Reruns lesen mit `peek` immer den zuletzt veröffentlichten Stand und
+    warten damit nie auf eine laufende Generierung.
+    """
+
+    def __init__(self, cache, interval_seconds: float = 30.0, scenarios=SCENARIOS,
+                 default_n_zones: int = len(CITY_DATA)):
+        self._cache = cache
+        self._interval = interval_seconds
+        self._scenarios = list(scenarios)
+        self._default_n_zones = default_n_zones
+
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="snapshot-refresher", daemon=True
+        )
+
+    @property
+    def interval_seconds(self) -> float:
+        return self._interval
+
+    def start(self) -> "SnapshotRefresher":
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def refresh_now(self) -> None:
+        """Nächsten Durchlauf sofort auslösen statt auf das Intervall zu warten."""
+        self._wakeup.set()
+
+    def refresh_all(self) -> None:
+        # Alle Szenarien in einem Durchgang: mit Pool im Cache laufen sie parallel
+        try:
+            self._cache.refresh_many(self._scenarios, [self._default_n_zones])
+        except Exception:
+            # Fehlerhafte Szenarien blockieren die übrigen nicht (refresh_many veröffentlicht sie)
+            _LOGGER.exception("Refresh fehlgeschlagen")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
@@ -0,0 +1,345 @@
+import bisect
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+
+import pandas as pd
+import pyarrow as pa
+
+from cockpit.data import ALL_CITIES, PRIO_LABELS, base_zone, city_of_zone
+from cockpit.roles import LEITSTELLE, OEV_PLANUNG, POLIZEI, ROLE_LABEL, STADTVERWALTUNG
+
+# Zuständige Rollen pro Meldungsart (Textanfang); die Leitstelle sieht alle Meldungen,
+# Meldungen unbekannter Art gehen an alle Rollen
+REPORT_ROLES = {
+    "Nutzer-Meldung": (POLIZEI, STADTVERWALTUNG),
+    "E-Scooter blockiert": (STADTVERWALTUNG,),
+    "Mehrere Scooter umgestossen": (STADTVERWALTUNG,),
+    "Hohe Geschwindigkeiten": (POLIZEI,),
+    "Polizeimeldung": (POLIZEI,),
+    "ÖV-Meldung": (OEV_PLANUNG,),
+    "Kontrolle": (POLIZEI, STADTVERWALTUNG),
+    "Baustelle": (STADTVERWALTUNG, OEV_PLANUNG),
+    "Anwohnerbeschwerde": (STADTVERWALTUNG,),
+    "Technik": (),
+}
+
+# Volltextsuche: ganze Wörter, ohne Gross-/Kleinschreibung und Füllwörter
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset({"in", "im", "am", "an", "auf", "von", "mit", "zu", "der", "die", "das", "und"})
+
+# Gemerkte Trefferzahlen von Volltext-Abfragen pro Store
+MAX_CACHED_COUNTS = 256
+
+
+def report_roles(meldung: str) -> frozenset:
+    for prefix, roles in REPORT_ROLES.items():
+        if meldung.startswith(prefix):
+            return frozenset((LEITSTELLE, *roles))
+    return frozenset(ROLE_LABEL)
+
+
+def tokenize(text: str) -> frozenset:
+    return frozenset(
+        token for token in TOKEN_PATTERN.findall(str(text).lower())
+        if len(token) > 1 and token not in STOPWORDS
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Report:
+    ts: datetime
+    zone: str
+    meldung: str
+    prio: int
+    city: str
+    roles: frozenset
+    tokens: frozenset
+
+    @property
+    def key(self) -> tuple:
+        return (self.ts, self.zone, self.meldung)
+
+
+@dataclass(frozen=True)
+class ReportQuery:
+    """
+    Filter einer Feed-Seite; leere Felder filtern nicht. `zone` ist eine
+    Basis-Zone und umfasst deren Mikro-Zonen, `text` verlangt alle Wörter.
+    """
+
+    prios: tuple = ()
+    role: str = None
+    city: str = ALL_CITIES
+    zone: str = None
+    text: str = ""
+
+    def index_keys(self) -> list:
+        keys = []
+        if self.role is not None:
+            keys.append(("role", self.role))
+        if self.city != ALL_CITIES:
+            keys.append(("city", self.city))
+        if self.zone:
+            keys.append(("zone", self.zone))
+        keys.extend(("token", token) for token in sorted(self.tokens))
+        return keys or [("all",)]
+
+    @cached_property
+    def tokens(self) -> frozenset:
+        return tokenize(self.text)
+
+    def matches(self, report: Report) -> bool:
+        return (
+            (self.role is None or self.role in report.roles)
+            and (self.city == ALL_CITIES or report.city == self.city)
+            and (not self.zone or base_zone(report.zone) == self.zone)
+            and self.tokens <= report.tokens
+        )
+
+
+@dataclass(frozen=True)
+class ReportPage:
+    table: pa.Table
+    total: int
+    offset: int
+
+    @property
+    def empty(self) -> bool:
+        return self.table.num_rows == 0
+
+
+class ReportStore:
+    """
+    Meldungs-Feed mit Index nach Priorität und Zeit.
+
+    Für jeden Filterwert (Rolle, Stadt, Basis-Zone, Wort aus `meldung`)
+    gibt es pro Priorität eine Liste der Meldungs-IDs, aufsteigend nach
+    Zeit; neue Meldungen landen meist am Ende. Eine Seite liest die Listen
+    von "hoch" nach "niedrig" jeweils vom neuesten Eintrag her. Ein Filter
+    allein ist damit ein Ausschnitt einer Liste (Kosten ~ Seitengrösse);
+    bei mehreren läuft die kürzeste Liste und die Meldungen werden gegen
+    die übrigen Filter geprüft.
+
+    Trefferzahlen ohne Volltext kommen aus Zählern pro Kombination
+    (Rolle, Stadt, Basis-Zone, Priorität), die beim Einfügen mitgeführt
+    werden. Volltext-Zahlen werden einmal über die kürzeste Liste gezählt,
+    gemerkt (höchstens MAX_CACHED_COUNTS) und danach ebenfalls beim
+    Einfügen fortgeschrieben.
+
+    Über `max_reports` hinaus wird das älteste Viertel verworfen und der
+    Index neu aufgebaut.
+    """
+
+    def __init__(self, max_reports: int = 20_000):
+        self.max_reports = max_reports
+        self._lock = threading.Lock()
+        self._reports: dict = {}
+        self._ids: dict = {}
+        self._index: dict = {}
+        self._next_id = 0
+        # Stand des zuletzt übernommenen Snapshots pro Stadt-Partition
+        self._seen: dict = {}
+        # (Rolle oder None, Stadt oder ALL_CITIES, Basis-Zone oder None) -> Anzahl pro Priorität
+        self._tallies: dict = {}
+        # Volltext-Abfrage -> Trefferzahl (LRU)
+        self._counts: "OrderedDict[ReportQuery, int]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._reports)
+
+    def _order(self, report_id: int) -> tuple:
+        return (self._reports[report_id].ts, report_id)
+
+    def _insert(self, report_id: int, report: Report) -> None:
+        keys = [("all",), ("city", report.city), ("zone", base_zone(report.zone))]
+        keys.extend(("role", role) for role in report.roles)
+        keys.extend(("token", token) for token in report.tokens)
+        for key in keys:
+            lists = self._index.get(key)
+            if lists is None:
+                lists = self._index[key] = [[] for _ in PRIO_LABELS]
+            ids = lists[report.prio]
+            if not ids or self._order(ids[-1]) < (report.ts, report_id):
+                ids.append(report_id)
+            else:
+                bisect.insort(ids, report_id, key=self._order)
+
+        for combination in set(itertools.product(
+            (None, *report.roles), (ALL_CITIES, report.city), (None, base_zone(report.zone))
+        )):
+            tally = self._tallies.get(combination)
+            if tally is None:
+                tally = self._tallies[combination] = [0] * len(PRIO_LABELS)
+            tally[report.prio] += 1
+        for query in self._counts:
+            if query.matches(report) and (not query.prios or PRIO_LABELS[report.prio] in query.prios):
+                self._counts[query] += 1
+
+    def add_frame(self, df_reports: pd.DataFrame) -> int:
+        """Übernimmt die noch unbekannten Meldungen eines df_reports; gibt deren Anzahl zurück."""
+        added = 0
+        with self._lock:
+            for ts, zone, meldung, prio in zip(
+                df_reports["ts"].dt.to_pydatetime(),
+                df_reports["zone"].astype(str),
+                df_reports["meldung"].astype(str),
+                df_reports["prio"].cat.codes.to_numpy(),
+            ):
+                if (ts, zone, meldung) in self._ids:
+                    continue
+                report = Report(ts, zone, meldung, int(prio), city_of_zone(zone),
+                                report_roles(meldung), tokenize(meldung))
+                report_id = self._next_id
+                self._next_id += 1
+                self._reports[report_id] = report
+                self._ids[report.key] = report_id
+                self._insert(report_id, report)
+                added += 1
+            if added and len(self._reports) > self.max_reports:
+                self._evict()
+        return added
+
+    def ingest(self, snapshot) -> int:
+        """
+        Wie `add_frame`, aber jeden Snapshot nur einmal (der Aufruf pro Rerun
+        kostet dann nichts). Snapshots ohne Meldungen zählen nicht als
+        übernommen; ein später um die Meldungen ergänzter Stand folgt so noch.
+        """
+        df_reports = snapshot.frames[3]
+        if df_reports is None:
+            return 0
+        with self._lock:
+            seen = self._seen.get(snapshot.city)
+            if seen is not None and seen >= snapshot.created_at:
+                return 0
+            self._seen[snapshot.city] = snapshot.created_at
+        return self.add_frame(df_reports)
+
+    def _evict(self) -> None:
+        keep = sorted(self._reports, key=self._order)[len(self._reports) // 4:]
+        reports = {report_id: self._reports[report_id] for report_id in keep}
+        self._reports = reports
+        self._ids = {report.key: report_id for report_id, report in reports.items()}
+        self._index = {}
+        self._tallies = {}
+        self._counts.clear()
+        for report_id in keep:
+            self._insert(report_id, reports[report_id])
+
+    def _lists(self, query: ReportQuery) -> tuple:
+        # Kürzeste Liste der Filter (über die gewählten Prioritäten) und ob weitere Filter zu prüfen sind
+        prios = [PRIO_LABELS.index(p) for p in query.prios] if query.prios else range(len(PRIO_LABELS))
+        candidates = []
+        for key in query.index_keys():
+            lists = self._index.get(key)
+            if lists is None:
+                return [], False
+            candidates.append([lists[p] for p in prios])
+        driver = min(candidates, key=lambda lists: sum(len(ids) for ids in lists))
+        return driver, len(candidates) > 1
+
+    def count(self, query: ReportQuery) -> int:
+        prios = [PRIO_LABELS.index(p) for p in query.prios] if query.prios else range(len(PRIO_LABELS))
+        with self._lock:
+            if not query.tokens:
+                tally = self._tallies.get((query.role, query.city, query.zone or None))
+                return sum(tally[p] for p in prios) if tally else 0
+
+            total = self._counts.get(query)
+            if total is not None:
+                self._counts.move_to_end(query)
+                return total
+            driver, check = self._lists(query)
+            if check:
+                total = sum(query.matches(self._reports[i]) for ids in driver for i in ids)
+            else:
+                total = sum(len(ids) for ids in driver)
+            self._counts[query] = total
+            if len(self._counts) > MAX_CACHED_COUNTS:
+                self._counts.popitem(last=False)
+            return total
+
+    def page(self, query: ReportQuery = ReportQuery(), offset: int = 0, limit: int = 20) -> ReportPage:
+        """Meldungen `offset` bis `offset + limit` (wichtigste und neueste zuerst) als Arrow-Tabelle."""
+        total = self.count(query)
+        with self._lock:
+            driver, check = self._lists(query)
+            skip, selected = offset, []
+            for ids in driver:
+                if len(selected) == limit:
+                    break
+                if not check:
+                    # Ohne weitere Filter: ganze Listen überspringen, den Rest direkt ausschneiden
+                    if skip >= len(ids):
+                        skip -= len(ids)
+                        continue
+                    end = len(ids) - skip
+                    selected.extend(reversed(ids[max(end - (limit - len(selected)), 0):end]))
+                    skip = 0
+                    continue
+                for report_id in reversed(ids):
+                    if not query.matches(self._reports[report_id]):
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    selected.append(report_id)
+                    if len(selected) == limit:
+                        break
+            reports = [self._reports[i] for i in selected]
+
+        table = pa.table(
+            {
+                "zeit": pa.array([r.ts.strftime("%H:%M") for r in reports], pa.string()),
+                "zone": pa.array([r.zone for r in reports], pa.string()),
+                "meldung": pa.array([r.meldung for r in reports], pa.string()),
+                "prio": pa.array([PRIO_LABELS[r.prio] for r in reports], pa.string()),
+            }
+        )
+        return ReportPage(table=table, total=total, offset=offset)
+
+
+class ReportFeeds:
+    """
+    Ein ReportStore pro (scenario, n_zones), gespeist über
+    `SharedDataCache.subscribe`. Stadt-Partitionen dürfen Meldungen des
+    ganzen Netzes wiederholen; doppelte Meldungen (gleiche Zeit, Zone und
+    Text) werden nur einmal übernommen.
+
+    Die Meldungen liegen ausserhalb des Daten-Caches und zählen nicht zu
+    dessen `max_bytes`. Begrenzt sind sie über `max_reports` pro Store und
+    `max_stores` (am längsten nicht genutzte Stores werden verworfen),
+    insgesamt also höchstens `max_reports * max_stores` Meldungen.
+    """
+
+    def __init__(self, max_reports: int = 20_000, max_stores: int = 4):
+        self.max_reports = max_reports
+        self.max_stores = max_stores
+        self._lock = threading.Lock()
+        self._stores: "OrderedDict[tuple, ReportStore]" = OrderedDict()
+
+    def get(self, scenario: str, n_zones: int) -> ReportStore:
+        with self._lock:
+            key = (scenario, n_zones)
+            store = self._stores.get(key)
+            if store is None:
+                store = self._stores[key] = ReportStore(self.max_reports)
+                while len(self._stores) > self.max_stores:
+                    self._stores.popitem(last=False)
+            else:
+                self._stores.move_to_end(key)
+            return store
+
+    def on_snapshot(self, snapshot) -> None:
+        self.get(snapshot.scenario, snapshot.n_zones).ingest(snapshot)
+
+    def for_snapshot(self, snapshot) -> ReportStore:
+        """Store zum Snapshot; übernimmt dessen Meldungen, falls er vor dem Abonnieren erschien."""
+        store = self.get(snapshot.scenario, snapshot.n_zones)
+        store.ingest(snapshot)
+        return store
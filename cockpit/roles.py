@@ -0,0 +1,15 @@
+# =========================================================
+# ROLLEN (aus LB-Prototyp)
+# =========================================================
+
+LEITSTELLE = "Leitstelle Stadtverkehr"
+POLIZEI = "Polizei / Sicherheit"
+STADTVERWALTUNG = "Stadtverwaltung / Ordnungsamt"
+OEV_PLANUNG = "ÖV-Planung"
+
+ROLE_LABEL = {
+    LEITSTELLE: "Leitstelle",
+    POLIZEI: "Polizei",
+    STADTVERWALTUNG: "Stadtverwaltung",
+    OEV_PLANUNG: "ÖV-Planung",
+}
@@ -0,0 +1,104 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from cockpit.data import (
+    CITY_DATA,
+    PRIO_LABELS,
+    REPORT_PREFIXES,
+    STATUS_KEYS,
+    generate_live_data,
+    scenario_bias,
+    zone_layout,
+)
+
+# Anteil der Event-Typen im synthetischen Strom
+EVENT_MIX = {"ride": 0.55, "battery": 0.30, "incident": 0.10, "report": 0.05}
+
+# Scooter pro Zone für Batterie-Pings
+SCOOTERS_PER_ZONE = 20
+
+
+def scenario_seed(scenario: str, epoch: int = 0, base_seed: int = 0) -> int:
+    """Stabiler 64-Bit-Seed pro (Szenario, Epoch) – unabhängig vom Hash-Seed des Prozesses."""
+    digest = hashlib.blake2b(f"{base_seed}|{scenario}|{epoch}".encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+@dataclass(frozen=True)
+class ScenarioSpec:
+    """
+    Reproduzierbares Last-Szenario: Szenario-Bias (Pendler, Nightlife,
+    Schulweg, Baustellen), Zonen-Raster, Event-Rate und Anzahl Sessions.
+    Alle Zufallswerte hängen nur von (scenario, epoch, base_seed) ab.
+    """
+
+    scenario: str
+    n_zones: int = len(CITY_DATA)
+    events_per_second: float = 0.0
+    sessions: int = 1
+    base_seed: int = 0
+
+    def rng(self, epoch: int = 0) -> np.random.Generator:
+        return np.random.default_rng(scenario_seed(self.scenario, epoch, self.base_seed))
+
+    def frames(self, epoch: int = 0, now: datetime = None) -> tuple:
+        """Frame-Tupel wie `SyntheticSource` für diesen Epoch."""
+        return generate_live_data(
+            self.scenario, self.n_zones, seed=scenario_seed(self.scenario, epoch, self.base_seed), now=now
+        )
+
+    def events(self, start_ts: float, duration_seconds: float, epoch: int = 0) -> list:
+        """
+        Event-Strom für `EventStreamSource` über `duration_seconds` ab
+        `start_ts` (Poisson-Anzahl mit Rate `events_per_second`). Zonen mit
+        höherem Szenario-Bias erhalten mehr Incidents und Meldungen.
+        """
+        rng = self.rng(epoch)
+        zone_names, lat, lon, parent = zone_layout(self.n_zones)
+        bias = scenario_bias(self.scenario, parent, rng)
+
+        n = int(rng.poisson(self.events_per_second * duration_seconds))
+        ts = np.sort(start_ts + rng.uniform(0, duration_seconds, n))
+        kinds = rng.choice(list(EVENT_MIX), size=n, p=list(EVENT_MIX.values()))
+
+        uniform_zone = rng.integers(0, self.n_zones, n)
+        # Incidents und Meldungen konzentrieren sich auf Zonen mit hohem Bias
+        weights = np.exp(bias - bias.max())
+        biased_zone = rng.choice(self.n_zones, size=n, p=weights / weights.sum())
+        zone = np.where(np.isin(kinds, ["incident", "report"]), biased_zone, uniform_zone)
+
+        blocked = rng.exponential(scale=bias[zone] * 5)
+        scooter = zone * SCOOTERS_PER_ZONE + rng.integers(0, SCOOTERS_PER_ZONE, n)
+        level = np.clip(rng.normal(65, 18, n), 0, 100)
+        status = rng.choice(STATUS_KEYS, size=n, p=[0.6, 0.1, 0.25, 0.05])
+        prio = rng.choice(PRIO_LABELS, size=n, p=[0.4, 0.4, 0.2])
+        prefix = rng.integers(0, len(REPORT_PREFIXES), n)
+        tech = rng.random(n) < 0.2
+
+        events = []
+        for i in range(n):
+            event = {"type": str(kinds[i]), "ts": round(float(ts[i]), 3), "zone": zone_names[zone[i]]}
+            kind = event["type"]
+            if kind == "incident":
+                event["blocked_min"] = round(float(blocked[i]), 1)
+                if tech[i]:
+                    event["category"] = "tech"
+            elif kind == "battery":
+                event.update(scooter=f"S-{scooter[i]}", level=round(float(level[i]), 1),
+                             status=str(status[i]))
+            elif kind == "report":
+                event.update(meldung=REPORT_PREFIXES[prefix[i]] + zone_names[zone[i]],
+                             prio=str(prio[i]))
+            events.append(event)
+        return events
+
+
+def write_events(handle, events) -> int:
+    """Schreibt Events als NDJSON in ein geöffnetes Text-File; liefert die Anzahl."""
+    handle.writelines(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+    handle.flush()
+    return len(events)
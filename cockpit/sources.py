@@ -0,0 +1,353 @@
+import json
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from cockpit.battery import BatteryTelemetry, histogram_frame
+from cockpit.data import (
+    ALL_CITIES,
+    ALL_FRAMES,
+    CITY_DATA,
+    PRIO_LABELS,
+    STATUS_KEYS,
+    build_fleet_frame,
+    build_report_frame,
+    build_zone_frames,
+    generate_live_data,
+    partition_dtype,
+    partition_indices,
+    zone_layout,
+)
+from cockpit.scenarios import scenario_seed
+from cockpit.spatial import ZoneGridIndex
+from cockpit.windows import TimeWheel
+
+# Trend: 24 Buckets à 5 Minuten (letzte 2 Stunden)
+TREND_BUCKET_SECONDS = 5 * 60
+TREND_BUCKETS = 24
+
+# Trend-Kanäle im TimeWheel
+TREND_RIDES, TREND_REPORTS, TREND_TECH = 0, 1, 2
+
+# Incident-Fenster in 1-Minuten-Buckets: 5 min, 30 min, 24 h
+INCIDENT_BUCKET_SECONDS = 60
+INCIDENT_WINDOWS = (5, 30, 24 * 60)
+
+# Incidents im 30-Minuten-Fenster, ab denen eine Zone als mittel / hoch / kritisch gilt
+RISK_INCIDENT_THRESHOLDS = [5, 12, 20]
+
+
+# =========================================================
+# SCHNITTSTELLE
+# =========================================================
+class DataSource(ABC):
+    """
+    Quelle für das Frame-Tupel
+    (df_zones, df_trend, df_map, df_reports, df_fleet, df_battery).
+
+    Instanzen sind aufrufbar und können direkt als `loader` an
+    `SharedDataCache` übergeben werden. `epoch` zählt die Neuladungen eines
+    Szenarios; Quellen mit echten Daten ignorieren ihn. `city` beschränkt
+    die Frames auf die Partition einer Stadt, `frames` wählt die zu
+    liefernden Frames (siehe `FRAME_NAMES`); nicht gewählte dürfen None sein.
+    """
+
+    @abstractmethod
+    def load(self, scenario: str, n_zones: int, epoch: int = 0, city: str = ALL_CITIES,
+             frames=ALL_FRAMES) -> tuple:
+        ...
+
+    def __call__(self, scenario: str, n_zones: int, epoch: int = 0, city: str = ALL_CITIES,
+                 frames=ALL_FRAMES) -> tuple:
+        return self.load(scenario, n_zones, epoch, city, frames)
+
+
+class SyntheticSource(DataSource):
+    """
+    Zufallsdaten aus `generate_live_data`, geseedet pro (Szenario, Epoch):
+    derselbe `base_seed` liefert in jedem Lauf dieselbe Datenfolge. Eine
+    Stadt-Partition nutzt denselben Seed wie das ganze Netz und enthält
+    damit genau dessen Zeilen.
+    """
+
+    def __init__(self, base_seed: int = 0):
+        self.base_seed = base_seed
+
+    def load(self, scenario: str, n_zones: int, epoch: int = 0, city: str = ALL_CITIES,
+             frames=ALL_FRAMES) -> tuple:
+        return generate_live_data(
+            scenario, n_zones, seed=scenario_seed(scenario, epoch, self.base_seed), city=city,
+            frames=frames,
+        )
+
+
+def risk_from_incidents(incidents_30) -> np.ndarray:
+    """Risiko-Score 1–4 aus der Anzahl Incidents der letzten 30 Minuten."""
+    return 1.0 + np.digitize(incidents_30, RISK_INCIDENT_THRESHOLDS)
+
+
+def parse_timestamp(value) -> float:
+    """Event-Zeit als Unix-Sekunden; akzeptiert Zahlen und ISO-Strings."""
+    if isinstance(value, (int, float)):
+        return _finite(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _finite(value) -> float:
+    """Zahlenwert eines Event-Felds; ValueError/TypeError bei null, Text, NaN oder inf."""
+    if isinstance(value, bool):
+        raise TypeError("Wahrheitswert statt Zahl")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Kein endlicher Wert: {value!r}")
+    return number
+
+
+# =========================================================
+# EVENT-STREAM (NDJSON)
+# =========================================================
+class EventStreamSource(DataSource):
+    """
+    Liest zeilenweise JSON-Events und hält die Aggregate inkrementell aktuell.
+
+    `stream` ist ein Dateipfad (die Datei wird wie mit `tail -f` weiter
+    gelesen) oder ein Datei-ähnliches Objekt, z. B. `socket.makefile("r")`,
+    dessen `readline()` bei fehlenden Daten "" liefert.
+
+    Unterstützte Events (Zeit `ts` als Unix-Sekunden oder ISO-String):
+
+        {"type": "ride", "ts": ..., "zone": "Bern Zentrum"}
+        {"type": "incident", "ts": ..., "zone": ..., "blocked_min": 4.5, "category": "tech"}
+        {"type": "battery", "ts": ..., "zone": ..., "scooter": "S-17", "level": 54.0, "status": "free"}
+        {"type": "report", "ts": ..., "zone": ..., "meldung": "...", "prio": "hoch"}
+
+    Statt `zone` darf ein Event auch `lat`/`lon` tragen; es wird dann der
+    nächstgelegenen Zone zugeordnet.
+
+    Die Zeitfenster richten sich nach dem jüngsten Event (Stream-Uhr), ein
+    aufgezeichneter Stream lässt sich so reproduzierbar abspielen. Das
+    Szenario der Cache-Schlüssel spielt für echte Daten keine Rolle; die
+    Zonen-Anzahl ist das feste Raster `n_zones` des Streams, `load` lehnt
+    andere Werte ab. Eine Stadt-Partition liest nur die Zeilen ihrer Zonen
+    aus den Aggregaten.
+    """
+
+    def __init__(self, stream, n_zones: int = len(CITY_DATA), max_reports: int = 200):
+        self._stream = stream
+        self._handle = None
+        self._partial = ""
+        self._lock = threading.Lock()
+
+        self._n_zones = n_zones
+        self._zone_names, self._lat, self._lon, _ = zone_layout(n_zones)
+        self._zone_index = {name: i for i, name in enumerate(self._zone_names)}
+        self._spatial = ZoneGridIndex(self._lat, self._lon)
+
+        self._clock = 0.0
+        # Incidents pro Zone (5 min / 30 min / 24 h) und Blockierungsminuten (30 min)
+        self._incidents = TimeWheel(
+            n_zones, INCIDENT_BUCKET_SECONDS, INCIDENT_WINDOWS[-1], INCIDENT_WINDOWS
+        )
+        self._blocked = TimeWheel(
+            n_zones, INCIDENT_BUCKET_SECONDS, INCIDENT_WINDOWS[1], INCIDENT_WINDOWS[1:2],
+            dtype=float,
+        )
+        # Trend: Kanäle rides / reports / tech_issues in 5-Minuten-Buckets
+        self._trend = TimeWheel(3, TREND_BUCKET_SECONDS, TREND_BUCKETS)
+        # Scooter-ID -> (zone_idx, status_code, Batterie-Zelle); einzige Stelle mit Scooter-Zustand
+        self._scooters: dict = {}
+        self._battery = BatteryTelemetry(n_zones)
+        self._fleet_counts = np.zeros((n_zones, len(STATUS_KEYS)), dtype=np.int64)
+        self._reports = deque(maxlen=max_reports)
+
+        self.events_applied = 0
+        self.events_dropped = 0
+
+    @property
+    def n_zones(self) -> int:
+        return self._n_zones
+
+    # ---------------------------------------------------------
+    # Einlesen
+    # ---------------------------------------------------------
+    def poll(self) -> int:
+        """Liest alle aktuell verfügbaren Zeilen ein; liefert die Anzahl Events."""
+        handle = self._open()
+        if handle is None:
+            return 0
+
+        applied = 0
+        while True:
+            line = handle.readline()
+            if not line:
+                break
+            if not line.endswith("\n"):
+                # Unvollständige Zeile: beim nächsten Poll fortsetzen
+                self._partial += line
+                break
+            line, self._partial = self._partial + line, ""
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                self.events_dropped += 1
+                continue
+            applied += self.apply(event)
+        return applied
+
+    def _open(self):
+        if self._handle is None:
+            if isinstance(self._stream, (str, os.PathLike)):
+                if not os.path.exists(self._stream):
+                    return None
+                self._handle = open(self._stream, encoding="utf-8")
+            else:
+                self._handle = self._stream
+        return self._handle
+
+    def apply(self, event: dict) -> bool:
+        """
+        Wendet ein einzelnes Event in O(1) (amortisiert) auf die Aggregate an.
+        Unbekannte oder fehlerhafte Events (fehlende Felder, null oder nicht
+        numerische Werte) zählen in `events_dropped` und ändern nichts.
+        """
+        try:
+            kind, zone_idx, ts, values = self._parse(event)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.events_dropped += 1
+            return False
+
+        self._clock = max(self._clock, ts)
+
+        if kind == "ride":
+            self._trend.add(TREND_RIDES, ts)
+        elif kind == "incident":
+            self._incidents.add(zone_idx, ts)
+            self._blocked.add(zone_idx, ts, values["blocked_min"])
+            if values["tech"]:
+                self._trend.add(TREND_TECH, ts)
+        elif kind == "battery":
+            scooter, status_code = values["scooter"], values["status_code"]
+            previous = self._scooters.get(scooter)
+            if previous is not None:
+                self._fleet_counts[previous[0], previous[1]] -= 1
+            self._fleet_counts[zone_idx, status_code] += 1
+            cell = self._battery.replace(None if previous is None else previous[2],
+                                         zone_idx, values["level"])
+            self._scooters[scooter] = (zone_idx, status_code, cell)
+        else:
+            self._reports.append((ts, self._zone_names[zone_idx], values["meldung"], values["prio"]))
+            self._trend.add(TREND_REPORTS, ts)
+
+        self.events_applied += 1
+        return True
+
+    def _parse(self, event: dict) -> tuple:
+        """(kind, zone_idx, ts, Werte) eines Events; wirft bei fehlerhaften Events."""
+        kind = event.get("type")
+        if kind not in ("ride", "incident", "battery", "report"):
+            raise ValueError(f"Unbekannter Event-Typ: {kind!r}")
+        ts = parse_timestamp(event["ts"])
+        zone_idx = self._zone_index.get(event.get("zone"))
+        if zone_idx is None:
+            zone_idx = self._spatial.nearest(_finite(event["lat"]), _finite(event["lon"]))
+
+        values = {}
+        if kind == "incident":
+            values["blocked_min"] = _finite(event.get("blocked_min", 0.0))
+            values["tech"] = event.get("category") == "tech"
+        elif kind == "battery":
+            scooter = event["scooter"]
+            if not isinstance(scooter, (str, int)):
+                raise TypeError("Scooter-ID fehlt")
+            status = event.get("status", "free")
+            values["scooter"] = scooter
+            values["status_code"] = STATUS_KEYS.index(status) if status in STATUS_KEYS else 0
+            values["level"] = _finite(event.get("level", 0.0))
+        elif kind == "report":
+            prio = event.get("prio", "mittel")
+            values["meldung"] = str(event.get("meldung") or "")
+            values["prio"] = prio if prio in PRIO_LABELS else "mittel"
+        return kind, zone_idx, ts, values
+
+    # ---------------------------------------------------------
+    # Frames
+    # ---------------------------------------------------------
+    def load(self, scenario: str = None, n_zones: int = None, epoch: int = 0,
+             city: str = ALL_CITIES, frames=ALL_FRAMES) -> tuple:
+        if n_zones is not None and n_zones != self._n_zones:
+            raise ValueError(
+                f"Der Event-Stream hat {self._n_zones} Zonen, angefordert wurden {n_zones}."
+            )
+        with self._lock:
+            self.poll()
+            return self._frames(city, frames)
+
+    def _frames(self, city: str = ALL_CITIES, frames=ALL_FRAMES) -> tuple:
+        # Alle Uhren auf das jüngste Event bringen, damit Verfallenes herausfällt
+        for wheel in (self._incidents, self._blocked, self._trend):
+            wheel.advance_to(self._clock)
+
+        # Partition: nur die Zeilen der Stadt (Slice = ganzes Netz)
+        rows = slice(None) if city == ALL_CITIES else partition_indices(self._n_zones, city)
+        zone_names = self._zone_names[rows]
+        dtype = None if city == ALL_CITIES else partition_dtype(self._n_zones, city)
+
+        incidents_5, incidents_30, incidents_24 = (
+            self._incidents.window_sum(k)[rows] for k in range(len(INCIDENT_WINDOWS))
+        )
+        blocked_min = self._blocked.window_sum(0)[rows]
+
+        df_zones, df_map = build_zone_frames(
+            zone_names,
+            self._lat[rows],
+            self._lon[rows],
+            risk_from_incidents(incidents_30),
+            incidents_5,
+            incidents_30,
+            incidents_24,
+            blocked_min,
+            self._battery.low_counts()[rows],
+            dtype,
+        )
+
+        # Die Fenster laufen für alle Frames weiter; nur nicht gewählte Frames werden nicht gebaut
+        df_trend = df_reports = df_battery = None
+        if "trend" in frames:
+            trend = self._trend.series().astype(float)
+            df_trend = pd.DataFrame(
+                {
+                    "timestamp": [datetime.fromtimestamp(t) for t in self._trend.bucket_starts()],
+                    "rides": trend[:, TREND_RIDES],
+                    "reports": trend[:, TREND_REPORTS],
+                    "tech_issues": trend[:, TREND_TECH],
+                }
+            )
+
+        if "reports" in frames:
+            reports = list(reversed(self._reports))
+            if city != ALL_CITIES:
+                in_city = set(zone_names)
+                reports = [r for r in reports if r[1] in in_city]
+            df_reports = build_report_frame(
+                [datetime.fromtimestamp(r[0]) for r in reports],
+                [r[1] for r in reports],
+                [r[2] for r in reports],
+                [r[3] for r in reports],
+            )
+
+        df_fleet = build_fleet_frame(zone_names, self._fleet_counts[rows].copy(), dtype)
+        if "battery" in frames:
+            df_battery = (
+                self._battery.frame() if city == ALL_CITIES
+                else histogram_frame(self._battery.histogram(rows))
+            )
+
+        return df_zones, df_trend, df_map, df_reports, df_fleet, df_battery
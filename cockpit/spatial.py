@@ -0,0 +1,165 @@
+import math
+
+import numpy as np
+
+# deck.gl rechnet mit 512-Pixel-Kacheln (Web-Mercator)
+DECK_TILE_SIZE = 512
+
+
+class ZoneGridIndex:
+    """
+    Räumlicher Index über Zonen-Koordinaten (gleichmässiges lat/lon-Raster,
+    ähnlich Geohash).
+
+    Die Zonen werden nach Zellen-ID (Zeile * Spalten + Spalte) sortiert.
+    Eine Rasterzeile eines Rechtecks ist damit ein zusammenhängender
+    Abschnitt und lässt sich per `searchsorted` finden – eine
+    Rechteck-Abfrage kostet O(Zeilen · log n + Treffer) statt O(n).
+    """
+
+    def __init__(self, lat, lon, cell_deg: float = 0.02):
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.cell_deg = cell_deg
+
+        self._lat0 = float(self.lat.min()) if len(self.lat) else 0.0
+        self._lon0 = float(self.lon.min()) if len(self.lon) else 0.0
+        self._n_rows = self._row(self.lat.max()) + 1 if len(self.lat) else 1
+        self._n_cols = self._col(self.lon.max()) + 1 if len(self.lon) else 1
+
+        keys = self._key(self._row(self.lat), self._col(self.lon))
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+
+    @classmethod
+    def from_frame(cls, df, cell_deg: float = 0.02) -> "ZoneGridIndex":
+        return cls(df["lat"].to_numpy(), df["lon"].to_numpy(), cell_deg)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def _row(self, lat):
+        return np.floor((np.asarray(lat) - self._lat0) / self.cell_deg).astype(np.int64)
+
+    def _col(self, lon):
+        return np.floor((np.asarray(lon) - self._lon0) / self.cell_deg).astype(np.int64)
+
+    def _key(self, row, col):
+        return row * self._n_cols + col
+
+    def _cells(self, row_min, row_max, col_min, col_max) -> np.ndarray:
+        """Indizes aller Zonen in den Rasterzellen des Rechtecks (inklusiv)."""
+        row_min, row_max = max(row_min, 0), min(row_max, self._n_rows - 1)
+        col_min, col_max = max(col_min, 0), min(col_max, self._n_cols - 1)
+        if row_min > row_max or col_min > col_max:
+            return np.empty(0, dtype=np.int64)
+
+        rows = np.arange(row_min, row_max + 1)
+        starts = np.searchsorted(self._keys, self._key(rows, col_min), side="left")
+        ends = np.searchsorted(self._keys, self._key(rows, col_max), side="right")
+        slices = [self._order[s:e] for s, e in zip(starts, ends) if e > s]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    # ---------------------------------------------------------
+    # Abfragen
+    # ---------------------------------------------------------
+    def within(self, lat_min, lat_max, lon_min, lon_max) -> np.ndarray:
+        """Zonen-Indizes innerhalb des Rechtecks, aufsteigend sortiert."""
+        candidates = self._cells(
+            int(self._row(lat_min)), int(self._row(lat_max)),
+            int(self._col(lon_min)), int(self._col(lon_max)),
+        )
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(candidates[inside])
+
+    def nearest(self, lat: float, lon: float) -> int:
+        """Index der nächstgelegenen Zone (Ringsuche über die Rasterzellen)."""
+        if not len(self):
+            raise ValueError("Index enthält keine Zonen.")
+        row, col = int(self._row(lat)), int(self._col(lon))
+        max_ring = max(self._n_rows, self._n_cols) + abs(row) + abs(col)
+        coslat = math.cos(math.radians(lat))
+
+        best, best_dist = -1, np.inf
+        for ring in range(max_ring + 1):
+            candidates = self._cells(row - ring, row + ring, col - ring, col + ring)
+            if len(candidates):
+                d = (self.lat[candidates] - lat) ** 2 + ((self.lon[candidates] - lon) * coslat) ** 2
+                i = int(np.argmin(d))
+                if d[i] < best_dist:
+                    best, best_dist = int(candidates[i]), float(d[i])
+            # Alles ausserhalb des Rings ist mindestens `ring` Zellen entfernt
+            if best >= 0 and best_dist <= (ring * self.cell_deg * coslat) ** 2:
+                break
+        return best
+
+
+def viewport_bounds(latitude: float, longitude: float, zoom: float,
+                    width_px: int = 1400, height_px: int = 700, margin: float = 1.5):
+    """
+    Grobes (lat_min, lat_max, lon_min, lon_max) des sichtbaren Kartenausschnitts
+    für einen pydeck-ViewState. `margin` vergrössert den Ausschnitt, damit
+    Neigung (pitch) und leichtes Verschieben im Browser abgedeckt sind.
+
+    pydeck meldet Verschieben und Zoomen im Browser nicht an den Server
+    zurück; berechnet wird also immer der Start-Ausschnitt (`initial_view_state`),
+    den der Server selbst festlegt.
+    """
+    deg_per_px = 360.0 / (DECK_TILE_SIZE * 2 ** zoom)
+    half_lon = width_px / 2 * deg_per_px * margin
+    half_lat = height_px / 2 * deg_per_px * math.cos(math.radians(latitude)) * margin
+    return latitude - half_lat, latitude + half_lat, longitude - half_lon, longitude + half_lon
+
+
+def fit_zoom(lat, lon, width_px: int = 1400, height_px: int = 700,
+             padding: float = 1.2, max_zoom: float = 11.0) -> float:
+    """
+    Grösste Zoomstufe, bei der alle Punkte samt `padding` in den Ausschnitt
+    passen (Umkehrung von `viewport_bounds`, ohne dessen `margin`).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    center_lat = (lat.min() + lat.max()) / 2
+    span_lat = (lat.max() - lat.min()) * padding
+    span_lon = (lon.max() - lon.min()) * padding
+    zoom = max_zoom
+    if span_lon > 0:
+        zoom = min(zoom, math.log2(360.0 * width_px / (DECK_TILE_SIZE * span_lon)))
+    if span_lat > 0:
+        zoom = min(zoom, math.log2(
+            360.0 * height_px * math.cos(math.radians(center_lat)) / (DECK_TILE_SIZE * span_lat)
+        ))
+    return zoom
+
+
+def top_k(columns, k: int) -> np.ndarray:
+    """
+    Indizes der `k` grössten Zeilen, absteigend lexikografisch nach
+    `columns` (erste Spalte zuerst) – ohne die ganze Tabelle zu sortieren.
+
+    Spalte für Spalte trennt `np.partition` die Zeilen über dem k-grössten
+    Wert (sicher dabei) von denen, die ihn genau erreichen; nur dieser
+    Gleichstand wird mit der nächsten Spalte weiter aufgeteilt. Bei
+    wenigen Stufen in der ersten Spalte (Risiko 1–4) bleiben so nicht alle
+    Zonen einer Stufe übrig, sondern nur die im Gleichstand über alle Spalten.
+    Sortiert werden am Ende höchstens `k` Zeilen plus dieser Rest.
+    """
+    columns = [np.asarray(c) for c in columns]
+    candidates = np.arange(len(columns[0]))
+    selected = []
+    need = k
+    for column in columns:
+        if len(candidates) <= need:
+            break
+        values = column[candidates]
+        kth = np.partition(values, len(values) - need)[len(values) - need]
+        above = values > kth
+        selected.append(candidates[above])
+        need -= int(above.sum())
+        candidates = candidates[values == kth]
+    candidates = np.concatenate(selected + [candidates])
+
+    # lexsort sortiert nach dem letzten Schlüssel zuerst, aufsteigend
+    order = np.lexsort([-c[candidates] for c in reversed(columns)])
+    return candidates[order[:k]]
@@ -0,0 +1,28 @@
+import pandas as pd
+import pyarrow as pa
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Arrow-Tabelle eines Frames ohne Index. Numerische Spalten und die Codes
+    von Kategorien übernimmt Arrow ohne Kopie; kopiert werden nur Texte.
+    """
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def project(table: pa.Table, columns: dict) -> pa.Table:
+    """Spalten auswählen und umbenennen ({alt: neu}); beides nur eine Sicht auf dieselben Buffer."""
+    return table.select(list(columns)).rename_columns(list(columns.values()))
+
+
+def ipc_bytes(table: pa.Table) -> pa.Buffer:
+    """Arrow-IPC-Stream einer Tabelle, wie ihn das Frontend bekommt."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def read_ipc(buffer: pa.Buffer) -> pa.Table:
+    """Gegenstück zu `ipc_bytes`; die Spalten zeigen direkt in `buffer`."""
+    return pa.ipc.open_stream(buffer).read_all()
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+from cockpit.data import COLOR_COLUMNS, RISK_COLORS, RISK_LABELS
+from cockpit.spatial import DECK_TILE_SIZE
+
+# Obergrenze für die an den Browser geschickten Heatmap-Zellen
+MAX_HEAT_CELLS = 50_000
+
+# Ab so vielen sichtbaren Zonen zeigt der Scatterplot aggregierte Zellen
+MAX_SCATTER_ZONES = 2_000
+
+
+def mercator_pixels(lat, lon, zoom: int):
+    """Web-Mercator-Pixelkoordinaten (deck.gl, 512er-Kacheln) auf einer Zoomstufe."""
+    world = DECK_TILE_SIZE * 2.0 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon) + 180.0) / 360.0 * world
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * world
+    return x, y
+
+
+class HeatTilePyramid:
+    """
+    Serverseitig vorberechnete Heatmap-Pyramide.
+
+    Auf jeder Zoomstufe werden die Punkte in Rasterzellen von `cell_px`
+    Bildschirm-Pixeln zusammengefasst (Summe der Gewichte, Anzahl,
+    Schwerpunkt, optionale Zusatzsummen). Die feinste Stufe wird einmal aus
+    den Punkten gebaut, jede gröbere aus den Zellen der nächstfeineren – die
+    Kosten pro Stufe hängen also nur von der Anzahl Zellen ab.
+
+    `cells` liefert für eine Karten-Zoomstufe die passende Stufe; übersteigt
+    der Ausschnitt `max_cells`, wird automatisch eine gröbere gewählt.
+    """
+
+    def __init__(self, lat, lon, weight=None, extra=None, min_zoom: int = 3,
+                 max_zoom: int = 16, cell_px: int = 32):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        weight = np.ones(len(lat)) if weight is None else np.asarray(weight, dtype=float)
+        extra = {name: np.asarray(values, dtype=float) for name, values in (extra or {}).items()}
+
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px
+        self.extra_columns = list(extra)
+        self._levels: dict = {}
+
+        x, y = mercator_pixels(lat, lon, max_zoom)
+        ix = (x // cell_px).astype(np.int64)
+        iy = (y // cell_px).astype(np.int64)
+        sums = {"weight": weight, "count": np.ones(len(lat)), "lat": lat, "lon": lon, **extra}
+        self._levels[max_zoom] = self._aggregate(ix, iy, sums)
+
+        for zoom in range(max_zoom - 1, min_zoom - 1, -1):
+            finer = self._levels[zoom + 1]
+            self._levels[zoom] = self._aggregate(
+                finer["ix"] >> 1, finer["iy"] >> 1,
+                {name: finer[name] for name in sums},
+            )
+
+    @classmethod
+    def from_frame(cls, df, weight: str = None, extra=(), **kwargs) -> "HeatTilePyramid":
+        return cls(
+            df["lat"].to_numpy(),
+            df["lon"].to_numpy(),
+            None if weight is None else df[weight].to_numpy(),
+            {name: df[name].to_numpy() for name in extra},
+            **kwargs,
+        )
+
+    @staticmethod
+    def _aggregate(ix, iy, sums) -> dict:
+        keys = (ix << 32) | iy
+        unique, inverse = np.unique(keys, return_inverse=True)
+        level = {"ix": unique >> 32, "iy": unique & 0xFFFFFFFF}
+        for name, values in sums.items():
+            level[name] = np.bincount(inverse, weights=values, minlength=len(unique))
+        return level
+
+    def level_for(self, zoom: float) -> int:
+        return int(np.clip(np.floor(zoom), self.min_zoom, self.max_zoom))
+
+    def n_cells(self, level: int) -> int:
+        return len(self._levels[level]["ix"])
+
+    def cells(self, zoom: float, bounds=None, max_cells: int = MAX_HEAT_CELLS) -> pd.DataFrame:
+        """
+        Zellen der zu `zoom` passenden Stufe als DataFrame
+        (lat, lon, weight, count, Zusatzspalten), optional auf
+        `bounds` = (lat_min, lat_max, lon_min, lon_max) beschränkt.
+        """
+        level = self.level_for(zoom)
+        while True:
+            data = self._levels[level]
+            count = data["count"]
+            lat = data["lat"] / count
+            lon = data["lon"] / count
+            mask = slice(None)
+            if bounds is not None:
+                lat_min, lat_max, lon_min, lon_max = bounds
+                mask = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+            n_selected = len(lat) if bounds is None else int(mask.sum())
+            if n_selected <= max_cells or level == self.min_zoom:
+                break
+            level -= 1
+
+        frame = {
+            "lat": lat[mask],
+            "lon": lon[mask],
+            "weight": data["weight"][mask],
+            "count": count[mask].astype(np.int64),
+        }
+        for name in self.extra_columns:
+            frame[name] = data[name][mask]
+        return pd.DataFrame(frame)
+
+
+def cells_as_zones(cells: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bereitet aggregierte Zellen (Gewicht = risk_score) für den
+    Scatterplot-Layer auf: mittleres Risiko, Farbe und Tooltip-Felder.
+    """
+    risk_score = np.clip(np.round(cells["weight"] / cells["count"]), 1, 4)
+    risk_codes = risk_score.astype(np.int8).to_numpy() - 1
+    df = pd.DataFrame(
+        {
+            "zone": cells["count"].astype(str) + " Zonen",
+            "lat": cells["lat"],
+            "lon": cells["lon"],
+            "risk_score": risk_score,
+            "risk_label": np.array(RISK_LABELS)[risk_codes],
+        }
+    )
+    # Zusatzsummen der Pyramide (z. B. incidents_30min) als ganze Zahlen
+    for name in cells.columns.difference(["lat", "lon", "weight", "count"], sort=False):
+        df[name] = np.rint(cells[name]).astype(np.int64)
+    colors = RISK_COLORS[risk_codes]
+    for k, column in enumerate(COLOR_COLUMNS):
+        df[column] = colors[:, k]
+    return df
@@ -0,0 +1,214 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from cockpit.data import CITY_DATA, RISK_COLORS, RISK_LABELS, ZONES, city_of_zone, scenario_bias
+
+# Simulationstakt: 6 Schritte à 10 Minuten = 1 Stunde Horizont
+STEP_MINUTES = 10
+N_STEPS = 6
+RUN_OPTIONS = [1_000, 10_000]
+
+# Modell wie in generate_live_data: Risiko um den Szenario-Bias gestreut,
+# Blockierung proportional zum Risiko
+RISK_NOISE = 0.6
+REVERSION_MINUTES = 30.0
+DEMAND_SHOCK = 0.15
+BLOCKED_PER_RISK = 10.0
+BLOCKED_NOISE = 6.0
+
+PERCENTILES = (10, 50, 90)
+
+# Standardnormal-Verteilungsfunktion als Tabelle (kein scipy): np.interp
+# statt math.erf pro Wert; Fehler der linearen Interpolation < 1e-6
+_Z_GRID = np.linspace(-8.0, 8.0, 4_001)
+_PHI_GRID = 0.5 * (1 + np.array([math.erf(z / math.sqrt(2)) for z in _Z_GRID]))
+
+# Zonen pro Block: begrenzt die (Zonen × Läufe)-Puffer auf einige MB
+ZONE_CHUNK = 128
+
+
+@dataclass(frozen=True)
+class BiasOverride:
+    """
+    Eingriff für eine Zone, eine Basis-Zone samt Mikro-Zonen (z. B.
+    "Bern Wankdorf") oder eine ganze Stadt: zusätzlicher Risiko-Bias und
+    zusätzliche Sperrminuten.
+    """
+
+    target: str
+    risk: float = 0.0
+    blocked_min: float = 0.0
+
+
+@dataclass(frozen=True)
+class WhatIfSpec:
+    overrides: tuple = ()
+    runs: int = 10_000
+    steps: int = N_STEPS
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class WhatIfResult:
+    """
+    Perzentile über alle Läufe: pro Zone am Ende des Horizonts (`zones`) und
+    pro Zeitschritt der Anteil kritischer Zonen im Netz (`timeline`).
+    """
+
+    zones: pd.DataFrame
+    timeline: pd.DataFrame
+    spec: WhatIfSpec
+
+    def top_zones(self, k: int = 15) -> pd.DataFrame:
+        """Die `k` Zonen mit der höchsten Wahrscheinlichkeit für "kritisch" (für das Balkendiagramm)."""
+        return self.zones.nlargest(k, ["p_critical", "blocked_p90"])
+
+
+def zone_parents(zones: pd.Series) -> np.ndarray:
+    """Basis-Zone (Index in CITY_DATA) jeder Zeile; Mikro-Zonen heissen wie ihre Basis-Zone plus " #n"."""
+    cat = zones.astype("category").cat
+    base = pd.Index(ZONES).get_indexer([str(z).split(" #", 1)[0] for z in cat.categories])
+    return base[cat.codes]
+
+
+def override_vectors(zones: pd.Series, overrides) -> tuple:
+    """(Risiko-Bias, Sperrminuten) pro Zeile aus den Eingriffen; mehrere Treffer addieren sich."""
+    cat = zones.astype("category").cat
+    names = [str(z) for z in cat.categories]
+    risk = np.zeros(len(names), dtype=np.float32)
+    blocked = np.zeros(len(names), dtype=np.float32)
+    for override in overrides:
+        hit = np.array([
+            z == override.target or z.split(" #", 1)[0] == override.target
+            or city_of_zone(z) == override.target
+            for z in names
+        ], dtype=bool)
+        risk[hit] += override.risk
+        blocked[hit] += override.blocked_min
+    return risk[cat.codes], blocked[cat.codes]
+
+
+def _discrete_percentiles(counts: np.ndarray, runs: int) -> np.ndarray:
+    # counts: (Zonen, 4) Läufe pro Risikostufe → Stufe (1–4) je Perzentil
+    share = np.cumsum(counts, axis=1) / runs
+    return np.stack([(share >= p / 100).argmax(axis=1) + 1 for p in PERCENTILES])
+
+
+def _blocked_percentiles(counts: np.ndarray, blocked_delta: np.ndarray, runs: int,
+                         iterations: int = 30) -> np.ndarray:
+    """
+    Perzentile der Sperrminuten pro Zone direkt aus der Mischverteilung:
+    Stufe l mit Anteil counts / runs, darum Normal-Rauschen um
+    l * BLOCKED_PER_RISK plus Eingriff, unten bei 0 abgeschnitten.
+    Bisektion auf der Verteilungsfunktion, für alle Zonen gleichzeitig.
+    """
+    weights = counts / max(runs, 1)
+    centers = np.arange(1, counts.shape[1] + 1) * BLOCKED_PER_RISK + blocked_delta[:, None]
+    target = np.asarray(PERCENTILES, dtype=np.float64)[:, None] / 100
+    lo = np.broadcast_to(centers.min(axis=1) - 8 * BLOCKED_NOISE, (len(PERCENTILES), len(counts)))
+    hi = np.broadcast_to(centers.max(axis=1) + 8 * BLOCKED_NOISE, lo.shape)
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        z = (mid[..., None] - centers) / BLOCKED_NOISE
+        below = (weights * np.interp(z, _Z_GRID, _PHI_GRID)).sum(axis=-1) < target
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    # max(0, ·) ist monoton: Perzentil des Abgeschnittenen = abgeschnittenes Perzentil
+    return np.maximum((lo + hi) / 2, 0).astype(np.float32)
+
+
+def simulate(df_zones: pd.DataFrame, scenario: str, spec: WhatIfSpec) -> WhatIfResult:
+    """
+    Monte-Carlo-Projektion des Risikos für `spec.runs` Läufe über
+    `spec.steps` Zeitschritte, pro Zonen-Block (Zonen × Läufe) Schritt für
+    Schritt.
+
+    Das latente Risiko jeder Zone kehrt vom aktuellen `risk_score` mit der
+    Zeitkonstante REVERSION_MINUTES zum Szenario-Bias (plus Eingriffen)
+    zurück (AR(1)). Pro Lauf und Zone wird ein Störterm gezogen und mit der
+    Standardabweichung des jeweiligen Schritts skaliert; dazu kommt pro
+    Lauf ein netzweiter Nachfrage-Schock als Random Walk, der alle Zonen
+    gemeinsam trifft. Gerundet und auf 1–4 begrenzt ergibt das die
+    Risikostufe, daraus wie in `generate_live_data` die Sperrminuten; deren
+    Perzentile kommen aus der Mischverteilung über die Stufen statt aus
+    einer Stichprobe pro Lauf.
+    """
+    rng = np.random.default_rng(spec.seed)
+    n_zones, runs, steps = len(df_zones), spec.runs, spec.steps
+
+    risk_delta, blocked_delta = override_vectors(df_zones["zone"], spec.overrides)
+    mu = scenario_bias(scenario, zone_parents(df_zones["zone"]), rng).astype(np.float32) + risk_delta
+    x0 = df_zones["risk_score"].to_numpy(dtype=np.float32)
+
+    a = np.exp(-STEP_MINUTES / REVERSION_MINUTES)
+    t = np.arange(1, steps + 1)
+    decay = (a ** t).astype(np.float32)
+    spread = (RISK_NOISE * np.sqrt(1 - a ** (2 * t))).astype(np.float32)
+    mean = mu[None, :] + (x0 - mu)[None, :] * decay[:, None]
+    demand = np.cumsum(
+        rng.standard_normal((steps, runs), dtype=np.float32) * DEMAND_SHOCK, axis=0
+    )
+
+    critical_runs = np.zeros((steps, runs), dtype=np.int64)
+    n_levels = len(RISK_LABELS)
+    level_counts = np.zeros((n_zones, n_levels), dtype=np.int64)
+
+    for start in range(0, n_zones, ZONE_CHUNK):
+        block = slice(start, min(start + ZONE_CHUNK, n_zones))
+        width = block.stop - block.start
+        eps = rng.standard_normal((width, runs), dtype=np.float32)
+
+        # Schritt für Schritt in einem (Zonen × Läufe)-Puffer: gebraucht werden
+        # nur die Schwelle pro Schritt und der letzte Schritt
+        latent = np.empty_like(eps)
+        for step in range(steps):
+            np.multiply(eps, spread[step], out=latent)
+            latent += mean[step, block, None]
+            latent += demand[step]
+            # Stufe 4 ("kritisch") entspricht latent >= 3.5
+            critical_runs[step] += np.count_nonzero(latent >= 3.5, axis=0)
+
+        # Alle Stufen in einem Durchgang: Index Zone * 4 + (Stufe - 1)
+        codes = np.clip(np.rint(latent, out=latent), 1, 4, out=latent).astype(np.intp)
+        codes += (np.arange(width, dtype=np.intp) * n_levels - 1)[:, None]
+        level_counts[block] = np.bincount(codes.ravel(), minlength=width * n_levels).reshape(width, n_levels)
+
+    blocked_pct = _blocked_percentiles(level_counts, blocked_delta, runs)
+    risk_pct = _discrete_percentiles(level_counts, runs)
+    zones = pd.DataFrame(
+        {
+            "zone": df_zones["zone"].to_numpy(),
+            "lat": df_zones["lat"].to_numpy(),
+            "lon": df_zones["lon"].to_numpy(),
+            "risk_now": df_zones["risk_score"].to_numpy(),
+            "risk_p50": risk_pct[1].astype(np.int8),
+            "risk_p90": risk_pct[2].astype(np.int8),
+            "p_critical": (level_counts[:, -1] / runs).astype(np.float32),
+            "blocked_p10": blocked_pct[0],
+            "blocked_p50": blocked_pct[1],
+            "blocked_p90": blocked_pct[2],
+            "override": (risk_delta != 0) | (blocked_delta != 0),
+        }
+    )
+    colors = RISK_COLORS[zones["risk_p90"].to_numpy() - 1]
+    zones = zones.assign(
+        risk_label=pd.Categorical.from_codes(zones["risk_p90"].to_numpy() - 1, RISK_LABELS, ordered=True),
+        **{c: colors[:, k] for k, c in enumerate(["r", "g", "b", "a"])},
+    )
+
+    share = critical_runs / max(n_zones, 1) * 100
+    share_pct = np.percentile(share, PERCENTILES, axis=1)
+    timeline = pd.DataFrame(
+        {
+            "Minuten": t * STEP_MINUTES,
+            **{f"p{p}": share_pct[k] for k, p in enumerate(PERCENTILES)},
+        }
+    )
+    return WhatIfResult(zones=zones, timeline=timeline, spec=spec)
+
+
+def default_targets() -> list:
+    """Auswahl für Eingriffe: alle Städte und Basis-Zonen."""
+    return list(dict.fromkeys(c["city"] for c in CITY_DATA)) + ZONES
@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class TimeWheel:
+    """
+    Ringpuffer aus Zeit-Buckets für mehrere Serien (z. B. eine pro Zone).
+
+    Jede Serie hat `n_buckets` Buckets à `bucket_seconds`. Für jedes Fenster
+    in `windows` (Anzahl Buckets, z. B. 5 / 30 / 1440 Minuten) wird eine
+    laufende Summe pro Serie mitgeführt:
+
+    - `add` aktualisiert einen Bucket und die betroffenen Summen in O(1).
+    - Rückt die Uhr um einen Bucket vor, wird der herausfallende Bucket
+      einmal pro Fenster (vektorisiert über alle Serien) abgezogen – die
+      Kosten für das Verfallen verteilen sich also auf alle Events.
+
+    Die Fenster sind auf Bucket-Grenzen gerundet: das 5-Minuten-Fenster
+    umfasst den aktuellen (angebrochenen) und die vier vorherigen Buckets.
+    """
+
+    def __init__(self, n_series: int, bucket_seconds: float, n_buckets: int,
+                 windows=(), dtype=np.int64):
+        windows = tuple(windows)
+        if any(w > n_buckets for w in windows):
+            raise ValueError("Fenster dürfen nicht länger als der Ringpuffer sein.")
+
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.windows = windows
+        # Bucket-Major: ein verfallender Bucket ist eine zusammenhängende Zeile
+        self._buckets = np.zeros((n_buckets, n_series), dtype=dtype)
+        self._sums = np.zeros((len(windows), n_series), dtype=dtype)
+        self._head = None  # absolute Bucket-ID des jüngsten Buckets
+
+    @property
+    def head(self):
+        return self._head
+
+    def bucket_id(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds)
+
+    # ---------------------------------------------------------
+    # Schreiben
+    # ---------------------------------------------------------
+    def add(self, series: int, ts: float, value=1) -> bool:
+        """Addiert `value` zur Serie; False, wenn das Event schon verfallen ist."""
+        bucket = int(ts // self.bucket_seconds)
+        head = self._head
+        if head is None or bucket > head:
+            self._advance(bucket)
+            head = bucket
+        age = head - bucket
+        if age >= self.n_buckets:
+            return False
+
+        self._buckets[bucket % self.n_buckets, series] += value
+        sums = self._sums
+        for k, window in enumerate(self.windows):
+            if age < window:
+                sums[k, series] += value
+        return True
+
+    def add_many(self, series, ts, values=1) -> int:
+        """
+        Vektorisierte Variante von `add` für einen Block von Events.
+        Liefert die Anzahl übernommener Events.
+        """
+        series = np.asarray(series)
+        buckets = (np.asarray(ts, dtype=float) // self.bucket_seconds).astype(np.int64)
+        values = np.broadcast_to(np.asarray(values, dtype=self._buckets.dtype), series.shape)
+        if len(buckets) == 0:
+            return 0
+
+        newest = int(buckets.max())
+        if self._head is None or newest > self._head:
+            self._advance(newest)
+
+        age = self._head - buckets
+        keep = age < self.n_buckets
+        series, buckets, values, age = series[keep], buckets[keep], values[keep], age[keep]
+
+        np.add.at(self._buckets, (buckets % self.n_buckets, series), values)
+        for k, window in enumerate(self.windows):
+            inside = age < window
+            np.add.at(self._sums[k], series[inside], values[inside])
+        return int(keep.sum())
+
+    def advance_to(self, ts: float) -> None:
+        """Uhr vorrücken (z. B. vor einem Snapshot), ohne ein Event zu schreiben."""
+        bucket = int(ts // self.bucket_seconds)
+        if self._head is None or bucket > self._head:
+            self._advance(bucket)
+
+    def _advance(self, bucket: int) -> None:
+        head = self._head
+        if head is None or bucket - head >= self.n_buckets:
+            # Erstes Event oder Lücke länger als der Puffer: alles ist verfallen
+            self._buckets[:] = 0
+            self._sums[:] = 0
+            self._head = bucket
+            return
+
+        for new_head in range(head + 1, bucket + 1):
+            for k, window in enumerate(self.windows):
+                self._sums[k] -= self._buckets[(new_head - window) % self.n_buckets]
+            # Der älteste Bucket wird zum neuen Kopf-Bucket
+            self._buckets[new_head % self.n_buckets] = 0
+        self._head = bucket
+
+    # ---------------------------------------------------------
+    # Lesen
+    # ---------------------------------------------------------
+    def window_sum(self, k: int) -> np.ndarray:
+        """Laufende Summe des k-ten Fensters pro Serie (Kopie)."""
+        return self._sums[k].copy()
+
+    def series(self, n: int = None) -> np.ndarray:
+        """
+        Die letzten `n` Buckets (älteste zuerst) als Array (n, n_series).
+        """
+        n = self.n_buckets if n is None else n
+        if self._head is None:
+            return np.zeros((n, self._buckets.shape[1]), dtype=self._buckets.dtype)
+        ids = np.arange(self._head - n + 1, self._head + 1)
+        return self._buckets[ids % self.n_buckets]
+
+    def bucket_starts(self, n: int = None) -> np.ndarray:
+        """Startzeiten (Unix-Sekunden) der Buckets aus `series(n)`."""
+        n = self.n_buckets if n is None else n
+        head = self._head if self._head is not None else 0
+        return np.arange(head - n + 1, head + 1) * self.bucket_seconds